@@ -1,9 +1,30 @@
 # server.gd
 extends Node
 
+# binary packets of python/src/wire_format.py, anything else is parsed as a JSON text message
+const MAGIC = "GPOS"
+const VERSION = 2
+const KIND_TABLE = 0
+const KIND_FRAME = 1
+const HEADER_SIZE = 28
+# sessions a sender has left, remembered to drop their late packets
+const MAX_RETIRED_SESSIONS = 8
+# peers that sent nothing for this long are closed and forgotten
+const PEER_TIMEOUT_MS = 5000
+
 var server := UDPServer.new()
+# [{"peer": PacketPeerUDP, "sender": "ip:port", "last_packet": msec}, ...]
 var peers = []
+# joint tables announced by the senders by table id, [[name, components], ...]
+var tables = {}
+# "ip:port": current session and the sessions it has left
+var sessions = {}
+var retired_sessions = {}
+# "ip:port:person": sequence of the last frame
+var last_sequence = {}
 
+# message is a Dictionary: the parsed JSON of text packets, or
+# {"session", "sequence", "timestamp", "person", "joints": {name: [values]}} of binary frames
 signal new_message(message)
 
 func _ready():
@@ -11,7 +32,108 @@ func _ready():
 
 func _process(delta):
 	server.poll() # Important!
+	var now = OS.get_ticks_msec()
 	if server.is_connection_available():
-		var peer : PacketPeerUDP = server.take_connection()
-		var pkt = peer.get_packet()
-		emit_signal('new_message', pkt.get_string_from_utf8())
+		peers.append({"peer": server.take_connection(), "sender": "", "last_packet": now})
+	# later packets of a sender arrive on its peer, not as new connections
+	for entry in peers:
+		var peer = entry["peer"]
+		while peer.get_available_packet_count() > 0:
+			var pkt = peer.get_packet()
+			entry["sender"] = "%s:%d" % [peer.get_packet_ip(), peer.get_packet_port()]
+			entry["last_packet"] = now
+			var message = decode_packet(pkt, entry["sender"])
+			if message != null:
+				emit_signal('new_message', message)
+	for entry in peers.duplicate():
+		if now - entry["last_packet"] > PEER_TIMEOUT_MS:
+			entry["peer"].close()
+			forget(entry["sender"])
+			peers.erase(entry)
+
+func forget(sender):
+	sessions.erase(sender)
+	retired_sessions.erase(sender)
+	clear_sequences(sender)
+
+func clear_sequences(sender):
+	for key in last_sequence.keys():
+		if key.begins_with(sender + ":"):
+			last_sequence.erase(key)
+
+func accept_session(sender, session):
+	if sessions.has(sender) and sessions[sender] == session:
+		return true
+	if not retired_sessions.has(sender):
+		retired_sessions[sender] = []
+	var retired = retired_sessions[sender]
+	if session in retired:
+		return false
+	# a new session, the sender restarted and its sequence numbers start over
+	if sessions.has(sender):
+		retired.append(sessions[sender])
+		if retired.size() > MAX_RETIRED_SESSIONS:
+			retired.pop_front()
+	clear_sequences(sender)
+	sessions[sender] = session
+	return true
+
+# sequence numbers wrap around, anything up to half the range behind the last one is stale
+func is_newer(sequence, last):
+	var delta = (sequence - last) & 0xFFFFFFFF
+	return delta != 0 and delta < 0x80000000
+
+func decode_packet(pkt: PoolByteArray, sender = ""):
+	if pkt.size() < HEADER_SIZE or pkt.subarray(0, 3).get_string_from_ascii() != MAGIC:
+		var parsed = JSON.parse(pkt.get_string_from_utf8()).result
+		return parsed if typeof(parsed) == TYPE_DICTIONARY else null
+
+	var buf = StreamPeerBuffer.new()
+	buf.data_array = pkt
+	buf.seek(4)
+	if buf.get_u8() != VERSION:
+		return null
+	var kind = buf.get_u8()
+	var table_id = buf.get_u16()
+	var session = buf.get_u32()
+	var sequence = buf.get_u32()
+	var timestamp = buf.get_double()
+	var person = buf.get_u16()
+	var count = buf.get_u16()
+
+	if kind != KIND_TABLE and kind != KIND_FRAME:
+		return null
+	if kind == KIND_FRAME and pkt.size() != HEADER_SIZE + 4 * count:
+		return null
+	if not accept_session(sender, session):
+		return null
+
+	if kind == KIND_TABLE:
+		var table = []
+		for i in range(count):
+			var components = buf.get_u8()
+			var name_length = buf.get_u8()
+			table.append([buf.get_data(name_length)[1].get_string_from_utf8(), components])
+		tables[table_id] = table
+		return null
+
+	if not tables.has(table_id):
+		return null
+	var table = tables[table_id]
+	var total = 0
+	for entry in table:
+		total += entry[1]
+	if total != count:
+		return null
+	var key = "%s:%d" % [sender, person]
+	if last_sequence.has(key) and not is_newer(sequence, last_sequence[key]):
+		return null
+	last_sequence[key] = sequence
+
+	var joints = {}
+	for entry in table:
+		var values = []
+		for i in range(entry[1]):
+			values.append(buf.get_float())
+		joints[entry[0]] = values
+	return {"session": session, "sequence": sequence, "timestamp": timestamp, "person": person, "joints": joints}
@@ -20,14 +20,31 @@ func _ready():
 		}
 	set_process(true)
 
+func _get_joint(message, kp_name):
+	# binary frames carry [x, y, z, w] or [pitch, yaw, roll] per bone, text messages the JSON fields
+	if not message.has("joints"):
+		return message.get(kp_name)
+	var values = message["joints"].get(kp_name)
+	if values == null:
+		return null
+	if len(values) == 4:
+		return {"quat": values}
+	return {"pitch": values[0], "yaw": values[1], "roll": values[2]}
+
 func _on_UDPServer_new_message(message):
-	var msg_json = JSON.parse(message).result
 	for kp_name in key_points_names:
+		var joint = _get_joint(message, kp_name)
+		if joint == null:
+			continue
 		var id = key_points[kp_name]["id"]
 		var t = key_points[kp_name]["init_pose"]
 		
-		t = t.rotated(Vector3(1.0, 0.0, 0.0), msg_json[kp_name]['pitch'])
-		t = t.rotated(Vector3(0.0, 0.0, 1.0), msg_json[kp_name]['yaw'])
-		t = t.rotated(Vector3(0.0, 1.0, 0.0), msg_json[kp_name]['roll'])
+		if joint.has('quat'):
+			var q = joint['quat']
+			t.basis = t.basis * Basis(Quat(q[0], q[1], q[2], q[3]))
+		else:
+			t = t.rotated(Vector3(1.0, 0.0, 0.0), joint['pitch'])
+			t = t.rotated(Vector3(0.0, 0.0, 1.0), joint['yaw'])
+			t = t.rotated(Vector3(0.0, 1.0, 0.0), joint['roll'])
 
 		skel.set_bone_pose(id, t)
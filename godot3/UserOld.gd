@@ -1,6 +1,8 @@
 extends Spatial
 
 export(NodePath) var neck_bone_path
+# person index to follow when several people are sent
+export var person = 0
 onready var neck_bone = get_node(neck_bone_path)
 
 func _process(delta):
@@ -9,11 +11,10 @@ func _process(delta):
 		print(neck_bone.rotation_degrees)
 
 func _on_UDPServer_new_message(message):
-	var msg_json = JSON.parse(message).result
-	print(msg_json)
-	neck_bone.set_rotation_degrees(Vector3(
-		msg_json['face']['pitch'],
-		msg_json['face']['yaw'],
-		msg_json['face']['roll']
-		)
-	)
+	print(message)
+	if message.has('person') and message['person'] != person:
+		return
+	# binary frames carry the face angles as [pitch, yaw, roll]
+	var face = message['joints']['face'] if message.has('joints') else [
+		message['face']['pitch'], message['face']['yaw'], message['face']['roll']]
+	neck_bone.set_rotation_degrees(Vector3(face[0], face[1], face[2]))
@@ -39,6 +39,7 @@ new_kpts = calculator.center_keypoints(new_kpts, 'hips')
 angles = calculator.calculate_keypoint_angles(new_kpts)
 # %%
 import matplotlib.pyplot as plt
+from keypoints.skeleton import PARENT_INDEX
 
 fig = plt.figure()
 ax = fig.add_subplot(111, projection='3d')
@@ -47,10 +48,13 @@ bone_lengths = calculator.get_bone_lengths(new_kpts)
 normalization = bone_lengths['neck']
 base_skeleton = calculator.get_base_skeleton(bone_lengths, normalization)
 
-for joint in new_kpts:
-    r1, r2 = calculator.reconstruct_joint_kpts_from_angles(
-        joint, angles, base_skeleton, new_kpts['hips'], normalization
-    )
+reconstructed_kpts = calculator.reconstruct_kpts_from_angles(angles, base_skeleton, new_kpts['hips'], normalization)
+reconstruction_error = calculator.get_reconstruction_error(new_kpts, angles, base_skeleton, normalization)
+print('Mean reconstruction error:', reconstruction_error.mean())
+
+for joint_idx, parent_idx in enumerate(PARENT_INDEX):
+    if parent_idx < 0: continue
+    r1, r2 = reconstructed_kpts[parent_idx], reconstructed_kpts[joint_idx]
     plt.plot(xs = [r1[0], r2[0]], ys = [r1[1], r2[1]], zs = [r1[2], r2[2]], color = 'red')
 
 ax.azim = -90
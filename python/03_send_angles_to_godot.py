@@ -9,6 +9,7 @@ import mediapipe as mp
 mp_keypoints = mp.solutions.pose.PoseLandmark
 
 from keypoints import KeypointRotations
+from keypoints.retargeting import TargetRig, Retargeter
 
 offset_directions = {
         'lefthip': mp_keypoints.LEFT_HIP.value,
@@ -29,16 +30,7 @@ offset_directions = {
     }
 
 # %%
-import socket
-
-class GodotUDPClient:
-    def __init__(self):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
-
-    def send_message(self, angles):
-        message_str = str(angles).replace("'", '"')
-        self.sock.sendto(message_str.encode('utf-8'), ("127.0.0.1", 4240))
+from src.networking import GodotUDPClient
 
 client = GodotUDPClient()
 # %%
@@ -58,6 +50,10 @@ godot_mapping = {
     'RightForeArm': 'rightelbow',
 }
 
+# the rig's model axes relative to OFFSETS, add rest_offsets for bones whose rest pose differs from OFFSETS
+godot_rig = TargetRig(godot_mapping, axes='x,y,z')
+retargeter = Retargeter(godot_rig)
+
 kpts = {
     key: data[value] for key, value in offset_directions.items()
 }
@@ -68,6 +64,9 @@ new_kpts = calculator.rotate_pose(new_kpts, 'z')
 
 new_kpts = calculator.center_keypoints(new_kpts, 'hips')
 angles = calculator.calculate_keypoint_angles(new_kpts)
+# [x, y, z, w] per joint, User.gd applies these instead of the euler angles when they are sent
+send_quaternions = False
+quaternions = retargeter.to_dict(retargeter.retarget_quaternions(calculator.calculate_local_rotations(new_kpts)))
 
 # angles['leftshoulder'] += np.array((0, 0, -np.pi/2))
 # angles['leftelbow'] += np.array((0, 0, -np.pi/2))
@@ -75,15 +74,12 @@ angles = calculator.calculate_keypoint_angles(new_kpts)
 # angles['rightshoulder'] += np.array((0, 0, np.pi/2))
 # angles['rightelbow'] += np.array((0, 0, np.pi/2))
 
-message = {}
+# one entry per bone of the joint table, User.gd reads 4 values as a quaternion and 3 as [pitch, yaw, roll]
+joints = {}
 
 for key, value in godot_mapping.items():
     yaw, pitch, roll = angles[value]
-    message[key] = {
-        'pitch': yaw,
-        'yaw': pitch,
-        'roll': roll,
-    }
+    joints[key] = quaternions[key] if send_quaternions else [yaw, pitch, roll]
 
-client.send_message(message)
+client.send_joints(joints)
 # %%
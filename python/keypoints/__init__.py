@@ -1 +1,3 @@
-from .keypoint_rotation import KeypointRotations
\ No newline at end of file
+from .keypoint_rotation import KeypointRotations
+from .skeleton import Skeleton
+from .calibration import BoneLengthCalibration
\ No newline at end of file
@@ -0,0 +1,167 @@
+'''Benchmarks for the keypoints package on deterministic synthetic pose sequences.
+
+Every operation is timed on whole sequences through the batched (T, J, 3) skeleton path and
+reported as frames per second plus the peak memory it allocates per frame (traced with tracemalloc).
+relative_fps divides the fps by the rate of a fixed numpy kernel on the same number of frames timed
+in the same run, so it can be compared across machines and under load.
+
+usage: python -m keypoints.benchmark [--frames 1 1000 100000] [--update-baseline]
+'''
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from keypoints.keypoint_rotation import KeypointRotations
+from keypoints.skeleton import JOINTS, Skeleton
+
+FRAME_COUNTS = [1, 1000, 100000]
+BASELINE_PATH = Path(__file__).resolve().parents[1] / 'tests' / 'benchmark_baseline.json'
+
+def generate_pose_sequence(num_frames:int, seed:int=0)->Skeleton:
+    # smooth random joint angles driven through forward kinematics, so every frame is a valid pose
+    rng = np.random.default_rng(seed)
+    calculator = KeypointRotations()
+    bone_lengths = {
+        'lefthip': 1., 'righthip': 1., 'leftknee': 4., 'rightknee': 4., 'leftfoot': 4., 'rightfoot': 4.,
+        'neck': 6., 'leftshoulder': 2., 'rightshoulder': 2., 'leftelbow': 3., 'rightelbow': 3.,
+        'leftwrist': 3., 'rightwrist': 3.
+    }
+    base_skeleton = calculator.get_base_skeleton(bone_lengths, 1.)
+
+    t = np.arange(num_frames)[:, None, None]
+    frequencies = rng.uniform(0.01, 0.1, size=(1, len(JOINTS), 3))
+    phases = rng.uniform(0, 2 * np.pi, size=(1, len(JOINTS), 3))
+    angles = 0.5 * np.sin(frequencies * t + phases)
+    root_pnts = np.cumsum(rng.normal(scale=0.01, size=(num_frames, 3)), axis=0)
+
+    kpts = calculator.reconstruct_kpts_from_angles(angles, base_skeleton, root_pnts)
+    kpts += rng.normal(scale=0.01, size=kpts.shape)
+    return Skeleton(kpts)
+
+def _get_operations(calculator, kpts):
+    out = Skeleton(batch_shape=kpts.batch_shape)
+    angles = calculator.calculate_keypoint_angles(kpts)
+    bone_lengths = calculator.get_bone_lengths(kpts)
+    normalization = bone_lengths['neck']
+    base_skeleton = calculator.get_base_skeleton(bone_lengths, normalization)
+    return {
+        'rotate_pose': lambda: calculator.rotate_pose(kpts, 'z', out=out),
+        'add_neck_and_hip_keypoints': lambda: calculator.add_neck_and_hip_keypoints(kpts, out=out),
+        'center_keypoints': lambda: calculator.center_keypoints(kpts, 'hips', out=out),
+        'calculate_keypoint_angles': lambda: calculator.calculate_keypoint_angles(kpts),
+        'get_bone_lengths': lambda: calculator.get_bone_lengths(kpts),
+        'reconstruct_kpts_from_angles': lambda: calculator.reconstruct_kpts_from_angles(
+            angles, base_skeleton, kpts['hips'], normalization),
+    }
+
+def _calibration_operation(num_frames:int):
+    # fixed small-array numpy work of the same kind as the skeleton operations: rotating and measuring bones
+    rng = np.random.default_rng(0)
+    rotations = rng.normal(size=(num_frames, len(JOINTS), 3, 3))
+    bones = rng.normal(size=(num_frames, len(JOINTS), 3))
+    return lambda: np.linalg.norm(np.einsum('...ij,...j->...i', rotations, bones) - bones, axis=-1)
+
+def time_operation(operation, min_time:float=0.2, min_repeats:int=3)->float:
+    # best of several runs, the least disturbed one is the most comparable across runs
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < min_repeats or time.perf_counter() - start < min_time:
+        tic = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - tic)
+    return min(timings)
+
+def time_relative(operation, calibration, min_time:float=0.2, min_repeats:int=5)->float:
+    # calibration time over operation time, median of back-to-back pairs so that a load change hits both.
+    # timed in process cpu time, other processes preempting this one don't count
+    ratios = []
+    start = time.perf_counter()
+    while len(ratios) < min_repeats or time.perf_counter() - start < min_time:
+        tic = time.process_time()
+        operation()
+        toc = time.process_time()
+        calibration()
+        ratios.append((time.process_time() - toc) / max(toc - tic, 1e-9))
+    return float(np.median(ratios))
+
+def peak_allocation(operation)->int:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def run_benchmarks(frame_counts=FRAME_COUNTS, min_time:float=0.2)->dict:
+    calculator = KeypointRotations()
+    results = {}
+    for num_frames in frame_counts:
+        kpts = generate_pose_sequence(num_frames)
+        calibration = _calibration_operation(num_frames)
+        calibration() # warm-up
+        results[str(num_frames)] = {}
+        for name, operation in _get_operations(calculator, kpts).items():
+            operation() # warm-up
+            elapsed = time_operation(operation, min_time)
+            results[str(num_frames)][name] = {
+                'fps': num_frames / elapsed,
+                'relative_fps': time_relative(operation, calibration, min_time),
+                'peak_bytes_per_frame': peak_allocation(operation) / num_frames,
+            }
+    return results
+
+def compare_to_baseline(results:dict, baseline:dict, max_slowdown:float=3., max_allocation_growth:float=1.5,
+                        absolute_timing:bool=False)->list:
+    # loose bounds, only clear regressions are reported. Speed is compared through relative_fps, which
+    # doesn't depend on the machine; absolute_timing also compares the fps, for a baseline from this machine
+    regressions = []
+    for num_frames, operations in results.items():
+        for name, result in operations.items():
+            reference = baseline.get(num_frames, {}).get(name)
+            if reference is None:
+                continue
+            if 'relative_fps' in reference and result['relative_fps'] * max_slowdown < reference['relative_fps']:
+                regressions.append(
+                    f'{name} on {num_frames} frames: {result["relative_fps"]:.3f} x calibration, '
+                    f'baseline {reference["relative_fps"]:.3f} x calibration')
+            if absolute_timing and result['fps'] * max_slowdown < reference['fps']:
+                regressions.append(
+                    f'{name} on {num_frames} frames: {result["fps"]:.1f} fps, baseline {reference["fps"]:.1f} fps')
+            # small absolute slack so that single-frame runs don't trip on interpreter noise
+            if result['peak_bytes_per_frame'] > reference['peak_bytes_per_frame'] * max_allocation_growth + 1024:
+                regressions.append(
+                    f'{name} on {num_frames} frames: {result["peak_bytes_per_frame"]:.0f} B/frame, '
+                    f'baseline {reference["peak_bytes_per_frame"]:.0f} B/frame')
+    return regressions
+
+def load_baseline(path=BASELINE_PATH)->dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_baseline(results:dict, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the keypoints package on synthetic pose sequences.')
+    parser.add_argument('--frames', type=int, nargs='+', default=FRAME_COUNTS)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='overwrite the baseline with these results')
+    parser.add_argument('--absolute', action='store_true', help='also compare the fps, for a baseline from this machine')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.frames)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+    elif args.baseline.exists():
+        for regression in compare_to_baseline(results, load_baseline(args.baseline), absolute_timing=args.absolute):
+            print('REGRESSION:', regression)
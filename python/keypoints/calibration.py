@@ -0,0 +1,82 @@
+import numpy as np
+
+from keypoints.keypoint_rotation import KeypointRotations
+from keypoints.skeleton import BONES
+
+class BoneLengthCalibration:
+    '''Streaming estimate of the subject's bone lengths for live sessions.
+
+    Every update adds the bone lengths of the given frames to a ring buffer of the last `window`
+    frames and re-estimates each bone with a trimmed mean. Once the estimate has moved less than
+    `tolerance` (relative) for `patience` consecutive updates the calibration freezes, and the
+    normalized base skeleton is built once and reused by every later reconstruction.
+    '''
+    def __init__(self, calculator:KeypointRotations=None, window:int=300, trim:float=0.1,
+                 tolerance:float=1e-3, patience:int=30, min_frames:int=60):
+        self.calculator = calculator or KeypointRotations()
+        self.window = window
+        self.trim = trim
+        self.tolerance = tolerance
+        self.patience = patience
+        self.min_frames = min_frames
+        self.reset()
+
+    def reset(self):
+        self._samples = np.empty((self.window, len(BONES)))
+        self._next_sample = 0
+        self.num_frames = 0
+        self.stable_updates = 0
+        self.estimate = None
+        self.frozen = False
+        self.normalization = None
+        self.base_skeleton = None
+
+    @property
+    def bone_lengths(self)->dict:
+        return None if self.estimate is None else dict(zip(BONES, self.estimate))
+
+    def update(self, kpts)->bool:
+        # kpts is one frame or a batch of frames with the neck and hips keypoints, returns whether calibration is frozen
+        if self.frozen:
+            return True
+
+        samples = self.calculator.get_bone_length_samples(kpts)[-self.window:]
+        # ignore frames where a keypoint was missing and the bone collapsed
+        samples = samples[np.all(np.isfinite(samples) & (samples > 0), axis=-1)]
+        if not len(samples):
+            return False
+
+        slots = (self._next_sample + np.arange(len(samples))) % self.window
+        self._samples[slots] = samples
+        self._next_sample = (slots[-1] + 1) % self.window
+        self.num_frames += len(samples)
+
+        estimate = self._trimmed_mean(self._samples[:min(self.num_frames, self.window)])
+        if self.estimate is not None and np.max(np.abs(estimate - self.estimate) / self.estimate) < self.tolerance:
+            self.stable_updates += 1
+        else:
+            self.stable_updates = 0
+        self.estimate = estimate
+
+        if self.num_frames >= self.min_frames and self.stable_updates >= self.patience:
+            self.freeze()
+        return self.frozen
+
+    def _trimmed_mean(self, samples):
+        cut = int(len(samples) * self.trim)
+        samples = np.sort(samples, axis=0)
+        return samples[cut:len(samples) - cut].mean(axis=0)
+
+    def freeze(self):
+        # cache the normalized base skeleton, later updates are ignored until reset()
+        if self.estimate is None:
+            raise RuntimeError('Cannot freeze the calibration before any frame was added')
+        bone_lengths = self.bone_lengths
+        self.normalization = bone_lengths['neck']
+        self.base_skeleton = self.calculator.get_base_skeleton(bone_lengths, self.normalization)
+        self.frozen = True
+
+    def reconstruct_kpts_from_angles(self, angles, root_pnts):
+        if not self.frozen:
+            raise RuntimeError('Bone lengths are not calibrated yet')
+        return self.calculator.reconstruct_kpts_from_angles(angles, self.base_skeleton, root_pnts, self.normalization)
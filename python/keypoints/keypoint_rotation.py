@@ -1,38 +1,23 @@
 '''Code adapted from Temuge Batpurev
 link: https://github.com/TemugeB/joint_angles_calculate/blob/main/calculate_joint_angles.py
 '''
-import copy
 import numpy as np
 
 import keypoints.utils as utils
-
-HIERARCHY = {
-    'hips': [],
-    'lefthip': ['hips'], 'leftknee': ['lefthip', 'hips'], 'leftfoot': ['leftknee', 'lefthip', 'hips'],
-    'righthip': ['hips'], 'rightknee': ['righthip', 'hips'], 'rightfoot': ['rightknee', 'righthip', 'hips'],
-    'neck': ['hips'],
-    'leftshoulder': ['neck', 'hips'], 'leftelbow': ['leftshoulder', 'neck', 'hips'], 'leftwrist': ['leftelbow', 'leftshoulder', 'neck', 'hips'],
-    'rightshoulder': ['neck', 'hips'], 'rightelbow': ['rightshoulder', 'neck', 'hips'], 'rightwrist': ['rightelbow', 'rightshoulder', 'neck', 'hips']
-}
-
-OFFSETS = {
-    'hips': np.array([0, 0, 0]),
-    'lefthip': np.array([1, 0, 0]), 'leftknee': np.array([0, -1, 0]), 'leftfoot': np.array([0, -1, 0]),
-    'righthip': np.array([-1, 0, 0]), 'rightknee': np.array([0, -1, 0]), 'rightfoot': np.array([0, -1, 0]), 
-    'neck': np.array([0, 1, 0]),
-    'leftshoulder': np.array([1, 0, 0]), 'leftelbow': np.array([1, 0, 0]), 'leftwrist': np.array([1, 0, 0]),
-    'rightshoulder': np.array([-1,0,0]), 'rightelbow': np.array([-1,0,0]), 'rightwrist': np.array([-1,0,0])
-}
+from keypoints.skeleton import HIERARCHY, OFFSETS, JOINTS, JOINT_INDEX, PARENT_INDEX, ROOT_JOINT, BONES, OFFSET_ARRAY, PLAN, Skeleton
 
 class KeypointRotations:
     def __init__(self):
         self.kpts_hierarchy = HIERARCHY
         self.kpts_offsets = OFFSETS
         self.max_connected_joints = max([len(connected_joints) for connected_joints in self.kpts_hierarchy.values()])
+        self.plan = PLAN
 
     @staticmethod
-    def rotate_pose(kpts:dict, axis:str, degrees:int=90)->dict:
-        kpts_cpy = copy.deepcopy(kpts)
+    def rotate_pose(kpts:dict, axis:str, degrees:int=90, out:Skeleton=None)->Skeleton:
+        kpts = Skeleton.as_skeleton(kpts)
+        if out is None:
+            out = Skeleton(batch_shape=kpts.batch_shape)
         angle = np.deg2rad(degrees)
         if axis == 'x':
             R = utils.get_R_x(angle)
@@ -43,87 +28,125 @@ class KeypointRotations:
         else:
             raise NotImplementedError
 
-        for joint in kpts_cpy:
-            kpts_cpy[joint] = R @ kpts_cpy[joint]
-
-        return kpts_cpy
+        # row vectors, so rotating every joint is a single product with R.T
+        np.matmul(kpts.data, R.T, out=out.data)
+        return out
 
     @staticmethod
-    def add_neck_and_hip_keypoints(kpts:dict)->dict:
+    def add_neck_and_hip_keypoints(kpts:dict, out:Skeleton=None)->Skeleton:
         def calculate_midpoint(keypoint_left:np.array, keypoint_right:np.array)->np.array:
             half_distance = (keypoint_left - keypoint_right) / 2
             keypoint_mid = keypoint_right + half_distance
             return keypoint_mid
 
-        kpts_cpy = copy.deepcopy(kpts)
-        kpts_cpy['neck'] = calculate_midpoint(
+        kpts = Skeleton.as_skeleton(kpts)
+        if out is not kpts:
+            out = kpts.copy(out)
+        out['neck'] = calculate_midpoint(
             kpts['leftshoulder'], 
             kpts['rightshoulder']
         )
-        kpts_cpy['hips'] = calculate_midpoint(
+        out['hips'] = calculate_midpoint(
             kpts['lefthip'], 
             kpts['righthip']
         )
-        return kpts_cpy
+        return out
 
     @staticmethod
-    def _calculate_root_rotation(root_pnt, root_pnt_x, root_pnt_y):
+    def _calculate_root_basis(root_pnt, root_pnt_x, root_pnt_y):
         # calculate unit vectors of root joint
         root_u = utils.calculate_unit_vector(root_pnt_x, root_pnt)
         root_v = utils.calculate_unit_vector(root_pnt_y, root_pnt)
         root_w = np.cross(root_u, root_v)
 
         # calculate the rotation matrix
-        C = np.stack([root_u, root_v, root_w], axis=1)
+        C = np.stack([root_u, root_v, root_w], axis=-1)
+        return C
+
+    @staticmethod
+    def _calculate_root_rotation(root_pnt, root_pnt_x, root_pnt_y):
+        C = KeypointRotations._calculate_root_basis(root_pnt, root_pnt_x, root_pnt_y)
         theta_z, theta_y, theta_x = utils.Decompose_R_ZXY(C)
-        root_rotation = np.array([theta_z, theta_x, theta_y])
+        root_rotation = np.stack([theta_z, theta_x, theta_y], axis=-1)
         return root_rotation
 
     @staticmethod
-    def center_keypoints(kpts, root_pnt_name):
-        kpts_cpy = copy.deepcopy(kpts)
-        root_pnt = kpts_cpy[root_pnt_name]
-        for joint in kpts_cpy.keys():
-            kpts_cpy[joint] -= root_pnt
-        return kpts_cpy
+    def center_keypoints(kpts, root_pnt_name, out:Skeleton=None)->Skeleton:
+        kpts = Skeleton.as_skeleton(kpts)
+        if out is None:
+            out = Skeleton(batch_shape=kpts.batch_shape)
+        root_idx = JOINT_INDEX[root_pnt_name]
+        np.subtract(kpts.data, kpts.data[..., root_idx, None, :], out=out.data)
+        return out
 
     def _init_kpts_rotations(self, kpts):
-        kpts_rotations = {joint: np.array([0.,0.,0.]) for joint in kpts.keys()}
+        kpts_rotations = Skeleton(batch_shape=kpts.batch_shape)
         return kpts_rotations
 
-    def reconstruct_joint_kpts_from_angles(self, joint, angles, base_skeleton, root_pnt, normalization):
+    def reconstruct_joint_kpts_from_angles(self, joint, angles, base_skeleton, root_pnt, normalization, cumulative_rotations=None):
         # joint, kpts_rotations, base_skeleton, new_kpts['hips'], normalization
-        
+        # pass the output of get_cumulative_rotations when reconstructing several joints of the same frame
+        if cumulative_rotations is None:
+            cumulative_rotations = self.get_cumulative_rotations(angles)
+
         joint_hierarchy = self.kpts_hierarchy[joint]
         #get the current position of the parent joint
         r1 = root_pnt / normalization
         for parent in joint_hierarchy:
             if parent == 'hips': continue
-            R = self.get_rotation_chain(self.kpts_hierarchy[parent], angles)
+            R = cumulative_rotations[..., PARENT_INDEX[JOINT_INDEX[parent]], :, :]
             r1 = r1 + R @ base_skeleton[parent]
         #get the current position of the joint. Note: r2 is the final position of the joint. r1 is simply calculated for plotting.
-        r2 = r1 + self.get_rotation_chain(joint_hierarchy, angles) @ base_skeleton[joint]
+        R = cumulative_rotations[..., PARENT_INDEX[JOINT_INDEX[joint]], :, :] if joint_hierarchy else np.eye(3)
+        r2 = r1 + R @ base_skeleton[joint]
 
         return r1, r2
 
-    def get_bone_lengths(self, kpts):
-        bone_lengths = {}
-        for joint in kpts:
-            if joint == 'hips': continue
-            parent = self.kpts_hierarchy[joint][0]
+    def reconstruct_kpts_from_angles(self, angles, base_skeleton, root_pnts, normalization=1.):
+        # forward kinematics for every joint of every frame, angles is (..., J, 3) and root_pnts (..., 3).
+        # returns (..., J, 3) positions in the same normalized units as reconstruct_joint_kpts_from_angles
+        angles = Skeleton.as_skeleton(angles).data
+        base_skeleton = Skeleton.as_skeleton(base_skeleton).data
+        cumulative_rotations = self.get_cumulative_rotations(angles)
 
-            _bone = kpts[joint] - kpts[parent]
-            _bone_lengths = np.sqrt(np.sum(np.square(_bone), axis = -1)) # maybe replace with magnitude
+        kpts = np.empty(angles.shape)
+        for depth, (nodes, parents) in enumerate(self.plan.depth_levels):
+            if depth == 0:
+                kpts[..., nodes, :] = (np.asarray(root_pnts) / normalization)[..., None, :] + base_skeleton[nodes]
+                continue
+            bones = np.einsum('...kij,kj->...ki', cumulative_rotations[..., parents, :, :], base_skeleton[nodes])
+            kpts[..., nodes, :] = kpts[..., parents, :] + bones
+        return kpts
 
-            _bone_length = np.median(_bone_lengths)
-            bone_lengths[joint] = _bone_length
+    def get_reconstruction_error(self, kpts, angles, base_skeleton, normalization):
+        # euclidean distance between every input keypoint and its reconstruction, (..., J), in normalized units.
+        # kpts must already contain the neck and hips keypoints
+        kpts = Skeleton.as_skeleton(kpts).data
+        root_pnts = kpts[..., JOINT_INDEX[ROOT_JOINT], :]
+        reconstructed_kpts = self.reconstruct_kpts_from_angles(angles, base_skeleton, root_pnts, normalization)
+        return np.linalg.norm(reconstructed_kpts - kpts / normalization, axis=-1)
+
+    @staticmethod
+    def get_bone_length_samples(kpts):
+        # (N, B) lengths of the B bones in BONES order for every one of the N frames given
+        kpts = Skeleton.as_skeleton(kpts)
+        has_parent = PARENT_INDEX >= 0
+
+        _bones = kpts.data[..., has_parent, :] - kpts.data[..., PARENT_INDEX[has_parent], :]
+        _bone_lengths = np.sqrt(np.sum(np.square(_bones), axis = -1)).reshape(-1, len(BONES))
+        return _bone_lengths
+
+    def get_bone_lengths(self, kpts):
+        # median over every frame given
+        _bone_length = np.median(self.get_bone_length_samples(kpts), axis=0)
+        bone_lengths = dict(zip(BONES, _bone_length))
         return bone_lengths
 
     def get_base_skeleton(self, body_lengths, normalization):
         def _set_length(joint_type):
             base_skeleton['left' + joint_type] = self.kpts_offsets['left' + joint_type] * ((body_lengths['left' + joint_type] + body_lengths['right' + joint_type])/(2 * normalization))
             base_skeleton['right' + joint_type] = self.kpts_offsets['right' + joint_type] * ((body_lengths['left' + joint_type] + body_lengths['right' + joint_type])/(2 * normalization))
-        base_skeleton = {'hips': np.array([0,0,0])}
+        base_skeleton = Skeleton()
         base_skeleton['neck'] = self.kpts_offsets['neck'] * (body_lengths['neck']/normalization)
         _set_length('hip')
         _set_length('knee')
@@ -140,8 +163,7 @@ class KeypointRotations:
         #this code assumes ZXY rotation order
         R = np.eye(3)
         for parent in hierarchy:
-            _r_angles = frame_rotations[parent]
-            _R = utils.get_R_z(_r_angles[0])@utils.get_R_x(_r_angles[1])@utils.get_R_y(_r_angles[2])
+            _R = utils.get_R_ZXY(frame_rotations[parent])
             R = R @ _R.T if inverse else R @ _R
         return R
 
@@ -155,22 +177,91 @@ class KeypointRotations:
 
         return joint_rs
 
-    def calculate_keypoint_angles(self, kpts):
-        kpts = self.add_neck_and_hip_keypoints(kpts)
-        kpts = self.center_keypoints(kpts, 'hips')
+    def get_cumulative_rotations(self, angles):
+        # rotation of every joint composed with the rotations of all its parents, (..., J, 3, 3)
+        angles = Skeleton.as_skeleton(angles).data
+        cumulative_rotations = np.empty(angles.shape + (3,))
+        for depth in range(self.plan.max_depth + 1):
+            self._accumulate_rotations(cumulative_rotations, angles, depth)
+        return cumulative_rotations
 
-        kpts_rotations = self._init_kpts_rotations(kpts)
-        kpts_rotations['hips'] = self._calculate_root_rotation(
-            kpts['hips'], kpts['lefthip'], kpts['neck']
+    def _accumulate_rotations(self, cumulative_rotations, angles, depth):
+        # each joint reuses the cumulative rotation already computed for its parent
+        nodes, parents = self.plan.depth_levels[depth]
+        R = utils.get_R_ZXY(angles[..., nodes, :])
+        if depth == 0:
+            cumulative_rotations[..., nodes, :, :] = R
+        else:
+            cumulative_rotations[..., nodes, :, :] = cumulative_rotations[..., parents, :, :] @ R
+
+    def _solve_keypoint_angles(self, kpts, local_rotations=None):
+        # kpts is a (..., J, 3) array already centered on the root.
+        # local_rotations, if given, is a (..., J, 3, 3) array that receives the rotation matrix of
+        # every joint before it is decomposed into angles, identity for joints without a child bone
+        idx = JOINT_INDEX
+        kpts_rotations = np.zeros_like(kpts)
+        if local_rotations is not None:
+            local_rotations[...] = np.eye(3)
+
+        C = self._calculate_root_basis(
+            kpts[..., idx[ROOT_JOINT], :], kpts[..., idx['lefthip'], :], kpts[..., idx['neck'], :]
         )
-        
+        kpts_rotations[..., idx[ROOT_JOINT], :] = self._decompose_rotations(C)
+        if local_rotations is not None:
+            # C is not a rotation when the hips and spine aren't perpendicular. The children are
+            # solved relative to the rotation of the decomposed angles, so that one is stored
+            local_rotations[..., idx[ROOT_JOINT], :, :] = utils.get_R_ZXY(kpts_rotations[..., idx[ROOT_JOINT], :])
+
         # cannot calculate angle if we don't have at least two connections
-        for depth in range(2, self.max_connected_joints+1):    
-            for joint, connected_joints in self.kpts_hierarchy.items():
-                if len(connected_joints) != depth: 
-                    continue
-                parent = connected_joints[0]
-                z, y, x = self.get_joint_rotations(kpts[joint], self.kpts_offsets[joint], kpts[parent], connected_joints, kpts_rotations)
-                kpts_rotations[parent] = np.array([z, x, y])
+        cumulative_rotations = np.empty(kpts.shape + (3,))
+        for depth, (joints, parents, grandparents) in enumerate(self.plan.angle_levels):
+            self._accumulate_rotations(cumulative_rotations, kpts_rotations, depth)
+
+            bones = kpts[..., joints, :] - kpts[..., parents, :]
+            # inverse of the grandparent chain applied to every bone of the level at once
+            b = np.einsum('...kji,...kj->...ki', cumulative_rotations[..., grandparents, :, :], bones)
+
+            offsets = np.broadcast_to(OFFSET_ARRAY[joints], b.shape)
+            R = utils.Get_R2(offsets, b)
+            kpts_rotations[..., parents, :] = self._decompose_rotations(R)
+            if local_rotations is not None:
+                local_rotations[..., parents, :, :] = R
+
+        return kpts_rotations
+
+    def _prepare_keypoints(self, kpts)->Skeleton:
+        # centered copy with neck and hips added, the input is left untouched
+        skeleton = Skeleton.as_skeleton(kpts).copy()
+        self.add_neck_and_hip_keypoints(skeleton, out=skeleton)
+        return self.center_keypoints(skeleton, ROOT_JOINT, out=skeleton)
 
+    def calculate_keypoint_angles(self, kpts):
+        kpts = self._prepare_keypoints(kpts)
+
+        kpts_rotations = self._init_kpts_rotations(kpts)
+        kpts_rotations.data[...] = self._solve_keypoint_angles(kpts.data)
         return kpts_rotations
+
+    @staticmethod
+    def _decompose_rotations(R):
+        # stacked utils.Decompose_R_ZXY, returns (..., 3) in the [z, x, y] order used for kpts_rotations
+        thetaz, thetay, thetax = utils.Decompose_R_ZXY(R)
+        return np.stack([thetaz, thetax, thetay], axis=-1)
+
+    def calculate_keypoint_angles_batch(self, kpts):
+        # kpts is a (T, J, 3) array or skeleton ordered as JOINTS, returns (T, J, 3) ZXY angles.
+        # neck and hips are recomputed from the shoulders and hips like in the per-frame version
+        skeleton = self._prepare_keypoints(kpts)
+        return self._solve_keypoint_angles(skeleton.data)
+
+    def calculate_local_rotations(self, kpts):
+        # same solve as calculate_keypoint_angles but returns the (..., J, 3, 3) rotation matrix of every joint
+        skeleton = self._prepare_keypoints(kpts)
+        local_rotations = np.empty(skeleton.data.shape + (3,))
+        self._solve_keypoint_angles(skeleton.data, local_rotations)
+        return local_rotations
+
+    def calculate_keypoint_quaternions(self, kpts):
+        # (..., J, 4) [x, y, z, w] quaternion of every joint, converted from the rotation matrices
+        # directly so no Euler angles are involved
+        return utils.R_to_quat(self.calculate_local_rotations(kpts))
@@ -0,0 +1,105 @@
+import numpy as np
+
+import keypoints.utils as utils
+from keypoints.skeleton import JOINTS, JOINT_INDEX, OFFSET_ARRAY, PARENT_INDEX, Skeleton
+
+AXES = {'x': 0, 'y': 1, 'z': 2}
+
+def get_axes_matrix(axes)->np.ndarray:
+    # 'z,y,-x' means target x = source z, target y = source y, target z = -source x.
+    # a 3x3 matrix is returned as is
+    if not isinstance(axes, str):
+        return np.asarray(axes, dtype=np.float64)
+    B = np.zeros((3, 3))
+    for row, axis in enumerate(axes.replace(' ', '').split(',')):
+        sign = -1. if axis.startswith('-') else 1.
+        B[row, AXES[axis.lstrip('+-')]] = sign
+    if not np.allclose(np.abs(np.linalg.det(B)), 1):
+        raise ValueError(f'Axes {axes} do not form a basis')
+    return B
+
+def align_rotation(target_vectors, source_vectors)->np.ndarray:
+    # rotation K with K @ target_vectors[i] ~ source_vectors[i], (N, 3) each
+    target_vectors = np.asarray(target_vectors, dtype=np.float64)
+    source_vectors = np.asarray(source_vectors, dtype=np.float64)
+    target_units = target_vectors / utils.magnitude(target_vectors)[:, None]
+    source_units = source_vectors / utils.magnitude(source_vectors)[:, None]
+
+    # a single direction (or collinear ones, like the two shoulders) only fixes the shortest rotation
+    if np.allclose(np.cross(target_units[0], target_units), 0):
+        return utils.Get_R2(target_units[0], source_units[0])
+
+    # Kabsch
+    U, _, Vt = np.linalg.svd(source_units.T @ target_units)
+    D = np.diag([1., 1., np.sign(np.linalg.det(U @ Vt))])
+    return U @ D @ Vt
+
+class TargetRig:
+    '''Description of a skeleton the keypoint rotations are driven onto.
+
+    bone_mapping: {rig bone name: joint of HIERARCHY}, the rig bone receives the rotation of that joint.
+    rest_offsets: {rig bone name: offset of the bone from its parent at rest}, expressed in the rig's
+        model axes. Bones left out are assumed to point the same way as OFFSETS.
+    axes: axis convention of the rig relative to OFFSETS, as accepted by get_axes_matrix.
+    rest_rotations: {rig bone name: 3x3 rest rotation of the bone's local frame}, for rigs whose
+        bone poses are applied relative to a rest frame that is not aligned with the model axes.
+    '''
+    def __init__(self, bone_mapping:dict, rest_offsets:dict=None, axes='x,y,z', rest_rotations:dict=None):
+        self.bone_mapping = bone_mapping
+        self.rest_offsets = rest_offsets or {}
+        self.axes = get_axes_matrix(axes)
+        self.rest_rotations = rest_rotations or {}
+
+class Retargeter:
+    '''Maps joint rotations onto a TargetRig with correction rotations precomputed once per rig.
+
+    With B the rig axes and K_j the rotation that takes the rig's rest offsets of the children of
+    joint j onto B @ OFFSETS, the rig rotation of j is
+        Q_j = (K_parent^T B) @ R_j @ (B^T K_j)
+    so every frame only costs one fixed pre/post product per bone.
+    '''
+    def __init__(self, rig:TargetRig):
+        self.rig = rig
+        self.bones = list(rig.bone_mapping)
+        self.joint_index = np.array([JOINT_INDEX[joint] for joint in rig.bone_mapping.values()])
+
+        B = rig.axes
+        joint_to_bone = {joint: bone for bone, joint in rig.bone_mapping.items()}
+        target_offsets = OFFSET_ARRAY @ B.T
+        for joint, bone in joint_to_bone.items():
+            if bone in rig.rest_offsets:
+                target_offsets[JOINT_INDEX[joint]] = rig.rest_offsets[bone]
+
+        corrections = np.tile(np.eye(3), (len(JOINTS), 1, 1))
+        for joint_idx in range(len(JOINTS)):
+            children = np.flatnonzero(PARENT_INDEX == joint_idx)
+            if len(children):
+                corrections[joint_idx] = align_rotation(target_offsets[children], OFFSET_ARRAY[children] @ B.T)
+
+        parents = PARENT_INDEX[self.joint_index]
+        parent_corrections = np.where((parents >= 0)[:, None, None], corrections[parents], np.eye(3))
+        self.pre_rotations = np.swapaxes(parent_corrections, -1, -2) @ B
+        self.post_rotations = B.T @ corrections[self.joint_index]
+
+        for bone_idx, bone in enumerate(self.bones):
+            if bone in rig.rest_rotations:
+                rest_rotation = np.asarray(rig.rest_rotations[bone], dtype=np.float64)
+                self.pre_rotations[bone_idx] = rest_rotation.T @ self.pre_rotations[bone_idx]
+                self.post_rotations[bone_idx] = self.post_rotations[bone_idx] @ rest_rotation
+
+    def retarget_rotations(self, local_rotations)->np.ndarray:
+        # (..., J, 3, 3) joint rotations, e.g. from calculate_local_rotations, to (..., N, 3, 3) rig bone rotations
+        return self.pre_rotations @ local_rotations[..., self.joint_index, :, :] @ self.post_rotations
+
+    def retarget_angles(self, angles)->np.ndarray:
+        # (..., J, 3) ZXY angles as returned by calculate_keypoint_angles
+        angles = Skeleton.as_skeleton(angles).data
+        return self.retarget_rotations(utils.get_R_ZXY(angles))
+
+    def retarget_quaternions(self, local_rotations)->np.ndarray:
+        # (..., N, 4) [x, y, z, w] rig bone quaternions
+        return utils.R_to_quat(self.retarget_rotations(local_rotations))
+
+    def to_dict(self, bone_values)->dict:
+        # {rig bone name: value} for the last two (or one) dimensions of a single frame
+        return {bone: bone_values[bone_idx] for bone_idx, bone in enumerate(self.bones)}
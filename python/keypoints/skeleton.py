@@ -0,0 +1,126 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+HIERARCHY = {
+    'hips': [],
+    'lefthip': ['hips'], 'leftknee': ['lefthip', 'hips'], 'leftfoot': ['leftknee', 'lefthip', 'hips'],
+    'righthip': ['hips'], 'rightknee': ['righthip', 'hips'], 'rightfoot': ['rightknee', 'righthip', 'hips'],
+    'neck': ['hips'],
+    'leftshoulder': ['neck', 'hips'], 'leftelbow': ['leftshoulder', 'neck', 'hips'], 'leftwrist': ['leftelbow', 'leftshoulder', 'neck', 'hips'],
+    'rightshoulder': ['neck', 'hips'], 'rightelbow': ['rightshoulder', 'neck', 'hips'], 'rightwrist': ['rightelbow', 'rightshoulder', 'neck', 'hips']
+}
+
+OFFSETS = {
+    'hips': np.array([0, 0, 0]),
+    'lefthip': np.array([1, 0, 0]), 'leftknee': np.array([0, -1, 0]), 'leftfoot': np.array([0, -1, 0]),
+    'righthip': np.array([-1, 0, 0]), 'rightknee': np.array([0, -1, 0]), 'rightfoot': np.array([0, -1, 0]),
+    'neck': np.array([0, 1, 0]),
+    'leftshoulder': np.array([1, 0, 0]), 'leftelbow': np.array([1, 0, 0]), 'leftwrist': np.array([1, 0, 0]),
+    'rightshoulder': np.array([-1,0,0]), 'rightelbow': np.array([-1,0,0]), 'rightwrist': np.array([-1,0,0])
+}
+
+# fixed joint order used by every array-backed skeleton, (..., J, 3)
+JOINTS = list(HIERARCHY.keys())
+JOINT_INDEX = {joint: idx for idx, joint in enumerate(JOINTS)}
+ROOT_JOINT = 'hips'
+# index of the direct parent of every joint, -1 for the root
+PARENT_INDEX = np.array([JOINT_INDEX[HIERARCHY[joint][0]] if HIERARCHY[joint] else -1 for joint in JOINTS])
+# every joint with a parent names the bone that ends at it
+BONES = [joint for joint in JOINTS if HIERARCHY[joint]]
+OFFSET_ARRAY = np.stack([OFFSETS[joint] for joint in JOINTS]).astype(np.float64)
+
+class HierarchyPlan:
+    '''HIERARCHY compiled once into index arrays that can be executed level by level.
+
+    depth_levels[d] holds the joints with d ancestors and their direct parents, so walking the
+    levels in order visits every parent before its children.
+    angle_levels[d] holds the (joint, parent, grandparent) steps that solve the rotation of the
+    joints at depth d + 1 from their child bones. Only the rotations of depth_levels[:d + 1] are
+    read by those steps. When several children write the rotation of the same parent only the
+    last one in HIERARCHY order is kept, since earlier writes would be overwritten anyway.
+    '''
+    def __init__(self, hierarchy:dict=HIERARCHY):
+        self.hierarchy = hierarchy
+        index = {joint: idx for idx, joint in enumerate(hierarchy)}
+        depths = {joint: len(ancestors) for joint, ancestors in hierarchy.items()}
+        self.max_depth = max(depths.values())
+
+        self.depth_levels = []
+        for depth in range(self.max_depth + 1):
+            nodes = [joint for joint in hierarchy if depths[joint] == depth]
+            parents = [index[hierarchy[joint][0]] if depth else -1 for joint in nodes]
+            self.depth_levels.append((np.array([index[joint] for joint in nodes]), np.array(parents)))
+
+        self.angle_levels = []
+        for depth in range(2, self.max_depth + 1):
+            steps = {}
+            for joint, ancestors in hierarchy.items():
+                if len(ancestors) == depth:
+                    steps[ancestors[0]] = (index[joint], index[ancestors[0]], index[ancestors[1]])
+            self.angle_levels.append(tuple(np.array(column) for column in zip(*steps.values())))
+
+PLAN = HierarchyPlan(HIERARCHY)
+
+class Skeleton(Mapping):
+    '''Keypoints of one or many frames stored in a single contiguous (..., J, 3) float array.
+
+    Indexing with a joint name returns a view into the array, so the skeleton can be used
+    wherever the scripts expect a dict of 3-vectors.
+    '''
+    def __init__(self, data=None, batch_shape=()):
+        if data is None:
+            data = np.zeros(tuple(batch_shape) + (len(JOINTS), 3))
+        self.data = np.ascontiguousarray(data, dtype=np.float64)
+        if self.data.shape[-2:] != (len(JOINTS), 3):
+            raise ValueError(f'Expected keypoints of shape (..., {len(JOINTS)}, 3) but got {self.data.shape}')
+
+    @classmethod
+    def from_dict(cls, kpts:dict, out=None):
+        # joints missing from the dict (e.g. neck and hips before they are added) are zero
+        first = next(iter(kpts.values()))
+        if out is None:
+            out = cls(batch_shape=np.shape(first)[:-1])
+        else:
+            out.data[...] = 0
+        for joint, kpt in kpts.items():
+            out[joint] = kpt
+        return out
+
+    @classmethod
+    def as_skeleton(cls, kpts):
+        # skeletons are returned as is, (..., J, 3) arrays are wrapped without copying
+        if isinstance(kpts, cls):
+            return kpts
+        if isinstance(kpts, np.ndarray):
+            return cls(kpts)
+        return cls.from_dict(kpts)
+
+    @property
+    def batch_shape(self):
+        return self.data.shape[:-2]
+
+    def copy(self, out=None):
+        if out is None:
+            return Skeleton(self.data.copy())
+        out.data[...] = self.data
+        return out
+
+    def to_dict(self)->dict:
+        # the values are views, writing into them updates the skeleton
+        return {joint: self[joint] for joint in JOINTS}
+
+    def __getitem__(self, joint):
+        return self.data[..., JOINT_INDEX[joint], :]
+
+    def __setitem__(self, joint, value):
+        self.data[..., JOINT_INDEX[joint], :] = value
+
+    def __iter__(self):
+        return iter(JOINTS)
+
+    def __len__(self):
+        return len(JOINTS)
+
+    def __repr__(self):
+        return f'Skeleton(batch_shape={self.batch_shape})'
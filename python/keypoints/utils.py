@@ -3,30 +3,62 @@ link: https://github.com/TemugeB/joint_angles_calculate/blob/main/utils.py
 '''
 import numpy as np
 
+# every function below broadcasts over leading dimensions: (..., 3) vectors, (...,) angles, (..., 3, 3) matrices
 def magnitude(v):
-    return np.sqrt(v.dot(v))
+    return np.sqrt(np.sum(np.square(v), axis=-1))
 
 def calculate_unit_vector(pnt1, pnt2):
     vect = np.subtract(pnt1, pnt2)
-    return vect / magnitude(vect)
+    return vect / magnitude(vect)[..., None]
+
+def skew(v):
+    # cross product matrix, skew(a) @ b == np.cross(a, b)
+    vx = np.zeros(np.shape(v)[:-1] + (3, 3))
+    vx[..., 0, 1], vx[..., 0, 2] = -v[..., 2], v[..., 1]
+    vx[..., 1, 0], vx[..., 1, 2] = v[..., 2], -v[..., 0]
+    vx[..., 2, 0], vx[..., 2, 1] = -v[..., 1], v[..., 0]
+    return vx
 
 # general rotation matrices
 def get_R_x(theta):
-    R = np.array([[1, 0, 0],
-                  [0, np.cos(theta), -np.sin(theta)],
-                  [0, np.sin(theta),  np.cos(theta)]])
+    c, s = np.cos(theta), np.sin(theta)
+    R = np.zeros(np.shape(theta) + (3, 3))
+    R[..., 0, 0] = 1
+    R[..., 1, 1], R[..., 1, 2] = c, -s
+    R[..., 2, 1], R[..., 2, 2] = s, c
     return R
 
 def get_R_y(theta):
-    R = np.array([[np.cos(theta), 0, np.sin(theta)],
-                  [0, 1, 0],
-                  [-np.sin(theta), 0,  np.cos(theta)]])
+    c, s = np.cos(theta), np.sin(theta)
+    R = np.zeros(np.shape(theta) + (3, 3))
+    R[..., 0, 0], R[..., 0, 2] = c, s
+    R[..., 1, 1] = 1
+    R[..., 2, 0], R[..., 2, 2] = -s, c
     return R
 
 def get_R_z(theta):
-    R = np.array([[np.cos(theta), -np.sin(theta), 0],
-                  [np.sin(theta), np.cos(theta), 0],
-                  [0, 0, 1]])
+    c, s = np.cos(theta), np.sin(theta)
+    R = np.zeros(np.shape(theta) + (3, 3))
+    R[..., 0, 0], R[..., 0, 1] = c, -s
+    R[..., 1, 0], R[..., 1, 1] = s, c
+    R[..., 2, 2] = 1
+    return R
+
+# Rz @ Rx @ Ry for angles stored as [z, x, y], written out to avoid the two matrix products
+def get_R_ZXY(angles):
+    angles = np.asarray(angles)
+    cz, cx, cy = np.cos(angles[..., 0]), np.cos(angles[..., 1]), np.cos(angles[..., 2])
+    sz, sx, sy = np.sin(angles[..., 0]), np.sin(angles[..., 1]), np.sin(angles[..., 2])
+    R = np.empty(angles.shape[:-1] + (3, 3))
+    R[..., 0, 0] = cz*cy - sz*sx*sy
+    R[..., 0, 1] = -sz*cx
+    R[..., 0, 2] = cz*sy + sz*sx*cy
+    R[..., 1, 0] = sz*cy + cz*sx*sy
+    R[..., 1, 1] = cz*cx
+    R[..., 1, 2] = sz*sy - cz*sx*cy
+    R[..., 2, 0] = -cx*sy
+    R[..., 2, 1] = sx
+    R[..., 2, 2] = cx*cy
     return R
 
 
@@ -64,37 +96,107 @@ def Get_R(A,B):
 def Get_R2(A, B):
 
     # get unit vectors
-    uA = A/np.sqrt(np.sum(np.square(A)))
-    uB = B/np.sqrt(np.sum(np.square(B)))
+    uA = A/np.sqrt(np.sum(np.square(A), axis=-1, keepdims=True))
+    uB = B/np.sqrt(np.sum(np.square(B), axis=-1, keepdims=True))
 
     v = np.cross(uA, uB)
-    s = np.sqrt(np.sum(np.square(v)))
-    c = np.sum(uA * uB)
+    c = np.sum(uA * uB, axis=-1)
 
-    vx = np.array([[0, -v[2], v[1]],
-                   [v[2], 0, -v[0]],
-                   [-v[1], v[0], 0]])
+    vx = skew(v)
 
-    R = np.eye(3) + vx + vx@vx*((1-c)/s**2)
+    # (1-c)/s**2 == 1/(1+c), which stays finite for parallel vectors where s == 0
+    opposite = 1 + c < 1e-12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = 1 / (1 + c)
+    scale = np.where(opposite, 0, scale)
+    R = np.eye(3) + vx + vx@vx*scale[..., None, None]
+
+    # opposite vectors: half turn around any axis perpendicular to A
+    if np.any(opposite):
+        n = perpendicular_unit_vector(uA[opposite])
+        R[opposite] = 2 * n[..., :, None] * n[..., None, :] - np.eye(3)
 
     return R
 
+def perpendicular_unit_vector(v):
+    # cross with the coordinate axis least aligned with v
+    axis = np.zeros(np.shape(v))
+    np.put_along_axis(axis, np.argmin(np.abs(v), axis=-1)[..., None], 1, axis=-1)
+    n = np.cross(v, axis)
+    return n / magnitude(n)[..., None]
+
 
 # decomposes given R matrix into rotation along each axis. In this case Rz @ Ry @ Rx
 def Decompose_R_ZYX(R):
 
     # decomposes as RzRyRx. Note the order: ZYX <- rotation by x first
-    thetaz = np.arctan2(R[1,0], R[0,0])
-    thetay = np.arctan2(-R[2,0], np.sqrt(R[2,1]**2 + R[2,2]**2))
-    thetax = np.arctan2(R[2,1], R[2,2])
+    thetaz = np.arctan2(R[..., 1,0], R[..., 0,0])
+    thetay = np.arctan2(-R[..., 2,0], np.sqrt(R[..., 2,1]**2 + R[..., 2,2]**2))
+    thetax = np.arctan2(R[..., 2,1], R[..., 2,2])
 
     return thetaz, thetay, thetax
 
 def Decompose_R_ZXY(R):
 
     # decomposes as RzRXRy. Note the order: ZXY <- rotation by y first
-    thetaz = np.arctan2(-R[0,1], R[1,1])
-    thetay = np.arctan2(-R[2,0], R[2,2])
-    thetax = np.arctan2(R[2,1], np.sqrt(R[2,0]**2 + R[2,2]**2))
+    thetaz = np.arctan2(-R[..., 0,1], R[..., 1,1])
+    thetay = np.arctan2(-R[..., 2,0], R[..., 2,2])
+    thetax = np.arctan2(R[..., 2,1], np.sqrt(R[..., 2,0]**2 + R[..., 2,2]**2))
+
+    return thetaz, thetay, thetax
+
 
-    return thetaz, thetay, thetax
\ No newline at end of file
+# quaternions are stored as [x, y, z, w], the same order as Godot's Quat and scipy's as_quat
+def R_to_quat(R):
+
+    # Shepperd's method: build the quaternion from the largest of its squared components
+    R = np.asarray(R)
+    trace = R[..., 0,0] + R[..., 1,1] + R[..., 2,2]
+    decision = np.stack([R[..., 0,0], R[..., 1,1], R[..., 2,2], trace], axis=-1)
+
+    candidates = np.empty(R.shape[:-2] + (4, 4))
+    for i in range(3):
+        j, k = (i + 1) % 3, (i + 2) % 3
+        candidates[..., i, i] = 1 - trace + 2 * R[..., i,i]
+        candidates[..., i, j] = R[..., j,i] + R[..., i,j]
+        candidates[..., i, k] = R[..., k,i] + R[..., i,k]
+        candidates[..., i, 3] = R[..., k,j] - R[..., j,k]
+    candidates[..., 3, 0] = R[..., 2,1] - R[..., 1,2]
+    candidates[..., 3, 1] = R[..., 0,2] - R[..., 2,0]
+    candidates[..., 3, 2] = R[..., 1,0] - R[..., 0,1]
+    candidates[..., 3, 3] = 1 + trace
+
+    choice = np.argmax(decision, axis=-1)[..., None, None]
+    q = np.take_along_axis(candidates, choice, axis=-2)[..., 0, :]
+    return q / magnitude(q)[..., None]
+
+def rotvec_to_quat(rotvec):
+
+    # sin(angle/2)/angle written with np.sinc so that a zero rotation vector stays finite
+    rotvec = np.asarray(rotvec, dtype=np.float64)
+    angle = magnitude(rotvec)
+    xyz = rotvec * (0.5 * np.sinc(angle / (2 * np.pi)))[..., None]
+    return np.concatenate([xyz, np.cos(angle / 2)[..., None]], axis=-1)
+
+def quat_slerp(q0, q1, t):
+
+    # spherical interpolation between (..., 4) quaternions, t broadcasts against the leading dimensions
+    q0 = q0 / magnitude(q0)[..., None]
+    q1 = q1 / magnitude(q1)[..., None]
+    t = np.asarray(t, dtype=np.float64)[..., None]
+
+    # q and -q are the same rotation, go the short way around
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1, 1))
+    sin_theta = np.sin(theta)
+    # nearly identical quaternions fall back to a normalized lerp
+    close = sin_theta < 1e-6
+    safe_sin_theta = np.where(close, 1, sin_theta)
+    w0 = np.where(close, 1 - t, np.sin((1 - t) * theta) / safe_sin_theta)
+    w1 = np.where(close, t, np.sin(t * theta) / safe_sin_theta)
+
+    q = w0 * q0 + w1 * q1
+    return q / magnitude(q)[..., None]
@@ -3,44 +3,100 @@ import cv2
 
 from src.webcam import Webcam
 from src.preprocessing import resize_and_pad
-from src.postprocessing import calculate_face_angles
-from src.pose_model import Movenet
-from src.depth_model import Midas
-from src.face_model import BlazeFaceDetector
+from src.postprocessing import calculate_face_angles, calculate_arm_angles
+from src.depth_model import DepthWorker
+from src.model_registry import ModelRegistry
 from src.networking import GodotUDPClient
 from src.utils import draw_keypoints
+from src.keypoint_stream import KeypointStream
+from src.face_tracking import FaceBoxTracker
+from src.cropping import CropRegionTracker, init_crop_region, frame_to_crop
 
 import time
 
+# models run at INFERENCE_RATE, keypoints are interpolated/extrapolated up to OUTPUT_RATE
+INFERENCE_RATE = 10
+OUTPUT_RATE = 60
+# output lags by one inference period, so output times fall between two inferred frames and are
+# interpolated instead of extrapolated
+OUTPUT_DELAY = 1 / INFERENCE_RATE
+# models of src.model_registry.MODELS
+MOVENET_MODEL = 'movenet_lightning'
+FACE_MODEL = 'blaze_face_back'
+# track everyone in the frame, angles are sent per person
+MULTIPOSE = False
+MULTIPOSE_MODEL = 'movenet_multipose'
+# relative keypoint depth from Midas, recomputed DEPTH_RATE times per second in the background
+ESTIMATE_DEPTH = False
+DEPTH_RATE = 2
+DEPTH_MODEL = 'midas'
+
+def get_model_names():
+    names = [MULTIPOSE_MODEL if MULTIPOSE else MOVENET_MODEL, FACE_MODEL]
+    return names + [DEPTH_MODEL] if ESTIMATE_DEPTH else names
+
 def put_text_on_image(image, text):
     font = cv2.FONT_HERSHEY_SIMPLEX
     cv2.putText(image, text, (10,10), font, 0.5, (0, 255, 0), 2, cv2.LINE_AA)
     return image
 
 if __name__ == '__main__':
-    cam = Webcam()
+    cam = Webcam(threaded=True)
     cam.start_capture()
 
-    model_keypoints = Movenet('models\movenet_float16\lite-model_movenet_singlepose_lightning_tflite_float16_4.tflite')
-    model_face = BlazeFaceDetector(type="back")
+    # loaded in parallel and warmed up while the camera starts
+    registry = ModelRegistry()
+    model_keypoints, model_face, *model_depth = registry.load(*get_model_names())
+    # the face box is reused and moved with the pose keypoints until they leave it
+    face_tracker = FaceBoxTracker(model_face)
 
     client = GodotUDPClient()
+    keypoint_stream = KeypointStream(inference_rate=INFERENCE_RATE, output_rate=OUTPUT_RATE, delay=OUTPUT_DELAY)
+    # single pose input is cropped around the body found in the previous inference, at the model's
+    # input size (192 for Lightning, 256 for Thunder)
+    crop_tracker = None if MULTIPOSE else CropRegionTracker(input_size=int(model_keypoints.input_details[0]['shape'][1]))
+    face_angles = [0, 0, 0]
+    depth_worker = DepthWorker(model_depth[0], rate=DEPTH_RATE) if ESTIMATE_DEPTH else None
+    if depth_worker:
+        depth_worker.start()
 
     while True:
-        frame = cam.grab_frame()
+        frame, now = cam.grab_frame_with_timestamp()
+        if frame is None:
+            continue
         frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
         keypoint_frame = resize_and_pad(frame)
-        keypoints = model_keypoints.predict(keypoint_frame)[0][0]
+        if depth_worker:
+            # copied, keypoints are drawn onto keypoint_frame below
+            depth_worker.submit(keypoint_frame.copy(), now)
+        if keypoint_stream.should_infer(now):
+            if MULTIPOSE:
+                keypoint_stream.push(model_keypoints.predict(keypoint_frame).keypoints, now)
+                results = model_face.detectFaces(keypoint_frame)
+            else:
+                # cropped from the full resolution frame, then mapped to the letterboxed frame the face model sees
+                prediction = model_keypoints.predict(crop_tracker.crop(frame), copy=True)[0][0]
+                letterbox = init_crop_region(*frame.shape[:2])
+                inferred_keypoints = frame_to_crop(crop_tracker.update(prediction), letterbox)
+                keypoint_stream.push(inferred_keypoints, now)
+                results = face_tracker.detect(keypoint_frame, inferred_keypoints)
+        keypoints = keypoint_stream.get(now)
         frame = draw_keypoints(keypoint_frame, keypoints)
-
-        results = model_face.detectFaces(keypoint_frame)
         model_face.drawDetections(frame, results)
-        
-        face_angles = calculate_face_angles(keypoints, results, in_rads=True)
-        client.send_message(face_angles)
+
+        if keypoint_stream.should_output(now):
+            face_angles = calculate_face_angles(keypoints, results, in_rads=True)
+            if MULTIPOSE:
+                client.send_people(face_angles, calculate_arm_angles(keypoints))
+            else:
+                client.send_message(face_angles)
 
         text = f'{face_angles}'
+        if depth_worker and keypoints is not None:
+            keypoint_depth = depth_worker.sample(keypoints)
+            if keypoint_depth is not None:
+                text += f' nose depth: {float(keypoint_depth[..., 0, 0].mean()):.2f}'
         frame = cv2.resize(frame, (480, 480))
 
         frame = put_text_on_image(frame, text)        
@@ -51,5 +107,10 @@ if __name__ == '__main__':
             break
 
     cam.stop_capture()
+    if depth_worker:
+        depth_worker.stop()
+    print('Capture stats:', cam.get_stats())
+    print('Face detection stats:', face_tracker.get_stats())
+    print('Model stats:', registry.get_stats())
     cv2.destroyAllWindows()
 # %%
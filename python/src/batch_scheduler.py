@@ -0,0 +1,63 @@
+import threading
+import time
+
+import numpy as np
+
+class BatchScheduler:
+    '''Groups frames from several sources (e.g. cameras) into one model batch.
+
+    Only the newest frame of each source is kept. A batch is released once every slot is filled
+    (max_batch_size frames from different sources) or when its oldest slot has waited `deadline`
+    seconds, so a slow or stalled source never delays the others by more than the deadline. A slot
+    keeps the time it first became pending when its frame is replaced, so fast sources can't keep
+    pushing the deadline back.
+    submit() is thread-safe and can be called from each source's capture thread.
+    '''
+    def __init__(self, max_batch_size=4, deadline=0.02):
+        self.max_batch_size = max_batch_size
+        self.deadline = deadline
+        self.pending = {} # source -> (time the slot became pending, frame timestamp, frame)
+        self.frames_replaced = 0
+        self._lock = threading.Lock()
+
+    def submit(self, source, frame, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            pending_since = timestamp
+            if source in self.pending:
+                # a newer frame of the same source supersedes the one still waiting
+                self.frames_replaced += 1
+                pending_since = self.pending[source][0]
+            self.pending[source] = (pending_since, timestamp, frame)
+
+    def ready(self, timestamp=None)->bool:
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            return self._ready(timestamp)
+
+    def _ready(self, timestamp):
+        if not self.pending:
+            return False
+        oldest = min(pending_since for pending_since, _, _ in self.pending.values())
+        return len(self.pending) >= self.max_batch_size or timestamp - oldest >= self.deadline
+
+    def pop_batch(self, timestamp=None):
+        # (sources, (N, H, W, C) frames, timestamps) of the oldest pending frames, None when not ready
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            if not self._ready(timestamp):
+                return None
+            sources = sorted(self.pending, key=lambda source: self.pending[source][0])[:self.max_batch_size]
+            entries = [self.pending.pop(source) for source in sources]
+        timestamps = [t for _, t, _ in entries]
+        return sources, np.stack([frame for _, _, frame in entries]), timestamps
+
+    def run(self, predict_batch, timestamp=None)->dict:
+        # {source: (prediction, frame timestamp)} for a released batch, empty when nothing is due
+        batch = self.pop_batch(timestamp)
+        if batch is None:
+            return {}
+        sources, frames, timestamps = batch
+        # copied, so that no view into the model's output outlives the batch
+        predictions = np.array(predict_batch(frames))
+        return {source: (prediction, t) for source, prediction, t in zip(sources, predictions, timestamps)}
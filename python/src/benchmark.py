@@ -0,0 +1,247 @@
+'''Per-frame latency and allocation benchmarks for the src pipeline stages.
+
+usage: python -m src.benchmark preprocessing [--image data/imgs/img0.jpg]
+       python -m src.benchmark startup
+       python -m src.benchmark models [--source data/imgs] [--threads 1 2 4] [--reference movenet=movenet_thunder]
+                                      [--output report.json]
+'''
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from keypoints.benchmark import time_operation, peak_allocation
+from src.preprocessing import MIDAS_MEAN, MIDAS_STD, midas_preprocessor, blaze_face_preprocessor, resize_and_pad
+
+def _legacy_preprocessors():
+    # the TensorFlow versions the preprocessors replaced, only measured when TensorFlow is installed
+    import tensorflow as tf
+
+    def midas(image):
+        img_resized = tf.image.resize(image, [256,256], method='bicubic', preserve_aspect_ratio=False)
+        img_input = (img_resized.numpy() - MIDAS_MEAN) / MIDAS_STD
+        return tf.convert_to_tensor(img_input.reshape(1,256,256,3), dtype=tf.float32)
+
+    def blaze_face(image, size=256):
+        img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) / 255.0
+        img_resized = tf.image.resize(img, [size,size], method='bicubic', preserve_aspect_ratio=False)
+        img_input = (img_resized.numpy() - 0.5) / 0.5
+        return tf.convert_to_tensor(img_input.reshape(1,size,size,3), dtype=tf.float32)
+
+    return {'midas': midas, 'blaze_face': blaze_face}
+
+def _measure(operation, min_time):
+    operation() # warm-up
+    return {
+        'latency_ms': time_operation(operation, min_time) * 1000,
+        'peak_bytes': peak_allocation(operation),
+    }
+
+def benchmark_preprocessing(image, min_time:float=0.5)->dict:
+    preprocessors = {
+        'midas': midas_preprocessor(),
+        'blaze_face': blaze_face_preprocessor(256, 256),
+    }
+    results = {name: {'after': _measure(lambda p=preprocessor: p(image), min_time)}
+               for name, preprocessor in preprocessors.items()}
+
+    try:
+        legacy = _legacy_preprocessors()
+    except ImportError:
+        legacy = {}
+    for name, preprocessor in legacy.items():
+        results[name]['before'] = _measure(lambda p=preprocessor: p(image), min_time)
+        results[name]['max_abs_difference'] = float(np.max(np.abs(
+            np.asarray(preprocessor(image)) - preprocessors[name](image))))
+    return results
+
+HEAVY_MODULES = ['tensorflow', 'tflite_runtime', 'scipy', 'mediapipe']
+
+# run in a fresh interpreter, so that nothing is already imported or cached
+_STARTUP_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import main_old
+result = {'import_s': time.perf_counter() - start}
+registry = main_old.ModelRegistry()
+names = main_old.get_model_names()
+if all(registry.path(name).exists() for name in names):
+    from src.interpreter import get_backend
+    tic = time.perf_counter()
+    registry.load(*names)
+    result['model_load_s'] = time.perf_counter() - tic
+    result['models'] = registry.get_stats()
+    result['backend'] = get_backend()
+result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+result['heavy_modules'] = sorted(m for m in %r if m in sys.modules)
+print(json.dumps(result))
+'''
+
+def benchmark_startup()->dict:
+    # cold start of the main_old.py pipeline: imports, model loading (when the models are present) and peak RSS
+    output = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT % HEAVY_MODULES],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+DEFAULT_REFERENCES = {'movenet': 'movenet_thunder', 'blaze_face': 'blaze_face_back', 'midas': 'midas'}
+
+def load_frames(source, max_frames:int=None)->list:
+    # BGR frames of a directory of images (sorted by name) or of a video file
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(path for path in source.iterdir() if path.suffix.lower() in IMAGE_EXTENSIONS)
+        frames = [cv2.imread(str(path)) for path in paths[:max_frames]]
+    else:
+        vid = cv2.VideoCapture(str(source))
+        frames = []
+        while max_frames is None or len(frames) < max_frames:
+            ret, frame = vid.read()
+            if not ret:
+                break
+            frames.append(frame)
+        vid.release()
+    if not frames:
+        raise FileNotFoundError(f'No frames found in {source}')
+    return frames
+
+def keypoint_agreement(keypoints, reference, min_score:float=0.2, threshold:float=0.05)->dict:
+    # (N, 17, 3) keypoints against the reference's, over the keypoints confident in both.
+    # pck: fraction closer than threshold (in normalized image coordinates)
+    keypoints, reference = np.asarray(keypoints), np.asarray(reference)
+    confident = (keypoints[..., 2] > min_score) & (reference[..., 2] > min_score)
+    distances = np.linalg.norm(keypoints[..., :2] - reference[..., :2], axis=-1)[confident]
+    return {
+        'mean_distance': float(distances.mean()) if distances.size else None,
+        'pck': float((distances < threshold).mean()) if distances.size else None,
+        'confident_fraction': float(confident.mean()),
+    }
+
+def box_iou(box, reference)->float:
+    # two (x1, y1, x2, y2) boxes
+    top_left, bottom_right = np.maximum(box[:2], reference[:2]), np.minimum(box[2:], reference[2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None))
+    union = np.prod(box[2:] - box[:2]) + np.prod(reference[2:] - reference[:2]) - intersection
+    return float(intersection / union) if union > 0 else 0.
+
+def box_agreement(boxes, reference)->dict:
+    # best face box per frame (None without a face) against the reference's
+    found = np.array([box is not None for box in boxes])
+    reference_found = np.array([box is not None for box in reference])
+    ious = [box_iou(box, ref) for box, ref in zip(boxes, reference) if box is not None and ref is not None]
+    return {
+        'detection_agreement': float((found == reference_found).mean()),
+        'mean_iou': float(np.mean(ious)) if ious else None,
+    }
+
+def depth_agreement(depth_maps, reference)->dict:
+    # depth is relative, so maps are compared by correlation
+    correlations = [float(np.corrcoef(np.ravel(depth), np.ravel(ref))[0, 1]) for depth, ref in zip(depth_maps, reference)]
+    return {'mean_correlation': float(np.mean(correlations))}
+
+AGREEMENT = {'movenet': keypoint_agreement, 'blaze_face': box_agreement, 'midas': depth_agreement}
+
+def _predict(family, model, frame):
+    # the output kept per frame for the agreement, copied out of the interpreter
+    if family == 'movenet':
+        return model.predict(frame, copy=True)[0, 0]
+    if family == 'blaze_face':
+        results = model.detectFaces(frame)
+        return results.boxes[np.argmax(results.scores)].copy() if len(results.scores) else None
+    return model.predict_depth(frame, copy=True)
+
+def _prepare(family, model, frames):
+    # model input frames, prepared outside the timed section when the pipeline does it separately
+    if family == 'movenet':
+        height, width = model.input_details[0]['shape'][1:3]
+        return [resize_and_pad(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), (width, height)) for frame in frames]
+    return frames
+
+def _run_variant(family, model, frames, repeats:int):
+    outputs, latencies = [], []
+    for repeat in range(repeats):
+        for frame in frames:
+            tic = time.perf_counter()
+            output = _predict(family, model, frame)
+            latencies.append(time.perf_counter() - tic)
+            if repeat == 0:
+                outputs.append(output)
+    latencies = np.array(latencies) * 1000
+    return outputs, {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'fps': float(1000 * len(latencies) / latencies.sum()),
+    }
+
+def benchmark_models(frames, thread_counts=(1,), references:dict=None, variants=None, repeats:int=1)->dict:
+    # latency per variant and thread count, plus agreement of the outputs with each family's reference variant
+    from src.model_registry import FAMILIES, ModelRegistry
+    from src.interpreter import get_backend
+
+    references = {**DEFAULT_REFERENCES, **(references or {})}
+    report = {'frames': len(frames), 'thread_counts': list(thread_counts), 'references': references,
+              'variants': {}, 'missing': []}
+    outputs = {}
+    for family, names in FAMILIES.items():
+        for name in names:
+            if variants and name not in variants:
+                continue
+            if not ModelRegistry().path(name).exists():
+                report['missing'].append(name)
+                continue
+            result = {'family': family, 'model_path': str(ModelRegistry().path(name)), 'threads': {}}
+            for num_threads in thread_counts:
+                registry = ModelRegistry(num_threads=num_threads)
+                model = registry.get(name)
+                outputs[name], latency = _run_variant(family, model, _prepare(family, model, frames), repeats)
+                stats = registry.get_stats()[name]
+                latency['invoke_p50_ms'] = stats['p50'] * 1000
+                result['threads'][str(num_threads)] = latency
+                result['load_time'] = stats['load_time']
+                result['warm_up_time'] = stats['warm_up_time']
+            report['variants'][name] = result
+
+    for name, result in report['variants'].items():
+        reference = references.get(result['family'])
+        if reference in outputs:
+            result['agreement'] = {'reference': reference, **AGREEMENT[result['family']](outputs[name], outputs[reference])}
+    if report['variants']:
+        report['backend'] = get_backend()
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the src pipeline stages.')
+    parser.add_argument('stage', choices=['preprocessing', 'startup', 'models'])
+    parser.add_argument('--image', default='data/imgs/img0.jpg')
+    parser.add_argument('--source', default='data/imgs', help='directory of images or video file for the models stage')
+    parser.add_argument('--max-frames', type=int, default=100)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--repeats', type=int, default=1, help='passes over the frames per thread count')
+    parser.add_argument('--variants', nargs='+', help='only these model names')
+    parser.add_argument('--reference', nargs='+', default=[], help='family=model pairs, e.g. movenet=movenet_thunder')
+    parser.add_argument('--output', type=Path, help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    if args.stage == 'startup':
+        print(json.dumps(benchmark_startup(), indent=2))
+        sys.exit()
+    if args.stage == 'models':
+        references = dict(reference.split('=', 1) for reference in args.reference)
+        report = benchmark_models(load_frames(args.source, args.max_frames), args.threads, references,
+                                  args.variants, args.repeats)
+        report['source'] = args.source
+        print(json.dumps(report, indent=2))
+        if args.output:
+            args.output.write_text(json.dumps(report, indent=2) + '\n')
+        sys.exit()
+    image = cv2.imread(args.image)
+    if image is None:
+        raise FileNotFoundError(args.image)
+    print(json.dumps(benchmark_preprocessing(image), indent=2))
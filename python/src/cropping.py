@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+
+from .utils import KEYPOINT_MAPPING
+
+TORSO_JOINTS = [KEYPOINT_MAPPING[joint] for joint in ['left_shoulder', 'right_shoulder', 'left_hip', 'right_hip']]
+HIP_JOINTS = [KEYPOINT_MAPPING['left_hip'], KEYPOINT_MAPPING['right_hip']]
+
+def init_crop_region(image_height, image_width):
+    # [y_min, x_min, y_max, x_max] normalized to the frame: the whole frame, padded to a square
+    if image_width > image_height:
+        box_height, box_width = image_width / image_height, 1.
+        y_min, x_min = (image_height / 2 - image_width / 2) / image_height, 0.
+    else:
+        box_height, box_width = 1., image_height / image_width
+        y_min, x_min = 0., (image_width / 2 - image_height / 2) / image_width
+    return np.array([y_min, x_min, y_min + box_height, x_min + box_width])
+
+def torso_visible(keypoints, min_score=0.2):
+    # at least one hip and one shoulder
+    scores = keypoints[TORSO_JOINTS, 2]
+    return bool(scores[:2].max() > min_score and scores[2:].max() > min_score)
+
+def determine_crop_region(keypoints, image_height, image_width, min_score=0.2):
+    # square region around the body from (17, 3) frame-normalized keypoints, as in the MoveNet reference
+    if not torso_visible(keypoints, min_score):
+        return init_crop_region(image_height, image_width)
+
+    points = keypoints[:, :2] * [image_height, image_width] # pixels, (y, x)
+    center = points[HIP_JOINTS].mean(axis=0)
+    torso_range = np.abs(points[TORSO_JOINTS] - center).max(axis=0)
+    visible = keypoints[:, 2] > min_score
+    body_range = np.abs(points[visible] - center).max(axis=0)
+
+    crop_length_half = max(torso_range.max() * 1.9, body_range.max() * 1.2)
+    distances_to_border = np.concatenate([center, [image_height, image_width] - center])
+    crop_length_half = min(crop_length_half, distances_to_border.max())
+    if crop_length_half > max(image_height, image_width) / 2:
+        return init_crop_region(image_height, image_width)
+
+    corner = center - crop_length_half
+    return np.concatenate([corner, corner + 2 * crop_length_half]) / [image_height, image_width, image_height, image_width]
+
+def crop_and_resize(image, crop_region, size):
+    # (size, size) crop of the region, zero padded where it leaves the frame
+    image_height, image_width = image.shape[:2]
+    y_min, x_min, y_max, x_max = crop_region * [image_height, image_width, image_height, image_width]
+    scale_y, scale_x = (y_max - y_min) / size, (x_max - x_min) / size
+    # output pixel centers to frame pixel centers
+    M = np.array([[scale_x, 0, x_min + 0.5 * scale_x - 0.5],
+                  [0, scale_y, y_min + 0.5 * scale_y - 0.5]])
+    return cv2.warpAffine(image, M, (size, size), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+def crop_to_frame(keypoints, crop_region):
+    # keypoints normalized to the crop, [..., 17, 3], to keypoints normalized to the frame
+    y_min, x_min, y_max, x_max = crop_region
+    frame_keypoints = np.array(keypoints, dtype=np.float32)
+    frame_keypoints[..., 0] = y_min + (y_max - y_min) * frame_keypoints[..., 0]
+    frame_keypoints[..., 1] = x_min + (x_max - x_min) * frame_keypoints[..., 1]
+    return frame_keypoints
+
+def frame_to_crop(keypoints, crop_region):
+    # inverse of crop_to_frame, e.g. with init_crop_region for the letterboxed frame of resize_and_pad
+    y_min, x_min, y_max, x_max = crop_region
+    crop_keypoints = np.array(keypoints, dtype=np.float32)
+    crop_keypoints[..., 0] = (crop_keypoints[..., 0] - y_min) / (y_max - y_min)
+    crop_keypoints[..., 1] = (crop_keypoints[..., 1] - x_min) / (x_max - x_min)
+    return crop_keypoints
+
+class CropRegionTracker:
+    '''Crops the single pose model input around the body found in the previous frame.
+
+    crop() returns the model input taken from the current region of interest, update() maps the
+    predicted keypoints back to frame coordinates and moves the region for the next frame. The region
+    is exponentially smoothed with `smoothing` (0 follows the body immediately) and falls back to
+    the whole frame when the torso is lost.
+    '''
+    def __init__(self, input_size=192, smoothing=0.5, min_score=0.2):
+        self.input_size = input_size
+        self.smoothing = smoothing
+        self.min_score = min_score
+        self.reset()
+
+    def reset(self):
+        self.crop_region = None
+        self.image_shape = None
+
+    def crop(self, image):
+        image_shape = image.shape[:2]
+        if self.crop_region is None or image_shape != self.image_shape:
+            self.crop_region = init_crop_region(*image_shape)
+        self.image_shape = image_shape
+        return crop_and_resize(image, self.crop_region, self.input_size)
+
+    def update(self, keypoints):
+        # (17, 3) keypoints predicted on the last crop, returned normalized to the frame
+        frame_keypoints = crop_to_frame(keypoints, self.crop_region)
+        target = determine_crop_region(frame_keypoints, *self.image_shape, self.min_score)
+        if torso_visible(frame_keypoints, self.min_score):
+            self.crop_region = self.smoothing * self.crop_region + (1 - self.smoothing) * target
+        else:
+            self.crop_region = target
+        return frame_keypoints
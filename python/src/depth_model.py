@@ -1,19 +1,18 @@
-from numpy import outer
-import tensorflow as tf
-
-MEAN = [0.485, 0.456, 0.406]
-STD = [0.229, 0.224, 0.225]
-
-def format_image(image):
-    img_resized = tf.image.resize(image, [256,256], method='bicubic', preserve_aspect_ratio=False)
-    #img_resized = tf.transpose(img_resized, [2, 0, 1])
-    img_input = img_resized.numpy()
-    mean=[0.485, 0.456, 0.406]
-    std=[0.229, 0.224, 0.225]
-    img_input = (img_input - mean) / std
-    reshape_img = img_input.reshape(1,256,256,3)
-    tensor = tf.convert_to_tensor(reshape_img, dtype=tf.float32)
-    return tensor
+import threading
+import time
+
+import numpy as np
+
+from src.interpreter import load_interpreter, tensor_view, read_output
+from src.preprocessing import MIDAS_MEAN, MIDAS_STD, midas_preprocessor
+
+MEAN = MIDAS_MEAN
+STD = MIDAS_STD
+
+def format_image(image, preprocessor=None, out=None):
+    # (1, 256, 256, 3) float32, resized bicubic and normalized with MEAN/STD, into out when given
+    preprocessor = preprocessor or midas_preprocessor()
+    return preprocessor(image, out=out)
 
 def scale_image_values(image):
     depth_min = image.min()
@@ -22,20 +21,104 @@ def scale_image_values(image):
     return img_out
 
 class Midas:
-    def __init__(self, model_path):
+    def __init__(self, model_path, num_threads=None, latency=None):
         self.model_path = model_path
         # Initialize the TFLite interpreter
-        self.interpreter = tf.lite.Interpreter(model_path=model_path)
-        self.interpreter.allocate_tensors()
+        self.interpreter = load_interpreter(model_path, num_threads, latency)
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
         self.input_shape = self.input_details[0]['shape']
+        self.preprocessor = midas_preprocessor()
 
-    def predict(self, image):
-        tensor = format_image(image)
-        # TF Lite format expects tensor type of float32.
-        self.interpreter.set_tensor(self.input_details[0]['index'], tensor)
+    def warm_up(self):
+        # the first invoke prepares the kernels and is much slower than the following ones
         self.interpreter.invoke()
-        output = self.interpreter.get_tensor(self.output_details[0]['index'])
-        output = output.reshape(256, 256)
-        return scale_image_values(output)
\ No newline at end of file
+
+    def predict_depth(self, image, copy=True):
+        # raw (256, 256) float32 inverse relative depth, larger is closer. With copy=False it is a view of the
+        # output tensor that has to be released before the next prediction
+        format_image(image, self.preprocessor, out=tensor_view(self.interpreter, self.input_details[0]))
+        self.interpreter.invoke()
+        return read_output(self.interpreter, self.output_details[0], copy).reshape(256, 256)
+
+    def predict(self, image):
+        # scaled into a new array, the view is not kept
+        return scale_image_values(self.predict_depth(image, copy=False))
+
+def sample_depth(depth_map, keypoints):
+    # bilinear depth at [..., 17, 3] (y, x, confidence) keypoints normalized to the image the map was
+    # predicted on, returned as a [..., 17, 1] z-column
+    height, width = depth_map.shape
+    keypoints = np.asarray(keypoints)
+    # normalized coordinates to pixel centers, clamped to the map
+    y = np.clip(keypoints[..., 0] * height - 0.5, 0, height - 1)
+    x = np.clip(keypoints[..., 1] * width - 0.5, 0, width - 1)
+    y0 = np.minimum(y.astype(int), height - 2)
+    x0 = np.minimum(x.astype(int), width - 2)
+    dy, dx = y - y0, x - x0
+    top = depth_map[y0, x0] * (1 - dx) + depth_map[y0, x0 + 1] * dx
+    bottom = depth_map[y0 + 1, x0] * (1 - dx) + depth_map[y0 + 1, x0 + 1] * dx
+    return (top * (1 - dy) + bottom * dy)[..., None].astype(np.float32)
+
+class DepthWorker:
+    '''Runs a depth model in a background thread at a reduced rate.
+
+    submit() hands over the newest frame without blocking, the worker predicts at most `rate` times per
+    second on the newest frame it has, and latest()/sample() read the most recent depth map. Keypoints
+    sampled from a map are only as fresh as that map, see the timestamp returned by latest().
+    '''
+    def __init__(self, model, rate=2.):
+        self.model = model
+        self.period = 1. / rate
+        self._condition = threading.Condition()
+        self._frame = None
+        self._depth_map = None
+        self._depth_timestamp = None
+        self._running = False
+        self._thread = None
+        self.predictions = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, frame, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._condition:
+            self._frame = (frame, timestamp)
+            self._condition.notify_all()
+
+    def _loop(self):
+        next_prediction = time.time()
+        while True:
+            delay = next_prediction - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with self._condition:
+                self._condition.wait_for(lambda: self._frame is not None or not self._running)
+                if not self._running:
+                    return
+                (frame, timestamp), self._frame = self._frame, None
+            next_prediction = time.time() + self.period
+            depth_map = self.model.predict_depth(frame, copy=True)
+            with self._condition:
+                self._depth_map, self._depth_timestamp = depth_map, timestamp
+                self.predictions += 1
+
+    def latest(self):
+        # (depth map, timestamp of the frame it was predicted on), (None, None) before the first prediction
+        with self._condition:
+            return self._depth_map, self._depth_timestamp
+
+    def sample(self, keypoints):
+        depth_map, _ = self.latest()
+        return None if depth_map is None else sample_depth(depth_map, keypoints)
\ No newline at end of file
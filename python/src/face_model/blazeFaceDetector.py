@@ -1,18 +1,27 @@
 import time
 import cv2
 import numpy as np
-import tensorflow as tf
-from src.face_model.blazeFaceUtils import gen_anchors, SsdAnchorsCalculatorOptions
+from src.face_model.blazeFaceUtils import get_anchors, decode_detections, non_max_suppression, weighted_non_max_suppression
+from src.preprocessing import blaze_face_preprocessor
+from src.interpreter import load_interpreter, tensor_view, read_output
 
 KEY_POINT_SIZE = 6
 MAX_FACE_NUM = 100
+MODEL_PATHS = {
+	"front": "models/blaze_front/face_detection_front.tflite",
+	"back": "models/blaze_back/face_detection_back.tflite",
+}
 
 class BlazeFaceDetector():
 
-	def __init__(self, type = "front", scoreThreshold = 0.7, iouThreshold = 0.3):
+	def __init__(self, type = "front", scoreThreshold = 0.7, iouThreshold = 0.3, weightedNms = False, num_threads = None, latency = None, model_path = None):
 		self.type = type
 		self.scoreThreshold = scoreThreshold
 		self.iouThreshold = iouThreshold
+		self.weightedNms = weightedNms
+		self.num_threads = num_threads
+		self.latency = latency
+		self.model_path = model_path or MODEL_PATHS[type]
 		self.sigmoidScoreThreshold = np.log(self.scoreThreshold/(1-self.scoreThreshold))
 		self.fps = 0
 		self.timeLastPrediction = time.time()
@@ -25,23 +34,24 @@ class BlazeFaceDetector():
 		self.generateAnchors(type)
 
 	def initializeModel(self, type):
-		if type == "front":
-			self.interpreter = tf.lite.Interpreter(model_path="models/blaze_front/face_detection_front.tflite")
-		elif type =="back":
-			self.interpreter = tf.lite.Interpreter(model_path="models/blaze_back/face_detection_back.tflite")
-		self.interpreter.allocate_tensors()
+		# Relative model paths are resolved against the package, not the working directory
+		self.interpreter = load_interpreter(self.model_path, self.num_threads, self.latency)
 
 		# Get model info
 		self.getModelInputDetails()
 		self.getModelOutputDetails()
 
+	def warm_up(self):
+		# The first invoke prepares the kernels and is much slower than the following ones
+		self.interpreter.invoke()
+
 	def detectFaces(self, image):
 
-		# Prepare image for inference
-		input_tensor = self.prepareInputForInference(image)
+		# Prepare image for inference, written straight into the input tensor
+		self.prepareInputForInference(image)
 
 		# Perform inference on the image
-		output0, output1 = self.inference(input_tensor)
+		output0, output1 = self.inference()
 
 		# Filter scores based on the detection scores
 		scores, goodDetectionsIndices = self.filterDetections(output1)
@@ -105,95 +115,42 @@ class BlazeFaceDetector():
 		self.inputHeight = input_shape[1]
 		self.inputWidth = input_shape[2]
 		self.channels = input_shape[3]
+		self.preprocessor = blaze_face_preprocessor(self.inputHeight, self.inputWidth, self.channels)
 
 	def getModelOutputDetails(self):
 		self.output_details = self.interpreter.get_output_details()
 
 	def generateAnchors(self, type):
-		if type == "front":
-			# Options to generate anchors for SSD object detection models.
-			ssd_anchors_calculator_options = SsdAnchorsCalculatorOptions(input_size_width=128, input_size_height=128, min_scale=0.1484375, max_scale=0.75
-					, anchor_offset_x=0.5, anchor_offset_y=0.5, num_layers=4
-					, feature_map_width=[], feature_map_height=[]
-					, strides=[8, 16, 16, 16], aspect_ratios=[1.0]
-					, reduce_boxes_in_lowest_layer=False, interpolated_scale_aspect_ratio=1.0
-					, fixed_anchor_size=True)
-
-		elif type == "back":
-			# Options to generate anchors for SSD object detection models.
-			ssd_anchors_calculator_options = SsdAnchorsCalculatorOptions(input_size_width=256, input_size_height=256, min_scale=0.15625, max_scale=0.75
-					, anchor_offset_x=0.5, anchor_offset_y=0.5, num_layers=4
-					, feature_map_width=[], feature_map_height=[]
-					, strides=[16, 32, 32, 32], aspect_ratios=[1.0]
-					, reduce_boxes_in_lowest_layer=False, interpolated_scale_aspect_ratio=1.0
-					, fixed_anchor_size=True)
-
-		self.anchors = gen_anchors(ssd_anchors_calculator_options)
+		# (N, 4) [x_center, y_center, h, w], cached per model type
+		self.anchors = get_anchors(type)
 
 	def prepareInputForInference(self, image):
-		img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-		self.img_height, self.img_width, self.img_channels = img.shape
+		self.img_height, self.img_width, self.img_channels = image.shape
 
 		# Input values should be from -1 to 1 with a size of 128 x 128 pixels for the fornt model
-		# and 256 x 256 pixels for the back model
-		img = img / 255.0
-		img_resized = tf.image.resize(img, [self.inputHeight,self.inputWidth], 
-									method='bicubic', preserve_aspect_ratio=False)
-		img_input = img_resized.numpy()
-		img_input = (img_input - 0.5) / 0.5
-
-		# Adjust matrix dimenstions
-		reshape_img = img_input.reshape(1,self.inputHeight,self.inputWidth,self.channels)
-		tensor = tf.convert_to_tensor(reshape_img, dtype=tf.float32)
+		# and 256 x 256 pixels for the back model. BGR to RGB is folded into the normalization
+		self.preprocessor(image, out=tensor_view(self.interpreter, self.input_details[0]))
 
-		return tensor
-
-	def inference(self, input_tensor):
-		self.interpreter.set_tensor(self.input_details[0]['index'], input_tensor)
+	def inference(self, input_tensor=None):
+		# The input is normally already in place from prepareInputForInference
+		if input_tensor is not None:
+			self.interpreter.set_tensor(self.input_details[0]['index'], input_tensor)
 		self.interpreter.invoke()
 
+		# Views of the output tensors, only valid until the next inference
 		# Matrix of 896 x 16 with information about the detected faces
-		output0 = np.squeeze(self.interpreter.get_tensor(self.output_details[0]['index']))
+		output0 = np.squeeze(read_output(self.interpreter, self.output_details[0]))
 
 		# Matrix with the raw detection scores
-		output1 = np.squeeze(self.interpreter.get_tensor(self.output_details[1]['index']))
+		output1 = np.squeeze(read_output(self.interpreter, self.output_details[1]))
 
 		return output0, output1
 
 	def extractDetections(self, output0, goodDetectionsIndices):
 
-		numGoodDetections = goodDetectionsIndices.shape[0]
-
-		keypoints = np.zeros((numGoodDetections, KEY_POINT_SIZE, 2))
-		boxes = np.zeros((numGoodDetections, 4))
-		for idx, detectionIdx in enumerate(goodDetectionsIndices):
-			anchor = self.anchors[detectionIdx]
-
-			sx = output0[detectionIdx, 0]
-			sy = output0[detectionIdx, 1]
-			w = output0[detectionIdx, 2]
-			h = output0[detectionIdx, 3]
-
-			cx = sx + anchor.x_center * self.inputWidth
-			cy = sy + anchor.y_center * self.inputHeight
-
-			cx /= self.inputWidth
-			cy /= self.inputHeight
-			w /= self.inputWidth
-			h /= self.inputHeight
-
-			for j in range(KEY_POINT_SIZE):
-				lx = output0[detectionIdx, 4 + (2 * j) + 0]
-				ly = output0[detectionIdx, 4 + (2 * j) + 1]
-				lx += anchor.x_center * self.inputWidth
-				ly += anchor.y_center * self.inputHeight
-				lx /= self.inputWidth
-				ly /= self.inputHeight
-				keypoints[idx,j,:] = np.array([lx, ly])
-
-			boxes[idx,:] = np.array([cx - w * 0.5, cy - h * 0.5, cx + w * 0.5, cy + h * 0.5])
-
-		return boxes, keypoints
+		# Decode boxes and keypoints of all passing detections relative to their anchors
+		return decode_detections(output0[goodDetectionsIndices], self.anchors[goodDetectionsIndices],
+								 self.inputWidth, self.inputHeight, KEY_POINT_SIZE)
 
 	def filterDetections(self, output1):
 
@@ -206,13 +163,12 @@ class BlazeFaceDetector():
 		return scores, goodDetections
 
 	def filterWithNonMaxSupression(self, boxes, keypoints, scores):
-		# Filter based on non max suppression
-		selected_indices = tf.image.non_max_suppression(boxes, scores, MAX_FACE_NUM, self.iouThreshold)
-		filtered_boxes = tf.gather(boxes, selected_indices).numpy()
-		filtered_keypoints = tf.gather(keypoints, selected_indices).numpy()
-		filtered_scores = tf.gather(scores, selected_indices).numpy()
+		# Filter based on non max suppression, weighted NMS averages the overlapping detections instead
+		if self.weightedNms:
+			return Results(*weighted_non_max_suppression(boxes, keypoints, scores, MAX_FACE_NUM, self.iouThreshold))
 
-		detectionResults = Results(filtered_boxes, filtered_keypoints, filtered_scores)
+		selected_indices = non_max_suppression(boxes, scores, MAX_FACE_NUM, self.iouThreshold)
+		detectionResults = Results(boxes[selected_indices], keypoints[selected_indices], scores[selected_indices])
 		return detectionResults
 
 class Results:
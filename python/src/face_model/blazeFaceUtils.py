@@ -1,4 +1,7 @@
 import math
+from functools import lru_cache
+
+import numpy as np
 
 class SsdAnchorsCalculatorOptions:
 	def __init__(self, input_size_width, input_size_height, min_scale, max_scale
@@ -124,4 +127,141 @@ def gen_anchors(options):
 					new_anchor = Anchor(x_center, y_center, h, w)
 					anchors.append(new_anchor)
 		layer_id = last_same_stride_layer
-	return anchors
\ No newline at end of file
+	return anchors
+
+def gen_anchor_array(options):
+	# Same anchors as gen_anchors as one (N, 4) float32 array of [x_center, y_center, h, w]
+	if (options.strides_size != options.num_layers):
+		raise ValueError("strides_size and num_layers must be equal.")
+
+	def layer_scale(layer):
+		return options.min_scale + (options.max_scale - options.min_scale) * layer / (options.strides_size - 1.0)
+
+	layers = []
+	layer_id = 0
+	while (layer_id < options.strides_size):
+		aspect_ratios = []
+		scales = []
+
+		# For same strides, we merge the anchors in the same order.
+		last_same_stride_layer = layer_id
+		while (last_same_stride_layer < options.strides_size and options.strides[last_same_stride_layer] == options.strides[layer_id]):
+			scale = layer_scale(last_same_stride_layer)
+			if (last_same_stride_layer == 0 and options.reduce_boxes_in_lowest_layer):
+				aspect_ratios += [1.0, 2.0, 0.5]
+				scales += [0.1, scale, scale]
+			else:
+				aspect_ratios += list(options.aspect_ratios)
+				scales += [scale] * options.aspect_ratios_size
+				if (options.interpolated_scale_aspect_ratio > 0.0):
+					scale_next = 1.0 if last_same_stride_layer == options.strides_size - 1 else layer_scale(last_same_stride_layer + 1)
+					scales.append(math.sqrt(scale * scale_next))
+					aspect_ratios.append(options.interpolated_scale_aspect_ratio)
+			last_same_stride_layer += 1
+
+		ratio_sqrts = np.sqrt(aspect_ratios)
+		anchor_height = np.asarray(scales) / ratio_sqrts
+		anchor_width = np.asarray(scales) * ratio_sqrts
+		if (options.fixed_anchor_size):
+			anchor_height = np.ones_like(anchor_height)
+			anchor_width = np.ones_like(anchor_width)
+
+		if (options.feature_map_height_size > 0):
+			feature_map_height = options.feature_map_height[layer_id]
+			feature_map_width = options.feature_map_width[layer_id]
+		else:
+			stride = options.strides[layer_id]
+			feature_map_height = math.ceil(1.0 * options.input_size_height / stride)
+			feature_map_width = math.ceil(1.0 * options.input_size_width / stride)
+
+		# (y, x, anchor) order, like the nested loops of gen_anchors
+		y_center = (np.arange(feature_map_height) + options.anchor_offset_y) / feature_map_height
+		x_center = (np.arange(feature_map_width) + options.anchor_offset_x) / feature_map_width
+		shape = (feature_map_height, feature_map_width, len(scales))
+		layer = np.stack([
+			np.broadcast_to(x_center[None, :, None], shape),
+			np.broadcast_to(y_center[:, None, None], shape),
+			np.broadcast_to(anchor_height, shape),
+			np.broadcast_to(anchor_width, shape)], axis=-1)
+		layers.append(layer.reshape(-1, 4))
+		layer_id = last_same_stride_layer
+	return np.concatenate(layers).astype(np.float32)
+
+ANCHOR_OPTIONS = {
+	"front": SsdAnchorsCalculatorOptions(input_size_width=128, input_size_height=128, min_scale=0.1484375, max_scale=0.75
+		, anchor_offset_x=0.5, anchor_offset_y=0.5, num_layers=4
+		, feature_map_width=[], feature_map_height=[]
+		, strides=[8, 16, 16, 16], aspect_ratios=[1.0]
+		, reduce_boxes_in_lowest_layer=False, interpolated_scale_aspect_ratio=1.0
+		, fixed_anchor_size=True),
+	"back": SsdAnchorsCalculatorOptions(input_size_width=256, input_size_height=256, min_scale=0.15625, max_scale=0.75
+		, anchor_offset_x=0.5, anchor_offset_y=0.5, num_layers=4
+		, feature_map_width=[], feature_map_height=[]
+		, strides=[16, 32, 32, 32], aspect_ratios=[1.0]
+		, reduce_boxes_in_lowest_layer=False, interpolated_scale_aspect_ratio=1.0
+		, fixed_anchor_size=True),
+}
+
+@lru_cache(maxsize=None)
+def get_anchors(type):
+	# Generated once per model type, the array is shared so it must not be modified
+	anchors = gen_anchor_array(ANCHOR_OPTIONS[type])
+	anchors.flags.writeable = False
+	return anchors
+
+def decode_detections(raw_detections, anchors, input_width, input_height, num_keypoints=6):
+	# (N, 4 + 2 * num_keypoints) raw regressors and their (N, 4) anchors to (N, 4) [x1, y1, x2, y2] boxes
+	# and (N, num_keypoints, 2) [x, y] keypoints, all normalized to the input size
+	scale = np.array([input_width, input_height], dtype=raw_detections.dtype)
+	centers = anchors[:, None, :2]
+	offsets = raw_detections[:, :4 + 2 * num_keypoints].reshape(-1, 2 + num_keypoints, 2) / scale
+
+	box_centers = offsets[:, 0] + centers[:, 0]
+	half_sizes = offsets[:, 1] * 0.5
+	boxes = np.concatenate([box_centers - half_sizes, box_centers + half_sizes], axis=-1)
+	keypoints = offsets[:, 2:] + centers
+	return boxes, keypoints
+
+def box_iou(boxes_a, boxes_b):
+	# Pairwise intersection over union of (N, 4) and (M, 4) [x1, y1, x2, y2] boxes, (N, M)
+	top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+	bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+	intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=-1)
+	area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=-1)
+	area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=-1)
+	union = area_a[:, None] + area_b[None, :] - intersection
+	return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+def _suppression_clusters(boxes, scores, max_output_size, iou_threshold):
+	# Greedy NMS: yields each kept index (best score first) with the candidates it suppresses, itself included
+	order = np.argsort(-scores, kind="stable")
+	overlaps = box_iou(boxes[order], boxes[order]) > iou_threshold
+	remaining = np.ones(len(order), dtype=bool)
+	for i in range(len(order)):
+		if max_output_size <= 0:
+			break
+		if not remaining[i]:
+			continue
+		cluster = remaining & overlaps[i]
+		cluster[i] = True
+		remaining &= ~cluster
+		max_output_size -= 1
+		yield order[i], order[cluster]
+
+def non_max_suppression(boxes, scores, max_output_size, iou_threshold):
+	# Indices of the kept boxes, like tf.image.non_max_suppression
+	return np.array([idx for idx, _ in _suppression_clusters(boxes, scores, max_output_size, iou_threshold)], dtype=np.int64)
+
+def weighted_non_max_suppression(boxes, keypoints, scores, max_output_size, iou_threshold):
+	# MediaPipe's weighted NMS: every kept detection is the score weighted average of the boxes and keypoints
+	# it suppresses, which smooths the boxes from frame to frame. The score is the one of the best candidate
+	filtered_boxes, filtered_keypoints, filtered_scores = [], [], []
+	for idx, cluster in _suppression_clusters(boxes, scores, max_output_size, iou_threshold):
+		weights = scores[cluster] / scores[cluster].sum()
+		filtered_boxes.append(np.tensordot(weights, boxes[cluster], axes=1))
+		filtered_keypoints.append(np.tensordot(weights, keypoints[cluster], axes=1))
+		filtered_scores.append(scores[idx])
+	return (np.array(filtered_boxes, dtype=boxes.dtype).reshape(-1, 4),
+			np.array(filtered_keypoints, dtype=keypoints.dtype).reshape((-1,) + keypoints.shape[1:]),
+			np.array(filtered_scores, dtype=scores.dtype))
+
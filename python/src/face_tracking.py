@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+
+from .utils import KEYPOINT_MAPPING
+from .face_model.blazeFaceDetector import Results
+
+FACE_JOINTS = [KEYPOINT_MAPPING[joint] for joint in ['nose', 'left_eye', 'right_eye', 'left_ear', 'right_ear']]
+
+class FaceBoxTracker:
+    '''Runs the face detector only when the last face box can no longer be trusted.
+
+    Between detections the last box (and its face keypoints) is shifted with the mean motion of the
+    pose model's nose, eye and ear keypoints. A new detection is run when there is no box, when
+    max_age frames have passed, when the face keypoints' confidence drops below min_confidence
+    or when a confident face keypoint leaves the box. Keypoints are (17, 3) (y, x, confidence)
+    and boxes (x_left, y_top, x_right, y_bot), both normalized to the same image.
+    '''
+    def __init__(self, detector, max_age=30, min_confidence=0.3):
+        self.detector = detector
+        self.max_age = max_age
+        self.min_confidence = min_confidence
+        self.reset()
+
+    def reset(self):
+        self.results = None
+        self.reference_keypoints = None
+        self.frames_since_detection = 0
+        self.frames = 0
+        self.detections = 0
+        self.detection_time = 0.
+
+    def needs_detection(self, keypoints)->bool:
+        if self.results is None or len(self.results.boxes) == 0 or keypoints is None or self.reference_keypoints is None:
+            return True
+        if self.frames_since_detection >= self.max_age:
+            return True
+        face = np.asarray(keypoints)[FACE_JOINTS]
+        if face[:, 2].mean() < self.min_confidence:
+            return True
+        x_left, y_top, x_right, y_bot = self._shifted_box(keypoints)
+        confident = face[face[:, 2] > self.min_confidence]
+        inside = (confident[:, 0] >= y_top) & (confident[:, 0] <= y_bot) & (confident[:, 1] >= x_left) & (confident[:, 1] <= x_right)
+        return not inside.all()
+
+    def _offset(self, keypoints):
+        # mean (x, y) motion of the face keypoints confident now and at the last detection
+        face, reference = np.asarray(keypoints)[FACE_JOINTS], self.reference_keypoints[FACE_JOINTS]
+        visible = (face[:, 2] > self.min_confidence) & (reference[:, 2] > self.min_confidence)
+        if not visible.any():
+            return np.zeros(2)
+        return (face[visible, 1::-1] - reference[visible, 1::-1]).mean(axis=0)
+
+    def _shifted_box(self, keypoints):
+        return self.results.boxes[0] + np.tile(self._offset(keypoints), 2)
+
+    def detect(self, image, keypoints=None)->Results:
+        # like detectFaces, keypoints=None always runs the detector
+        self.frames += 1
+        if self.needs_detection(keypoints):
+            tic = time.perf_counter()
+            self.results = self.detector.detectFaces(image)
+            self.detection_time += time.perf_counter() - tic
+            self.detections += 1
+            self.frames_since_detection = 0
+            self.reference_keypoints = None if keypoints is None else np.array(keypoints)
+            return self.results
+
+        self.frames_since_detection += 1
+        offset = self._offset(keypoints)
+        return Results(self.results.boxes + np.tile(offset, 2), self.results.keypoints + offset, self.results.scores)
+
+    def get_stats(self)->dict:
+        mean_detection_time = self.detection_time / self.detections if self.detections else 0.
+        return {
+            'frames': self.frames,
+            'detections': self.detections,
+            'detection_rate': self.detections / self.frames if self.frames else 0.,
+            'mean_detection_time': mean_detection_time,
+            # estimated from the detections that did run
+            'time_saved': (self.frames - self.detections) * mean_detection_time,
+        }
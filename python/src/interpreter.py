@@ -0,0 +1,114 @@
+import importlib
+import time
+from pathlib import Path
+
+import numpy as np
+
+# relative model paths ('models/...') are resolved against the python/ directory, not the working directory
+PACKAGE_DIR = Path(__file__).resolve().parents[1]
+
+# tried in order, the standalone runtime is a fraction of TensorFlow's import time and memory
+BACKENDS = ['tflite_runtime.interpreter', 'tensorflow.lite']
+
+_interpreter_class = None
+_backend = None
+
+def get_interpreter_class():
+    # imported on first use only, so that importing a model wrapper stays cheap
+    global _interpreter_class, _backend
+    if _interpreter_class is None:
+        for backend in BACKENDS:
+            try:
+                module = importlib.import_module(backend)
+            except ImportError:
+                continue
+            _interpreter_class, _backend = module.Interpreter, backend
+            break
+        else:
+            raise ImportError('No TFLite interpreter found, install one of: tflite-runtime, tensorflow')
+    return _interpreter_class
+
+def get_backend()->str:
+    get_interpreter_class()
+    return _backend
+
+def resolve_model_path(model_path)->Path:
+    model_path = Path(model_path)
+    return model_path if model_path.is_absolute() else PACKAGE_DIR / model_path
+
+def load_interpreter(model_path, num_threads=None, latency=None, **kwargs):
+    # TFLite interpreter with its tensors allocated, num_threads=None keeps the runtime's default.
+    # With a LatencyHistogram every invoke() is timed into it
+    if num_threads is not None:
+        kwargs['num_threads'] = num_threads
+    interpreter = get_interpreter_class()(model_path=str(resolve_model_path(model_path)), **kwargs)
+    interpreter.allocate_tensors()
+    return interpreter if latency is None else TimedInterpreter(interpreter, latency)
+
+class LatencyHistogram:
+    '''Log-spaced histogram of durations in seconds, from `low` to `high` with bins_per_decade bins per decade.
+
+    Durations outside the range are counted in the first/last bin. Percentiles are read from the bins,
+    so they are accurate to a bin width (about 12% with the default 20 bins per decade).
+    '''
+    def __init__(self, low=1e-5, high=10., bins_per_decade=20):
+        num_bins = int(round(np.log10(high / low) * bins_per_decade))
+        self.edges = np.logspace(np.log10(low), np.log10(high), num_bins + 1)
+        self.reset()
+
+    def reset(self):
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def record(self, duration):
+        bin_idx = np.searchsorted(self.edges, duration, side='right') - 1
+        self.counts[min(max(bin_idx, 0), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, q)->float:
+        # upper edge of the bin holding the q-th percentile, capped at the largest duration seen
+        if not self.count:
+            return 0.
+        bin_idx = np.searchsorted(np.cumsum(self.counts), q / 100 * self.count)
+        # the last bin also holds everything past the range
+        upper = self.edges[bin_idx + 1] if bin_idx < len(self.counts) - 1 else np.inf
+        return float(min(upper, self.max))
+
+    def summary(self)->dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+class TimedInterpreter:
+    '''Interpreter proxy that records the duration of every invoke() into a LatencyHistogram.'''
+    def __init__(self, interpreter, latency:LatencyHistogram):
+        self.interpreter = interpreter
+        self.latency = latency
+
+    def invoke(self):
+        tic = time.perf_counter()
+        self.interpreter.invoke()
+        self.latency.record(time.perf_counter() - tic)
+
+    def __getattr__(self, name):
+        return getattr(self.interpreter, name)
+
+def tensor_view(interpreter, detail):
+    # numpy view straight into the interpreter's memory for an entry of get_input_details()/get_output_details().
+    # Views must be released before the next invoke() or allocate_tensors(), the runtime refuses to run while one is alive
+    return interpreter.tensor(detail['index'])()
+
+def read_output(interpreter, detail, copy=False):
+    # output as a view valid until the next invoke, copy=True for results kept past it
+    output = tensor_view(interpreter, detail)
+    return output.copy() if copy else output
+
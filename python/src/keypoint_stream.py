@@ -0,0 +1,83 @@
+import math
+import time
+
+import numpy as np
+
+class KeypointStream:
+    '''Decouples the model inference rate from the rate keypoints are handed to the angle calculators.
+
+    Inferred keypoints ([..., 17, 3] arrays of y, x, confidence) are pushed with their timestamp.
+    get() returns keypoints for any output time: between two inferred frames they are linearly
+    interpolated, past the newest frame they are extrapolated at constant velocity while their
+    confidence decays with the given half-life. A positive `delay` trades latency for smoothness,
+    since output times then fall between inferred frames more often.
+    '''
+    def __init__(self, inference_rate=10., output_rate=60., delay=0., confidence_half_life=0.25, max_extrapolation=0.5):
+        self.inference_period = 1. / inference_rate
+        self.output_period = 1. / output_rate
+        self.delay = delay
+        self.decay_rate = math.log(2) / confidence_half_life
+        self.max_extrapolation = max_extrapolation
+        self.reset()
+
+    def reset(self):
+        self.samples = [] # (timestamp, keypoints), oldest first, at most two kept
+        self.next_inference = -math.inf
+        self.next_output = -math.inf
+
+    def should_infer(self, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        due, self.next_inference = self._tick(timestamp, self.next_inference, self.inference_period)
+        return due
+
+    def should_output(self, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        due, self.next_output = self._tick(timestamp, self.next_output, self.output_period)
+        return due
+
+    @staticmethod
+    def _tick(timestamp, deadline, period, tolerance=1e-6):
+        # fixed-rate schedule that does not drift with the loop period, and restarts after a stall
+        if timestamp < deadline - tolerance:
+            return False, deadline
+        if timestamp - deadline >= period:
+            return True, timestamp + period
+        return True, deadline + period
+
+    def push(self, keypoints, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        # copied, model outputs may be views into the interpreter's memory
+        keypoints = np.array(keypoints, dtype=np.float32)
+        # a new inference with a different shape (e.g. number of people) restarts the stream
+        if self.samples and self.samples[-1][1].shape != keypoints.shape:
+            self.samples = []
+        self.samples = self.samples[-1:] + [(timestamp, keypoints)]
+
+    def get(self, timestamp=None):
+        # None until the first inference has been pushed
+        if not self.samples:
+            return None
+        timestamp = (time.time() if timestamp is None else timestamp) - self.delay
+
+        t1, kpts1 = self.samples[-1]
+        if len(self.samples) == 1:
+            # no velocity yet, hold the only frame
+            return self._extrapolate(kpts1, None, timestamp - t1)
+
+        t0, kpts0 = self.samples[0]
+        if timestamp <= t0:
+            return kpts0.copy()
+        if timestamp <= t1:
+            alpha = (timestamp - t0) / (t1 - t0)
+            return (1 - alpha) * kpts0 + alpha * kpts1
+
+        velocity = (kpts1[..., :2] - kpts0[..., :2]) / (t1 - t0)
+        return self._extrapolate(kpts1, velocity, timestamp - t1)
+
+    def _extrapolate(self, keypoints, velocity, dt):
+        dt = max(0., min(dt, self.max_extrapolation))
+        output = keypoints.copy()
+        if velocity is not None:
+            output[..., :2] += velocity * dt
+        output[..., 2] *= math.exp(-self.decay_rate * dt)
+        return output
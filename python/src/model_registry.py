@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.interpreter import LatencyHistogram, resolve_model_path
+from src.pose_model import Movenet, MovenetMultiPose
+from src.depth_model import Midas
+from src.face_model.blazeFaceDetector import BlazeFaceDetector, MODEL_PATHS as BLAZE_FACE_PATHS
+
+# name -> (model wrapper, model path relative to the package, extra keyword arguments)
+MODELS = {
+    'movenet_lightning': (Movenet, 'models/movenet_float16/lite-model_movenet_singlepose_lightning_tflite_float16_4.tflite', {}),
+    'movenet_thunder': (Movenet, 'models/movenet_float16/lite-model_movenet_singlepose_thunder_tflite_float16_4.tflite', {}),
+    'movenet_lightning_int8': (Movenet, 'models/movenet_int8/lite-model_movenet_singlepose_lightning_tflite_int8_4.tflite', {}),
+    'movenet_thunder_int8': (Movenet, 'models/movenet_int8/lite-model_movenet_singlepose_thunder_tflite_int8_4.tflite', {}),
+    'movenet_multipose': (MovenetMultiPose, 'models/movenet_multipose/lite-model_movenet_multipose_lightning_tflite_float16_1.tflite', {}),
+    'midas': (Midas, 'models/midas/lite-model_midas_v2_1_small_1_lite_1.tflite', {}),
+    'blaze_face_front': (BlazeFaceDetector, BLAZE_FACE_PATHS['front'], {'type': 'front'}),
+    'blaze_face_back': (BlazeFaceDetector, BLAZE_FACE_PATHS['back'], {'type': 'back'}),
+}
+
+# interchangeable variants of the same task, compared by `python -m src.benchmark models`
+FAMILIES = {
+    'movenet': ['movenet_lightning', 'movenet_thunder', 'movenet_lightning_int8', 'movenet_thunder_int8'],
+    'blaze_face': ['blaze_face_front', 'blaze_face_back'],
+    'midas': ['midas'],
+}
+
+class ModelRegistry:
+    '''Loads the models of MODELS by name, once each, and keeps their invoke latencies.
+
+    load() builds the requested models in parallel threads (interpreter creation mostly runs outside
+    the GIL) and runs a warm-up invoke on each, so the first frame isn't paying for kernel preparation.
+    Every later invoke is recorded in the model's LatencyHistogram, see latency() and get_stats().
+    '''
+    def __init__(self, models:dict=MODELS, num_threads=None, warm_up=True):
+        self.models = models
+        self.num_threads = num_threads
+        self.warm_up = warm_up
+        self.loaded = {}
+        self.latencies = {}
+        self.load_times = {}
+        self.warm_up_times = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return resolve_model_path(self.models[name][1])
+
+    def _load(self, name):
+        wrapper, model_path, kwargs = self.models[name]
+        latency = LatencyHistogram()
+        tic = time.perf_counter()
+        model = wrapper(model_path=model_path, num_threads=self.num_threads, latency=latency, **kwargs)
+        load_time = time.perf_counter() - tic
+        warm_up_time = 0.
+        if self.warm_up:
+            tic = time.perf_counter()
+            model.warm_up()
+            warm_up_time = time.perf_counter() - tic
+            latency.reset()
+        with self._lock:
+            self.loaded[name] = model
+            self.latencies[name] = latency
+            self.load_times[name] = load_time
+            self.warm_up_times[name] = warm_up_time
+        return model
+
+    def load(self, *names)->list:
+        # the models in the order of names, loading the ones not loaded yet in parallel
+        missing = [name for name in dict.fromkeys(names) if name not in self.loaded]
+        unknown = [name for name in missing if name not in self.models]
+        if unknown:
+            raise KeyError(f'Unknown models {unknown}, expected one of {list(self.models)}')
+        if len(missing) == 1:
+            self._load(missing[0])
+        elif missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                # list() re-raises the first loading error
+                list(executor.map(self._load, missing))
+        return [self.loaded[name] for name in names]
+
+    def get(self, name):
+        return self.load(name)[0]
+
+    def latency(self, name)->LatencyHistogram:
+        return self.latencies[name]
+
+    def get_stats(self)->dict:
+        with self._lock:
+            return {name: {'load_time': self.load_times[name], 'warm_up_time': self.warm_up_times[name],
+                           **self.latencies[name].summary()}
+                    for name in self.loaded}
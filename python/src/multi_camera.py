@@ -0,0 +1,279 @@
+'''Multi-camera fan-out: one worker process per camera, results merged in the supervisor.
+
+Each worker runs a Webcam capture plus its models and publishes its letterboxed frames and
+results through SharedRingBuffers, so no frame or keypoint array is pickled between processes.
+
+usage: python -m src.multi_camera 0 1 [--seconds 10]
+'''
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from src.webcam import Webcam
+from src.preprocessing import resize_and_pad
+
+# result vector of a worker: (17, 3) keypoints, [pitch, yaw, roll] face angles and the 4 arm angles
+RESULT_SLICES = {'keypoints': slice(0, 51), 'face_angles': slice(51, 54), 'arm_angles': slice(54, 58)}
+RESULT_SIZE = 58
+# per worker stats in a shared double array
+STATS_FIELDS = ['start_time', 'heartbeat', 'frames_captured', 'frames_dropped', 'inferences']
+
+def pack_result(keypoints, face_angles, arm_angles, out=None):
+    out = np.empty(RESULT_SIZE, dtype=np.float32) if out is None else out
+    out[RESULT_SLICES['keypoints']] = np.ravel(keypoints)
+    out[RESULT_SLICES['face_angles']] = face_angles
+    out[RESULT_SLICES['arm_angles']] = arm_angles
+    return out
+
+def unpack_result(result)->dict:
+    unpacked = {name: result[index] for name, index in RESULT_SLICES.items()}
+    unpacked['keypoints'] = unpacked['keypoints'].reshape(17, 3)
+    return unpacked
+
+class SharedRingBuffer:
+    '''Single-writer ring of fixed-shape arrays in multiprocessing.shared_memory.
+
+    The writer fills slot seq % slots and publishes the slot's sequence number last. Readers copy the
+    newest slot and keep the copy only if the slot still holds the same sequence number afterwards,
+    so a frame overwritten mid-copy is never returned. The ring is created by the supervisor and
+    attached by name, with attach(spec), in the worker.
+    '''
+    def __init__(self, shape, dtype=np.uint8, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.owner = name is None
+        header_bytes = 8 * (1 + 2 * slots) # head, sequence number and timestamp per slot
+        item_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=header_bytes + item_bytes * slots)
+        buf = self.shm.buf
+        self._head = np.ndarray((1,), dtype=np.int64, buffer=buf)
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8)
+        self._timestamps = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 * (1 + slots))
+        self._data = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=buf, offset=header_bytes)
+        if self.owner:
+            self._head[0] = -1
+            self._seqs[:] = -1
+
+    @property
+    def spec(self)->tuple:
+        # picklable description for attach() in another process
+        return (self.shm.name, self.shape, self.dtype.str, self.slots)
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype, slots = spec
+        return cls(shape, dtype, slots, name=name)
+
+    def write(self, array, timestamp=None)->int:
+        seq = int(self._head[0]) + 1
+        slot = seq % self.slots
+        self._seqs[slot] = -1 # being written
+        self._data[slot] = array
+        self._timestamps[slot] = time.time() if timestamp is None else timestamp
+        self._seqs[slot] = seq
+        self._head[0] = seq
+        return seq
+
+    def read_latest(self, after:int=-1, retries:int=3):
+        # (seq, array copy, timestamp) of the newest item written after `after`, None if there is none
+        for _ in range(retries):
+            seq = int(self._head[0])
+            if seq <= after:
+                return None
+            slot = seq % self.slots
+            array = self._data[slot].copy()
+            timestamp = float(self._timestamps[slot])
+            if self._seqs[slot] == seq:
+                return seq, array, timestamp
+        return None
+
+    def close(self):
+        # views into the block have to go before it can be closed
+        del self._head, self._seqs, self._timestamps, self._data
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class CameraPipeline:
+    '''Per camera models of a worker: Movenet keypoints, tracked BlazeFace box and the angles sent to Godot.
+
+    Called with the letterboxed BGR frame: Movenet gets it converted to RGB, BlazeFace's preprocessor
+    does the conversion itself.
+    '''
+    def __init__(self, movenet='movenet_lightning', face='blaze_face_back', num_threads=1):
+        # imported here, the supervisor process never loads a model
+        from src.model_registry import ModelRegistry
+        from src.face_tracking import FaceBoxTracker
+        self.registry = ModelRegistry(num_threads=num_threads)
+        self.movenet, detector = self.registry.load(movenet, face)
+        self.face_tracker = FaceBoxTracker(detector)
+
+    def __call__(self, frame):
+        from src.postprocessing import calculate_face_angles, calculate_arm_angles
+        keypoints = self.movenet.predict(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), copy=True)[0, 0]
+        results = self.face_tracker.detect(frame, keypoints)
+        return keypoints, calculate_face_angles(keypoints, results), calculate_arm_angles(keypoints)
+
+def run_camera_worker(camera, pipeline_factory, frame_spec, result_spec, stats, stop_event, threaded=True):
+    # worker process body: capture, run the pipeline on the letterboxed frame and publish both
+    frames = SharedRingBuffer.attach(frame_spec)
+    results = SharedRingBuffer.attach(result_spec)
+    result = np.empty(RESULT_SIZE, dtype=np.float32)
+    pipeline = pipeline_factory()
+    cam = Webcam(camera, threaded=threaded)
+    cam.start_capture()
+    stats[STATS_FIELDS.index('start_time')] = stats[STATS_FIELDS.index('heartbeat')] = time.time()
+    try:
+        while not stop_event.is_set():
+            frame, timestamp = cam.grab_frame_with_timestamp(timeout=0.1)
+            if frame is None:
+                if cam.finished or not threaded:
+                    break
+                continue
+            keypoint_frame = resize_and_pad(frame, frames.shape[1::-1])
+            frames.write(keypoint_frame, timestamp)
+            results.write(pack_result(*pipeline(keypoint_frame), out=result), timestamp)
+
+            capture_stats = cam.get_stats()
+            stats[STATS_FIELDS.index('frames_captured')] = capture_stats['frames_captured']
+            stats[STATS_FIELDS.index('frames_dropped')] = capture_stats['frames_dropped']
+            stats[STATS_FIELDS.index('inferences')] += 1
+            stats[STATS_FIELDS.index('heartbeat')] = time.time()
+    finally:
+        cam.stop_capture()
+        frames.close()
+        results.close()
+
+class MultiCameraSupervisor:
+    '''Runs one worker process per camera and merges their newest results into one output stream.
+
+    cameras are anything Webcam accepts that can be sent to a spawned process (camera indices, video
+    paths, SyntheticSource). pipeline_factory is called once in each worker and returns the callable
+    that turns a letterboxed frame into (keypoints, face_angles, arm_angles); it must be picklable.
+    send() forwards the results that are new since the last send through the client, tagged with the
+    camera index. Workers that died or whose heartbeat is older than max_heartbeat_age seconds are not
+    sent, get_stats() reports them as not live.
+    '''
+    def __init__(self, cameras, pipeline_factory=CameraPipeline, client=None, frame_shape=(192, 192, 3), slots=4,
+                 threaded=True, max_heartbeat_age=1.):
+        self.cameras = list(cameras)
+        self.pipeline_factory = pipeline_factory
+        self.client = client
+        self.frame_shape = tuple(frame_shape)
+        self.slots = slots
+        self.threaded = threaded
+        self.max_heartbeat_age = max_heartbeat_age
+        # spawned, so that workers don't inherit the supervisor's threads or interpreters
+        self._context = mp.get_context('spawn')
+        self.workers = []
+
+    def start(self):
+        self._stop_event = self._context.Event()
+        for camera in self.cameras:
+            frames = SharedRingBuffer(self.frame_shape, np.uint8, self.slots)
+            results = SharedRingBuffer((RESULT_SIZE,), np.float32, self.slots)
+            stats = self._context.Array('d', len(STATS_FIELDS), lock=False)
+            process = self._context.Process(
+                target=run_camera_worker, daemon=True,
+                args=(camera, self.pipeline_factory, frames.spec, results.spec, stats, self._stop_event, self.threaded))
+            process.start()
+            self.workers.append({'process': process, 'frames': frames, 'results': results, 'stats': stats,
+                                 'last_seq': -1, 'sent_seq': -1, 'latest': None,
+                                 'results_read': 0, 'results_sent': 0})
+
+    def stop(self, timeout=5.):
+        self._stop_event.set()
+        for worker in self.workers:
+            worker['process'].join(timeout)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+                worker['process'].join()
+            worker['frames'].close()
+            worker['results'].close()
+        self.workers = []
+
+    def poll(self)->dict:
+        # {camera index: {'keypoints', 'face_angles', 'arm_angles', 'timestamp', 'seq'}} of the newest results
+        for worker in self.workers:
+            item = worker['results'].read_latest(worker['last_seq'])
+            if item is not None:
+                seq, result, timestamp = item
+                worker['last_seq'] = seq
+                worker['results_read'] += 1
+                worker['latest'] = {**unpack_result(result), 'timestamp': timestamp, 'seq': seq}
+        return {idx: worker['latest'] for idx, worker in enumerate(self.workers) if worker['latest'] is not None}
+
+    def latest_frame(self, camera_idx):
+        # (letterboxed frame, timestamp) of a camera, None before its first frame
+        item = self.workers[camera_idx]['frames'].read_latest()
+        return None if item is None else item[1:]
+
+    def is_live(self, camera_idx, now=None)->bool:
+        worker = self.workers[camera_idx]
+        heartbeat = worker['stats'][STATS_FIELDS.index('heartbeat')]
+        now = time.time() if now is None else now
+        return worker['process'].is_alive() and heartbeat > 0 and now - heartbeat <= self.max_heartbeat_age
+
+    def send(self)->dict:
+        # returns the newest results of all cameras, like poll(), only the fresh ones of live workers are sent
+        latest = self.poll()
+        now = time.time()
+        cameras = [idx for idx in sorted(latest)
+                   if latest[idx]['seq'] > self.workers[idx]['sent_seq'] and self.is_live(idx, now)]
+        if cameras and self.client is not None:
+            face_angles = np.stack([latest[idx]['face_angles'] for idx in cameras])
+            arm_angles = np.stack([latest[idx]['arm_angles'] for idx in cameras])
+            self.client.send_people(face_angles, arm_angles, people=cameras)
+            for idx in cameras:
+                self.workers[idx]['sent_seq'] = latest[idx]['seq']
+                self.workers[idx]['results_sent'] += 1
+        return latest
+
+    def get_stats(self)->list:
+        now = time.time()
+        stats = []
+        for idx, worker in enumerate(self.workers):
+            values = dict(zip(STATS_FIELDS, worker['stats']))
+            elapsed = values['heartbeat'] - values['start_time']
+            stats.append({
+                'alive': worker['process'].is_alive(),
+                'live': self.is_live(idx, now),
+                'exitcode': worker['process'].exitcode,
+                'frames_captured': int(values['frames_captured']),
+                'frames_dropped': int(values['frames_dropped']),
+                'inferences': int(values['inferences']),
+                'inference_fps': values['inferences'] / elapsed if elapsed > 0 else 0.,
+                'seconds_since_heartbeat': now - values['heartbeat'] if values['heartbeat'] else None,
+                'results_read': worker['results_read'],
+                'results_sent': worker['results_sent'],
+            })
+        return stats
+
+if __name__ == '__main__':
+    from src.networking import GodotUDPClient
+
+    parser = argparse.ArgumentParser(description='Run several cameras in worker processes and send their angles to Godot.')
+    parser.add_argument('cameras', nargs='+', help='camera indices or video paths')
+    parser.add_argument('--seconds', type=float, help='stop after this many seconds')
+    parser.add_argument('--output-rate', type=float, default=60.)
+    parser.add_argument('--max-heartbeat-age', type=float, default=1., help='seconds without a result before a camera is skipped')
+    args = parser.parse_args()
+
+    cameras = [int(camera) if camera.isdigit() else camera for camera in args.cameras]
+    supervisor = MultiCameraSupervisor(cameras, CameraPipeline, client=GodotUDPClient(),
+                                       max_heartbeat_age=args.max_heartbeat_age)
+    supervisor.start()
+    start = time.time()
+    try:
+        while args.seconds is None or time.time() - start < args.seconds:
+            supervisor.send()
+            time.sleep(1. / args.output_rate)
+    except KeyboardInterrupt:
+        pass
+    print('Worker stats:', supervisor.get_stats())
+    supervisor.stop()
@@ -1,27 +1,89 @@
+import json
+import random
 import socket
+import time
+
+import numpy as np
+
+from src.wire_format import get_table_id, encode_table, encode_frame
+
+def format_person(face_angles, arm_angles=None, person=None)->dict:
+    message = {
+        "face": {
+            "pitch": float(face_angles[0]),
+            "yaw": float(face_angles[1]),
+            "roll": float(face_angles[2]),
+        }
+    }
+    if arm_angles is not None:
+        message["arm"] = {
+            "shoulder_left": float(arm_angles[0]),
+            "shoulder_right": float(arm_angles[1]),
+            "arm_left": float(arm_angles[2]),
+            "arm_right": float(arm_angles[3])
+        }
+    if person is not None:
+        message["person"] = int(person)
+    return message
 
 class GodotUDPClient:
-    def __init__(self):
+    '''Sends joint values to godot3/UDPServer.gd.
+
+    By default packets use the binary format of src.wire_format: send_joints() announces the joint
+    table whenever its layout changes (and every table_interval seconds for receivers that start late)
+    and then sends the values as packed float32. Every client gets a random session id, so the receiver
+    tells a restarted sender from late packets. With binary=False the JSON text messages are sent.
+    '''
+    def __init__(self, host="127.0.0.1", port=4240, binary=True, table_interval=1., session=None):
+        self.address = (host, port)
+        self.binary = binary
+        self.table_interval = table_interval
+        self.session = random.getrandbits(32) if session is None else session
+        self.sequence = 0
+        self._table = None
+        self._table_id = None
+        self._table_time = 0.
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
 
+    def send_joints(self, joints:dict, person=0, timestamp=None):
+        # {joint name: values}, e.g. [x, y, z, w] rotations or [pitch, yaw, roll] angles
+        timestamp = time.time() if timestamp is None else timestamp
+        table = [(name, len(values)) for name, values in joints.items()]
+        if table != self._table or timestamp - self._table_time >= self.table_interval:
+            self._table, self._table_id, self._table_time = table, get_table_id(table), timestamp
+            self._send_packet(encode_table(table, self.sequence, timestamp, self.session))
+        values = np.concatenate([np.ravel(values) for values in joints.values()])
+        self._send_packet(encode_frame(self._table_id, values, self.sequence, timestamp, int(person), self.session))
+
     def send_message(self, angles):
-        message = {
-            "face": {
-                "pitch": angles[0],
-                "yaw": angles[1],
-                "roll": angles[2],
-            },
-            "arm": {
-                "shoulder_left": angles[3],
-                "shoulder_right": angles[4],
-                "arm_left": angles[5],
-                "arm_right": angles[6]
-            }
-        }
-        message_str = str(message).replace("'", '"')
-        self.sock.sendto(message_str.encode('utf-8'), ("127.0.0.1", 4240))
+        # [pitch, yaw, roll] face angles, optionally followed by the 4 arm angles
+        arm_angles = angles[3:7] if len(angles) >= 7 else None
+        self._send_person(angles[:3], arm_angles)
+
+    def send_people(self, face_angles, arm_angles=None, people=None):
+        # (P, 3) face angles and (P, 4) arm angles, one datagram per person tagged with its index
+        # (or with its entry of people, e.g. the camera it was seen by)
+        people = range(len(face_angles)) if people is None else people
+        for idx, person in enumerate(people):
+            self._send_person(face_angles[idx], None if arm_angles is None else arm_angles[idx], person)
+
+    def _send_person(self, face_angles, arm_angles=None, person=None):
+        if not self.binary:
+            self._send(format_person(face_angles, arm_angles, person))
+            return
+        joints = {"face": face_angles}
+        if arm_angles is not None:
+            joints["arm"] = arm_angles
+        self.send_joints(joints, 0 if person is None else person)
+
+    def _send(self, message):
+        self._send_packet(json.dumps(message).encode('utf-8'))
+
+    def _send_packet(self, packet:bytes):
+        self.sock.sendto(packet, self.address)
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
 
 if __name__ == '__main__':
     client = GodotUDPClient()
-    client.send_message([0.75, 0, 0, 0, 0, 0])
\ No newline at end of file
+    client.send_message([0.75, 0, 0, 0, 0, 0, 0])
@@ -1,24 +1,75 @@
-import tensorflow as tf
+import numpy as np
 
-def format_image(image):
-    # Resize and pad the image to keep the aspect ratio and fit the expected size.
-    return tf.cast(tf.expand_dims(image, axis=0), dtype=tf.int32)
+from src.interpreter import load_interpreter, tensor_view, read_output
 
 class Movenet:
-    def __init__(self, model_path):
+    '''MoveNet single pose.
+
+    Frames are written straight into the interpreter's input tensor. predict() returns a copy of the
+    output. With copy=False it returns a view of the output tensor instead, which saves the copy but
+    has to be released before the next prediction: the runtime refuses to invoke while one is alive.
+    '''
+    def __init__(self, model_path, num_threads=None, latency=None):
         self.model_path = model_path
         # Initialize the TFLite interpreter
-        self.model = tf.lite.Interpreter(model_path=model_path)
-        self.model.allocate_tensors()
+        self.model = load_interpreter(model_path, num_threads, latency)
         self.input_details = self.model.get_input_details()
         self.output_details = self.model.get_output_details()
 
-    def predict(self, image):
-        _image = format_image(image)
-        # TF Lite format expects tensor type of uint8.
-        input_image = tf.cast(_image, dtype=tf.uint8)
-        self.model.set_tensor(self.input_details[0]['index'], input_image)
+    def warm_up(self):
+        # the first invoke prepares the kernels and is much slower than the following ones
+        self.model.invoke()
+
+    def _resize_input(self, shape):
+        # only reallocated when the input shape changes
+        if tuple(self.input_details[0]['shape']) != tuple(shape):
+            self.model.resize_tensor_input(self.input_details[0]['index'], shape)
+            self.model.allocate_tensors()
+            self.input_details = self.model.get_input_details()
+            self.output_details = self.model.get_output_details()
+
+    def predict(self, image, copy=True):
+        # back to a single frame after predict_batch, a no-op otherwise
+        self._resize_input((1,) + tuple(self.input_details[0]['shape'][1:]))
+        # the frame is cast to the input type (uint8) while it is copied into the input tensor
+        tensor_view(self.model, self.input_details[0])[0] = image
         self.model.invoke()
         # Output is a [1, 1, 17, 3] numpy array.
-        keypoints = self.model.get_tensor(self.output_details[0]['index'])
-        return keypoints
+        return read_output(self.model, self.output_details[0], copy)
+
+    def predict_batch(self, images, copy=True):
+        # (N, H, W, 3) frames, e.g. from several cameras, in a single invoke. Returns (N, 1, 17, 3)
+        self._resize_input(np.shape(images))
+        tensor_view(self.model, self.input_details[0])[:] = images
+        self.model.invoke()
+        return read_output(self.model, self.output_details[0], copy)
+
+def parse_multipose_output(output, score_threshold=0.2):
+    # [1, 6, 56] MultiPose output: 17 (y, x, score) keypoints, then a [ymin, xmin, ymax, xmax, score] box per person
+    people = np.asarray(output).reshape(-1, 56)
+    people = people[people[:, 55] > score_threshold]
+    return MultiPoseResults(people[:, :51].reshape(-1, 17, 3), people[:, 51:55], people[:, 55])
+
+class MovenetMultiPose(Movenet):
+    '''MoveNet MultiPose: keypoints of up to 6 people in a single pass.
+
+    predict() returns MultiPoseResults with (P, 17, 3) keypoints in the single pose layout, (P, 4)
+    boxes and (P,) scores of the people detected above score_threshold. Frame height and width
+    must be multiples of 32; the input tensor follows the frame size.
+    '''
+    def __init__(self, model_path, num_threads=None, latency=None, score_threshold=0.2):
+        super().__init__(model_path, num_threads, latency)
+        self.score_threshold = score_threshold
+
+    def predict(self, image):
+        self._resize_input((1,) + np.shape(image))
+        tensor_view(self.model, self.input_details[0])[0] = image
+        self.model.invoke()
+        # the results are selected out of the output view, so they stay valid after the next invoke
+        return parse_multipose_output(read_output(self.model, self.output_details[0]), self.score_threshold)
+
+class MultiPoseResults:
+    def __init__(self, keypoints, boxes, scores):
+        self.keypoints = keypoints
+        self.boxes = boxes
+        self.scores = scores
@@ -1,49 +1,69 @@
 import math
 
+import numpy as np
+
 from .utils import KEYPOINT_MAPPING
 
+# keypoints are [..., 17, 3] arrays of (y, x, confidence), a single person or a (P, 17, 3) batch of people,
+# face boxes are [..., 4] arrays of (x_left, y_top, x_right, y_bot)
+
 def get_face_pitch(keypoints, bbox):
-    y_center, _, _ = keypoints[KEYPOINT_MAPPING['nose']]
-    _, y_top, _, y_bot = bbox
+    y_center = keypoints[..., KEYPOINT_MAPPING['nose'], 0]
+    y_top, y_bot = bbox[..., 1], bbox[..., 3]
     # Get nose position relative to bbox height
     position = ((y_center - y_top) / (y_bot - y_top) - 0.5) * 2
     # Transform nose position into an angle
-    angle = max(-90, min(position * 90, 90))
-    return round(angle, 3)
+    angle = np.clip(position * 90, -90, 90)
+    return np.round(angle, 3)
 
 def get_face_yaw(keypoints, bbox):
-    _, x_center, _ = keypoints[KEYPOINT_MAPPING['nose']]
-    x_left, _, x_right, _ = bbox
+    x_center = keypoints[..., KEYPOINT_MAPPING['nose'], 1]
+    x_left, x_right = bbox[..., 0], bbox[..., 2]
     # Get nose position relative to the ears
     position = ((x_center - x_left) / (x_right - x_left) - 0.5) * 2
     # Transform nose position into an angle
-    angle = max(-90, min(position * 90, 90))
-    return round(angle, 3)
+    angle = np.clip(position * 90, -90, 90)
+    return np.round(angle, 3)
 
 def to_rads(angle):
     return angle / 180 * math.pi
 
+def match_faces(keypoints, boxes):
+    # index of the face box whose center is closest to each person's nose, [...]
+    noses = keypoints[..., KEYPOINT_MAPPING['nose'], 1::-1] # (x, y)
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    distances = np.linalg.norm(noses[..., None, :] - centers, axis=-1)
+    return np.argmin(distances, axis=-1)
+
 def calculate_face_angles(keypoints, results, in_rads=True):
-    pitch, yaw, roll = 0, 0, 0
+    # [pitch, yaw, roll] for a single person, (P, 3) array for a batch of people
+    keypoints = np.asarray(keypoints)
+    angles = np.zeros(keypoints.shape[:-2] + (3,))
     if len(results.boxes) > 0:
-        for box_idx in range(len(results.boxes)):
-            bbox = results.boxes[box_idx]
-        pitch = get_face_pitch(keypoints, bbox)
-        yaw = get_face_yaw(keypoints, bbox)
+        boxes = np.asarray(results.boxes)
+        bbox = boxes[match_faces(keypoints, boxes)]
+        angles[..., 0] = get_face_pitch(keypoints, bbox)
+        angles[..., 1] = get_face_yaw(keypoints, bbox)
     if in_rads:
-        return list(map(to_rads, [pitch, yaw, roll]))
-    return [pitch, yaw, roll]
+        angles = to_rads(angles)
+    return angles.tolist() if keypoints.ndim == 2 else angles
 
 def get_angle(keypoints, limb1, limb2, invert=False, shift=0):
-    y_limb1, x_limb1, _ = keypoints[KEYPOINT_MAPPING[limb1]]
-    y_limb2, x_limb2, _ = keypoints[KEYPOINT_MAPPING[limb2]]
-    angle_tan = (y_limb2 - y_limb1) / (x_limb2 - x_limb1)
-    rads = max(-90, min(math.atan(angle_tan), 90))
+    limb1 = keypoints[..., KEYPOINT_MAPPING[limb1], :2]
+    limb2 = keypoints[..., KEYPOINT_MAPPING[limb2], :2]
+    # vertical limbs give +-inf and an angle of +-pi/2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angle_tan = (limb2[..., 0] - limb1[..., 0]) / (limb2[..., 1] - limb1[..., 1])
+    rads = np.arctan(angle_tan)
     return (rads * -1 if invert else rads) + shift
 
 def calculate_arm_angles(keypoints):
-    right_arm = get_angle(keypoints, 'right_shoulder', 'right_elbow', shift=-1.5, invert=True)
-    left_arm = get_angle(keypoints, 'left_shoulder', 'left_elbow', shift=-1.5)
-    right_hand = get_angle(keypoints, 'right_elbow', 'right_wrist')
-    left_hand = get_angle(keypoints, 'left_elbow', 'left_wrist')
-    return [right_arm, left_arm, right_hand, left_hand]
\ No newline at end of file
+    # [right_arm, left_arm, right_hand, left_hand] for a single person, (P, 4) array for a batch of people
+    keypoints = np.asarray(keypoints)
+    angles = np.stack([
+        get_angle(keypoints, 'right_shoulder', 'right_elbow', shift=-1.5, invert=True),
+        get_angle(keypoints, 'left_shoulder', 'left_elbow', shift=-1.5),
+        get_angle(keypoints, 'right_elbow', 'right_wrist'),
+        get_angle(keypoints, 'left_elbow', 'left_wrist'),
+    ], axis=-1)
+    return angles.tolist() if keypoints.ndim == 2 else angles
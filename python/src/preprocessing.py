@@ -1,4 +1,9 @@
 import cv2
+import numpy as np
+
+# normalization the Midas model was trained with
+MIDAS_MEAN = [0.485, 0.456, 0.406]
+MIDAS_STD = [0.229, 0.224, 0.225]
 
 def resize_and_pad(frame, shape=(192, 192)):
     height, width, _ = frame.shape
@@ -9,4 +14,40 @@ def resize_and_pad(frame, shape=(192, 192)):
         top = bot = (width - height) // 2
     padded = cv2.copyMakeBorder(frame, top, bot, left, right, cv2.BORDER_CONSTANT)
 
-    return cv2.resize(padded, shape, interpolation = cv2.INTER_AREA)
\ No newline at end of file
+    return cv2.resize(padded, shape, interpolation = cv2.INTER_AREA)
+
+class ImagePreprocessor:
+    '''Resize and normalize frames straight into a preallocated float32 (1, H, W, C) model input.
+
+    output = (resized * scale - mean) / std, computed as one multiply and one subtract in float32.
+    With swap_rb the BGR -> RGB conversion is folded into the normalization instead of copying the
+    full frame first. Resizing happens on the uint8 frame so that the only full-size pass is OpenCV's.
+    '''
+    def __init__(self, height, width, mean=0., std=1., scale=1., swap_rb=False, interpolation=cv2.INTER_CUBIC, channels=3):
+        self.height = height
+        self.width = width
+        self.swap_rb = swap_rb
+        self.interpolation = interpolation
+        self.gain = (np.float32(scale) / np.asarray(std, dtype=np.float32)).astype(np.float32)
+        self.bias = (np.asarray(mean, dtype=np.float32) / np.asarray(std, dtype=np.float32)).astype(np.float32)
+        self.buffer = np.empty((1, height, width, channels), dtype=np.float32)
+        self._resized = np.empty((height, width, channels), dtype=np.uint8)
+
+    def __call__(self, image, out=None):
+        # out defaults to the preprocessor's own buffer, which is overwritten on every call
+        out = self.buffer if out is None else out
+        resized = cv2.resize(image, (self.width, self.height), dst=self._resized, interpolation=self.interpolation)
+        if self.swap_rb:
+            resized = resized[..., ::-1]
+        target = out.reshape(self.height, self.width, -1)
+        np.multiply(resized, self.gain, out=target)
+        target -= self.bias
+        return out
+
+def midas_preprocessor(height=256, width=256):
+    return ImagePreprocessor(height, width, mean=MIDAS_MEAN, std=MIDAS_STD)
+
+def blaze_face_preprocessor(height, width, channels=3):
+    # BGR frame to RGB in [-1, 1]
+    return ImagePreprocessor(height, width, mean=0.5, std=0.5, scale=1/255.0, swap_rb=True, channels=channels)
+
@@ -1,5 +1,7 @@
 import cv2
-from scipy.spatial.transform import Rotation as R
+import numpy as np
+
+from keypoints.utils import rotvec_to_quat
 
 KEYPOINT_MAPPING = {
     'nose': 0,
@@ -21,18 +23,16 @@ KEYPOINT_MAPPING = {
     'right_ankle': 16
 }
 
-def draw_keypoints(image, keypoints):
-    points = []
+def draw_keypoints(image, keypoints, threshold=0.2):
+    # (17, 3) keypoints of one person or (P, 17, 3) of several, as (y, x, confidence)
+    keypoints = np.asarray(keypoints).reshape(-1, 3)
     frameHeight, frameWidth, _ = image.shape
-    for (y, x, conf) in keypoints:
-        # Slice heatmap of corresponging body's part.
-        x, y = frameWidth * x, frameHeight * y
-        points.append((int(x), int(y)) if conf > 0.2 else None)
+    visible = keypoints[keypoints[:, 2] > threshold]
+    points = (visible[:, 1::-1] * [frameWidth, frameHeight]).astype(int)
     for point in points:
-        if point:
-            cv2.ellipse(image, point, (3, 3), 0, 0, 360, (0, 0, 255), cv2.FILLED)
+        cv2.ellipse(image, tuple(point.tolist()), (3, 3), 0, 0, 360, (0, 0, 255), cv2.FILLED)
     return image
 
 def rot_to_quat(angles):
-    r = R.from_rotvec(angles)
-    return r.as_quat()
\ No newline at end of file
+    # [x, y, z, w] like scipy's Rotation.from_rotvec(angles).as_quat()
+    return rotvec_to_quat(angles)
\ No newline at end of file
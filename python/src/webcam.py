@@ -1,18 +1,129 @@
+import threading
+import time
+
 import cv2
+import numpy as np
+
+class SyntheticSource:
+    '''VideoCapture stand-in that plays back given frames (or generated noise) at a fixed rate.'''
+    def __init__(self, frames=None, fps=30., num_frames=None, shape=(192, 192, 3), seed=0):
+        if frames is None:
+            rng = np.random.default_rng(seed)
+            frames = rng.integers(0, 256, size=(num_frames or 30,) + tuple(shape), dtype=np.uint8)
+        self.frames = frames
+        self.period = 1. / fps if fps else 0.
+        self.frame_idx = 0
+        self.next_frame_time = time.time()
+
+    def isOpened(self):
+        return self.frame_idx < len(self.frames)
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        delay = self.next_frame_time - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_time = max(self.next_frame_time + self.period, time.time())
+        frame = self.frames[self.frame_idx]
+        self.frame_idx += 1
+        return True, frame
+
+    def release(self):
+        self.frame_idx = len(self.frames)
 
 class Webcam:
-    def __init__(self, camera_idx=0):
+    '''Frame source backed by cv2.VideoCapture.
+
+    camera_idx can be a camera index, a video file path or any object with VideoCapture's
+    read()/release() methods (e.g. SyntheticSource). With threaded=True frames are read in a
+    background thread into a ring buffer of buffer_size slots and grab_frame always returns the
+    newest one, so the caller never waits on the camera and stale frames are dropped.
+    '''
+    def __init__(self, camera_idx=0, threaded=False, buffer_size=2):
         self.vid = None
         self.camera_idx = camera_idx
-    
+        self.threaded = threaded
+        self.buffer_size = buffer_size
+        self._thread = None
+        self._running = False
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self._buffer = [None] * self.buffer_size # (sequence number, frame, timestamp)
+        self._condition = threading.Condition()
+        self._latest_seq = -1
+        self._last_read_seq = -1
+        self.finished = False
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.overruns = 0
+
     def start_capture(self):
-        self.vid = cv2.VideoCapture(self.camera_idx)
+        if hasattr(self.camera_idx, 'read'):
+            self.vid = self.camera_idx
+        else:
+            self.vid = cv2.VideoCapture(self.camera_idx)
+        if self.threaded:
+            if isinstance(self.vid, cv2.VideoCapture):
+                # keep the driver from queueing frames behind our back
+                self.vid.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self._reset_buffer()
+            self._running = True
+            self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self._thread.start()
 
     def stop_capture(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+            self._thread = None
         if self.vid:
             self.vid.release()
 
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self.vid.read()
+            timestamp = time.time()
+            with self._condition:
+                if not ret:
+                    self.finished = True
+                    self._condition.notify_all()
+                    return
+                seq = self._latest_seq + 1
+                slot = seq % self.buffer_size
+                # the slot still holds a frame the consumer never got to
+                if self._buffer[slot] is not None and self._buffer[slot][0] > self._last_read_seq:
+                    self.overruns += 1
+                self._buffer[slot] = (seq, frame, timestamp)
+                self._latest_seq = seq
+                self.frames_captured += 1
+                self._condition.notify_all()
+
     def grab_frame(self):
-        ret, frame = self.vid.read()
+        frame, _ = self.grab_frame_with_timestamp()
         return frame
 
+    def grab_frame_with_timestamp(self, timeout=1.):
+        # returns (frame, capture timestamp), (None, None) when the source is exhausted or times out
+        if not self.threaded:
+            ret, frame = self.vid.read()
+            return (frame, time.time()) if ret else (None, None)
+
+        with self._condition:
+            has_new_frame = self._condition.wait_for(
+                lambda: self._latest_seq > self._last_read_seq or self.finished, timeout)
+            if not has_new_frame or self._latest_seq <= self._last_read_seq:
+                return None, None
+            seq, frame, timestamp = self._buffer[self._latest_seq % self.buffer_size]
+            self.frames_dropped += seq - self._last_read_seq - 1
+            self._last_read_seq = seq
+            return frame, timestamp
+
+    def get_stats(self)->dict:
+        with self._condition:
+            return {
+                'frames_captured': self.frames_captured,
+                'frames_dropped': self.frames_dropped,
+                'overruns': self.overruns,
+            }
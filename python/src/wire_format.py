@@ -0,0 +1,123 @@
+'''Binary UDP packets sent to Godot, decoded by godot3/UDPServer.gd.
+
+Every packet starts with a 28 byte little-endian header:
+    magic b'GPOS', version u8, kind u8, table id u16, session u32, sequence u32, timestamp f64, person u16, count u16
+A TABLE packet announces a joint table: `count` entries of (components u8, name length u8, utf-8 name).
+A FRAME packet carries `count` float32 values, the components of every joint of its table in table
+order, e.g. [x, y, z, w] rotations. Tables are identified by a hash of their layout and are resent
+periodically, so a receiver that starts late (or misses one) picks them up; frames of an unknown
+table are dropped. Every sender picks a random session id when it starts. Sequence numbers are only
+compared within a session, so a restarted sender is recognised by its new session id, and late
+packets of a session the sender has left are dropped.
+'''
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'GPOS'
+VERSION = 2
+KIND_TABLE = 0
+KIND_FRAME = 1
+HEADER = struct.Struct('<4sBBHIIdHH')
+# sessions a sender has left, remembered to drop their late packets
+MAX_RETIRED_SESSIONS = 8
+
+def get_table_id(table)->int:
+    # table: [(joint name, components)], the id changes whenever the layout does
+    return zlib.crc32(repr(list(table)).encode('utf-8')) & 0xFFFF
+
+def encode_table(table, sequence:int, timestamp:float, session:int=0)->bytes:
+    entries = b''.join(struct.pack('<BB', components, len(name.encode('utf-8'))) + name.encode('utf-8')
+                       for name, components in table)
+    header = HEADER.pack(MAGIC, VERSION, KIND_TABLE, get_table_id(table), session, sequence & 0xFFFFFFFF, timestamp, 0,
+                         len(table))
+    return header + entries
+
+def encode_frame(table_id:int, values, sequence:int, timestamp:float, person:int=0, session:int=0)->bytes:
+    values = np.asarray(values, dtype='<f4').ravel()
+    header = HEADER.pack(MAGIC, VERSION, KIND_FRAME, table_id, session, sequence & 0xFFFFFFFF, timestamp, person,
+                         len(values))
+    return header + values.tobytes()
+
+def is_newer(sequence:int, last:int)->bool:
+    # sequence numbers wrap around, anything up to half the range behind the last one is stale
+    return 0 < (sequence - last) & 0xFFFFFFFF < 0x80000000
+
+class WireDecoder:
+    '''Reference decoder, mirrors decode_packet of godot3/UDPServer.gd.
+
+    decode() returns {'session', 'sequence', 'timestamp', 'person', 'joints': {name: float32 values}} for
+    frames and None for table packets, packets of a session the sender has left, frames of an unknown
+    table and frames older than the last one of the same sender and person. sender is e.g. the
+    (host, port) address of the packet. Malformed packets raise ValueError.
+    '''
+    def __init__(self):
+        self.tables = {}
+        self.sessions = {} # sender: current session
+        self.retired_sessions = {} # sender: sessions it has left, newest last
+        self.last_sequence = {} # (sender, person): sequence of the last frame
+
+    def forget(self, sender):
+        # drops the state of a sender that has gone away
+        self.sessions.pop(sender, None)
+        self.retired_sessions.pop(sender, None)
+        self._clear_sequences(sender)
+
+    def _clear_sequences(self, sender):
+        self.last_sequence = {key: sequence for key, sequence in self.last_sequence.items() if key[0] != sender}
+
+    def _accept_session(self, sender, session)->bool:
+        current = self.sessions.get(sender)
+        if current == session:
+            return True
+        retired = self.retired_sessions.setdefault(sender, [])
+        if session in retired:
+            return False
+        # a new session, the sender restarted and its sequence numbers start over
+        if current is not None:
+            retired[:] = (retired + [current])[-MAX_RETIRED_SESSIONS:]
+        self._clear_sequences(sender)
+        self.sessions[sender] = session
+        return True
+
+    def decode(self, packet:bytes, sender=None):
+        if len(packet) < HEADER.size:
+            raise ValueError(f'Packet of {len(packet)} bytes is shorter than the header')
+        magic, version, kind, table_id, session, sequence, timestamp, person, count = HEADER.unpack_from(packet)
+        if magic != MAGIC:
+            raise ValueError(f'Unexpected magic {magic}')
+        if version != VERSION:
+            raise ValueError(f'Unsupported version {version}')
+
+        if kind not in (KIND_TABLE, KIND_FRAME):
+            raise ValueError(f'Unknown packet kind {kind}')
+        if kind == KIND_FRAME and len(packet) != HEADER.size + 4 * count:
+            raise ValueError(f'Frame of {len(packet)} bytes does not hold {count} values')
+        if not self._accept_session(sender, session):
+            return None
+
+        if kind == KIND_TABLE:
+            table, offset = [], HEADER.size
+            for _ in range(count):
+                components, name_length = struct.unpack_from('<BB', packet, offset)
+                offset += 2
+                table.append((packet[offset:offset + name_length].decode('utf-8'), components))
+                offset += name_length
+            self.tables[table_id] = table
+            return None
+
+        table = self.tables.get(table_id)
+        if table is None or sum(components for _, components in table) != count:
+            return None
+        last = self.last_sequence.get((sender, person))
+        if last is not None and not is_newer(sequence, last):
+            return None
+        self.last_sequence[(sender, person)] = sequence
+
+        values = np.frombuffer(packet, dtype='<f4', count=count, offset=HEADER.size)
+        joints, offset = {}, 0
+        for name, components in table:
+            joints[name] = values[offset:offset + components]
+            offset += components
+        return {'session': session, 'sequence': sequence, 'timestamp': timestamp, 'person': person, 'joints': joints}
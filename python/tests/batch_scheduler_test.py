@@ -0,0 +1,51 @@
+import numpy as np
+from src.batch_scheduler import BatchScheduler
+
+def _frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+def test_batch_released_when_full():
+    scheduler = BatchScheduler(max_batch_size=2, deadline=1.)
+    scheduler.submit('cam0', _frame(0), timestamp=0.)
+    assert not scheduler.ready(0.01), 'Expected a single frame to wait for the deadline'
+    scheduler.submit('cam1', _frame(1), timestamp=0.01)
+    outputs = scheduler.run(lambda frames: frames[:, 0, 0, 0], timestamp=0.01)
+    assert {source: int(p) for source, (p, _) in outputs.items()} == {'cam0': 0, 'cam1': 1}, \
+        f'Expected one prediction per source but got {outputs}'
+    assert not scheduler.pending, 'Expected the batch to be removed from the pending frames'
+
+def test_batch_released_at_deadline():
+    scheduler = BatchScheduler(max_batch_size=4, deadline=0.05)
+    scheduler.submit('cam0', _frame(0), timestamp=0.)
+    scheduler.submit('cam1', _frame(1), timestamp=0.02)
+    assert scheduler.run(lambda frames: frames, timestamp=0.04) == {}, 'Expected no batch before the deadline'
+    sources, frames, timestamps = scheduler.pop_batch(timestamp=0.05)
+    assert sources == ['cam0', 'cam1'] and frames.shape == (2, 4, 4, 3), \
+        f'Expected a partial batch at the deadline but got {sources} {frames.shape}'
+    assert timestamps == [0., 0.02], f'Expected the frame timestamps but got {timestamps}'
+
+def test_newest_frame_per_source():
+    scheduler = BatchScheduler(max_batch_size=2, deadline=1.)
+    scheduler.submit('cam0', _frame(0), timestamp=0.)
+    scheduler.submit('cam0', _frame(5), timestamp=0.1)
+    scheduler.submit('cam1', _frame(1), timestamp=0.2)
+    sources, frames, _ = scheduler.pop_batch(timestamp=0.2)
+    assert sources == ['cam0', 'cam1'] and frames[0, 0, 0, 0] == 5, 'Expected the newest frame of cam0 to be used'
+    assert scheduler.frames_replaced == 1, f'Expected one replaced frame but got {scheduler.frames_replaced}'
+
+def test_deadline_kept_when_frames_are_replaced():
+    # 2 sources at 60 fps never fill a batch of 4, the deadline has to release them
+    scheduler = BatchScheduler(max_batch_size=4, deadline=0.02)
+    batches = []
+    for frame_idx in range(10):
+        for camera_idx, source in enumerate(['cam0', 'cam1']):
+            timestamp = frame_idx / 60 + camera_idx * 0.005
+            scheduler.submit(source, _frame(frame_idx), timestamp)
+            batch = scheduler.pop_batch(timestamp)
+            if batch is not None:
+                batches.append(batch)
+    assert batches, 'Expected the deadline to release a batch'
+    sources, frames, timestamps = batches[0]
+    assert sources == ['cam0', 'cam1'] and list(frames[:, 0, 0, 0]) == [1, 1], \
+        f'Expected the newest frames of both sources but got {sources} {frames[:, 0, 0, 0]}'
+    assert len(batches) >= 4, f'Expected a batch about every other frame but got {len(batches)}'
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+from keypoints import benchmark
+
+def test_generate_pose_sequence_is_deterministic():
+    kpts_a = benchmark.generate_pose_sequence(10, seed=4)
+    kpts_b = benchmark.generate_pose_sequence(10, seed=4)
+    assert kpts_a.data.shape == (10, 14, 3), f'Expected shape (10, 14, 3) but got {kpts_a.data.shape}'
+    assert (kpts_a.data == kpts_b.data).all(), 'Expected the same sequence for the same seed'
+
+def test_no_regression_against_baseline():
+    # 100k frames only run from the command line: python -m keypoints.benchmark
+    results = benchmark.run_benchmarks([1, 1000], min_time=0.05)
+    for num_frames, operations in results.items():
+        for name, result in operations.items():
+            assert np.isfinite(result['fps']) and result['fps'] > 0, f'Invalid timing for {name} on {num_frames} frames'
+            assert result['relative_fps'] > 0, f'Invalid relative timing for {name} on {num_frames} frames'
+
+    # speed relative to the calibration kernel and allocations, neither depends on the machine
+    regressions = benchmark.compare_to_baseline(results, benchmark.load_baseline())
+    assert not regressions, 'Performance regressions:\n' + '\n'.join(regressions)
+
+def test_relative_timing_regression_is_reported():
+    baseline = benchmark.load_baseline()
+    results = {'1000': {'rotate_pose': {**baseline['1000']['rotate_pose']}}}
+    results['1000']['rotate_pose']['relative_fps'] /= 4
+    regressions = benchmark.compare_to_baseline(results, baseline)
+    assert len(regressions) == 1 and 'rotate_pose' in regressions[0], f'Expected a 4x slowdown to be reported but got {regressions}'
+
+@pytest.mark.skipif(not os.environ.get('BENCHMARK_TIMING'), reason='absolute fps depend on the machine, set BENCHMARK_TIMING=1')
+def test_no_absolute_timing_regression_against_baseline():
+    results = benchmark.run_benchmarks([1, 1000], min_time=0.2)
+    regressions = benchmark.compare_to_baseline(results, benchmark.load_baseline(), absolute_timing=True)
+    assert not regressions, 'Performance regressions:\n' + '\n'.join(regressions)
@@ -0,0 +1,61 @@
+import numpy as np
+from src.face_model.blazeFaceUtils import ANCHOR_OPTIONS, gen_anchors, get_anchors, decode_detections, \
+    non_max_suppression, weighted_non_max_suppression
+
+def test_anchor_array_matches_anchor_objects():
+    for type, options in ANCHOR_OPTIONS.items():
+        expected = np.array([[a.x_center, a.y_center, a.h, a.w] for a in gen_anchors(options)])
+        anchors = get_anchors(type)
+        assert anchors.shape == expected.shape, f'Expected {expected.shape} {type} anchors but got {anchors.shape}'
+        assert np.allclose(anchors, expected), f'Expected the {type} anchors to match gen_anchors'
+        assert get_anchors(type) is anchors, f'Expected the {type} anchors to be cached'
+
+def _decode_detection(raw, anchor, width, height):
+    # scalar decoding of a single detection
+    cx = (raw[0] + anchor[0] * width) / width
+    cy = (raw[1] + anchor[1] * height) / height
+    w, h = raw[2] / width, raw[3] / height
+    box = [cx - w * 0.5, cy - h * 0.5, cx + w * 0.5, cy + h * 0.5]
+    keypoints = [[(raw[4 + 2 * j] + anchor[0] * width) / width, (raw[5 + 2 * j] + anchor[1] * height) / height]
+                 for j in range(6)]
+    return box, keypoints
+
+def test_decode_detections_matches_scalar_decoding():
+    rng = np.random.default_rng(0)
+    anchors = get_anchors('back')
+    indices = rng.choice(len(anchors), size=20, replace=False)
+    raw = rng.normal(scale=20., size=(20, 16)).astype(np.float32)
+    boxes, keypoints = decode_detections(raw, anchors[indices], 256, 256)
+    for i, idx in enumerate(indices):
+        box, kpts = _decode_detection(raw[i], anchors[idx], 256, 256)
+        assert np.allclose(boxes[i], box, atol=1e-6), f'Expected box {box} but got {boxes[i]}'
+        assert np.allclose(keypoints[i], kpts, atol=1e-6), f'Expected keypoints {kpts} but got {keypoints[i]}'
+
+def test_decode_no_detections():
+    boxes, keypoints = decode_detections(np.zeros((0, 16), dtype=np.float32), np.zeros((0, 4), dtype=np.float32), 128, 128)
+    assert boxes.shape == (0, 4) and keypoints.shape == (0, 6, 2), f'Unexpected shapes {boxes.shape} {keypoints.shape}'
+
+def _overlapping_faces():
+    # two overlapping boxes around one face and a separate one
+    boxes = np.array([[0.1, 0.1, 0.3, 0.3], [0.12, 0.1, 0.32, 0.3], [0.6, 0.6, 0.8, 0.8]], dtype=np.float32)
+    keypoints = np.stack([boxes[:, :2], boxes[:, 2:]], axis=1)
+    scores = np.array([0.8, 0.9, 0.75], dtype=np.float32)
+    return boxes, keypoints, scores
+
+def test_non_max_suppression_keeps_best_of_each_face():
+    boxes, _, scores = _overlapping_faces()
+    selected = non_max_suppression(boxes, scores, 100, 0.3)
+    assert list(selected) == [1, 2], f'Expected the best box of each face but got {selected}'
+    selected = non_max_suppression(boxes, scores, 1, 0.3)
+    assert list(selected) == [1], f'Expected max_output_size to be respected but got {selected}'
+    selected = non_max_suppression(boxes, scores, 100, 0.95)
+    assert list(selected) == [1, 0, 2], f'Expected no suppression below the IoU threshold but got {selected}'
+
+def test_weighted_non_max_suppression_averages_face():
+    boxes, keypoints, scores = _overlapping_faces()
+    filtered_boxes, filtered_keypoints, filtered_scores = weighted_non_max_suppression(boxes, keypoints, scores, 100, 0.3)
+    expected = (0.8 * boxes[0] + 0.9 * boxes[1]) / 1.7
+    assert np.allclose(filtered_boxes, [expected, boxes[2]]), f'Expected score weighted boxes but got {filtered_boxes}'
+    assert np.allclose(filtered_keypoints[0], [expected[:2], expected[2:]]), \
+        f'Expected score weighted keypoints but got {filtered_keypoints[0]}'
+    assert np.allclose(filtered_scores, [0.9, 0.75]), f'Expected the best score of each face but got {filtered_scores}'
@@ -0,0 +1,59 @@
+import cv2
+import numpy as np
+from src.cropping import CropRegionTracker, init_crop_region, determine_crop_region, crop_and_resize, crop_to_frame, frame_to_crop
+
+def _body(center=(0.6, 0.3), size=0.2):
+    # (17, 3) frame-normalized keypoints of a small upright body, (y, x, score)
+    rng = np.random.default_rng(0)
+    keypoints = np.ones((17, 3))
+    keypoints[:, :2] = center + rng.uniform(-size / 2, size / 2, size=(17, 2))
+    return keypoints
+
+def test_init_crop_region_pads_to_square():
+    region = init_crop_region(480, 640)
+    assert np.allclose(region, [-1 / 6, 0, 7 / 6, 1]), f'Expected the frame padded vertically but got {region}'
+    crop = crop_and_resize(np.full((480, 640, 3), 255, dtype=np.uint8), region, 192)
+    assert crop[0, 96].sum() == 0 and crop[96, 96].sum() == 255 * 3, 'Expected zero padding above the frame'
+
+def test_crop_matches_resize_on_full_square_frame():
+    image = np.random.default_rng(0).integers(0, 256, size=(384, 384, 3), dtype=np.uint8)
+    crop = crop_and_resize(image, init_crop_region(384, 384), 192)
+    expected = cv2.resize(image, (192, 192), interpolation=cv2.INTER_LINEAR)
+    error = np.abs(crop.astype(int) - expected).max()
+    assert error <= 1, f'Expected the crop of the whole frame to match a resize but got an error of {error}'
+
+def test_crop_region_contains_body():
+    keypoints = _body()
+    region = determine_crop_region(keypoints, 480, 640)
+    y_min, x_min, y_max, x_max = region
+    assert np.isclose((y_max - y_min) * 480, (x_max - x_min) * 640), 'Expected a square region in pixels'
+    assert (y_max - y_min) < 0.6, f'Expected the region to zoom in on a small body but got {region}'
+    inside = (keypoints[:, 0] > y_min) & (keypoints[:, 0] < y_max) & (keypoints[:, 1] > x_min) & (keypoints[:, 1] < x_max)
+    assert inside.all(), f'Expected every keypoint inside the region {region}'
+
+def test_tracker_converges_on_body():
+    body = _body()
+    tracker = CropRegionTracker(smoothing=0.5)
+    for _ in range(20):
+        tracker.crop(np.zeros((480, 640, 3), dtype=np.uint8))
+        # what the model would predict on the current crop
+        y_min, x_min, y_max, x_max = tracker.crop_region
+        predicted = body.copy()
+        predicted[:, 0] = (body[:, 0] - y_min) / (y_max - y_min)
+        predicted[:, 1] = (body[:, 1] - x_min) / (x_max - x_min)
+        frame_keypoints = tracker.update(predicted)
+        assert np.allclose(frame_keypoints, body, atol=1e-5), 'Expected keypoints mapped back to the frame'
+    target = determine_crop_region(body, 480, 640)
+    assert np.allclose(tracker.crop_region, target, atol=1e-4), f'Expected the region to settle on {target}'
+
+    lost = predicted.copy()
+    lost[:, 2] = 0.
+    tracker.update(lost)
+    assert np.allclose(tracker.crop_region, init_crop_region(480, 640)), 'Expected the whole frame once the body is lost'
+
+def test_crop_to_frame_batch():
+    keypoints = np.full((2, 17, 3), 0.5)
+    frame_keypoints = crop_to_frame(keypoints, np.array([0.2, 0.4, 0.6, 0.8]))
+    assert np.allclose(frame_keypoints[..., :2], [0.4, 0.6]), f'Unexpected keypoints {frame_keypoints[0, 0]}'
+    assert np.allclose(frame_to_crop(frame_keypoints, np.array([0.2, 0.4, 0.6, 0.8])), keypoints), \
+        'Expected frame_to_crop to invert crop_to_frame'
@@ -0,0 +1,39 @@
+import time
+import numpy as np
+from src.depth_model import DepthWorker, sample_depth
+
+def test_sample_depth_is_bilinear():
+    # linear in both directions, so bilinear sampling is exact at pixel centers and between them
+    rows, cols = np.mgrid[0:256, 0:256].astype(np.float32)
+    depth_map = 2 * rows + 3 * cols
+    keypoints = np.random.default_rng(0).uniform(0.01, 0.99, size=(2, 17, 3))
+    depth = sample_depth(depth_map, keypoints)
+    assert depth.shape == (2, 17, 1), f'Expected a z-column per keypoint but got {depth.shape}'
+    expected = 2 * (keypoints[..., 0] * 256 - 0.5) + 3 * (keypoints[..., 1] * 256 - 0.5)
+    assert np.allclose(depth[..., 0], expected, atol=1e-3), 'Expected bilinear depth at the keypoints'
+    corner = sample_depth(depth_map, np.array([[1., 1., 1.]]))
+    assert np.isclose(corner[0, 0], 5 * 255), f'Expected keypoints to be clamped to the map but got {corner}'
+
+class _ConstantDepth:
+    # depth model stand-in returning the mean of the frame everywhere
+    def __init__(self):
+        self.calls = 0
+
+    def predict_depth(self, image, copy=False):
+        self.calls += 1
+        return np.full((256, 256), image.mean(), dtype=np.float32)
+
+def test_depth_worker_runs_at_reduced_rate():
+    model = _ConstantDepth()
+    worker = DepthWorker(model, rate=20.)
+    assert worker.sample(np.zeros((17, 3))) is None, 'Expected no depth before the first prediction'
+    worker.start()
+    start = time.time()
+    while time.time() - start < 0.3:
+        worker.submit(np.full((8, 8), 7.))
+        time.sleep(0.005)
+    worker.stop()
+    assert 2 <= model.calls <= 8, f'Expected about 6 predictions at 20 Hz in 0.3 s but got {model.calls}'
+    depth_map, timestamp = worker.latest()
+    assert timestamp >= start and np.allclose(worker.sample(np.full((17, 3), 0.5)), 7.), \
+        'Expected the newest depth map to be shared'
@@ -0,0 +1,61 @@
+import numpy as np
+from src.face_tracking import FaceBoxTracker, FACE_JOINTS
+from src.face_model.blazeFaceDetector import Results
+
+class _Detector:
+    # face box centered on the nose of the keypoints it was given
+    def __init__(self):
+        self.keypoints = None
+        self.calls = 0
+
+    def detectFaces(self, image):
+        self.calls += 1
+        y, x, _ = self.keypoints[0]
+        return Results(np.array([[x - 0.1, y - 0.1, x + 0.1, y + 0.1]]), np.array([[[x, y]] * 6]), np.array([0.9]))
+
+def _keypoints(y, x, conf=0.9):
+    keypoints = np.zeros((17, 3))
+    keypoints[FACE_JOINTS] = [y, x, conf]
+    keypoints[FACE_JOINTS[1:], 1] += [-0.02, 0.02, -0.05, 0.05]
+    return keypoints
+
+def _track(tracker, detector, keypoints):
+    detector.keypoints = keypoints
+    return tracker.detect(None, keypoints)
+
+def test_box_follows_keypoints_between_detections():
+    detector = _Detector()
+    tracker = FaceBoxTracker(detector, max_age=30)
+    _track(tracker, detector, _keypoints(0.5, 0.5))
+    results = _track(tracker, detector, _keypoints(0.52, 0.47))
+    assert detector.calls == 1, f'Expected the box to be reused but the detector ran {detector.calls} times'
+    assert np.allclose(results.boxes[0], [0.37, 0.42, 0.57, 0.62]), f'Expected the box shifted with the nose but got {results.boxes[0]}'
+    assert np.allclose(results.keypoints[0, 0], [0.47, 0.52]), 'Expected the face keypoints to be shifted'
+
+def test_detection_triggers():
+    detector = _Detector()
+    tracker = FaceBoxTracker(detector, max_age=3, min_confidence=0.3)
+    for _ in range(5):
+        _track(tracker, detector, _keypoints(0.5, 0.5))
+    assert detector.calls == 2, f'Expected a detection after max_age frames but got {detector.calls}'
+
+    _track(tracker, detector, _keypoints(0.5, 0.5, conf=0.1))
+    assert detector.calls == 3, 'Expected a detection when the face confidence drops'
+
+    _track(tracker, detector, _keypoints(0.5, 0.5))
+    _track(tracker, detector, _keypoints(0.5, 0.5))
+    keypoints = _keypoints(0.5, 0.5)
+    keypoints[FACE_JOINTS[3], 1] = 0.9 # an ear far outside the box
+    calls = detector.calls
+    _track(tracker, detector, keypoints)
+    assert detector.calls == calls + 1, 'Expected a detection when a face keypoint leaves the box'
+
+def test_stats():
+    detector = _Detector()
+    tracker = FaceBoxTracker(detector, max_age=5)
+    for _ in range(10):
+        _track(tracker, detector, _keypoints(0.5, 0.5))
+    stats = tracker.get_stats()
+    assert stats['frames'] == 10 and stats['detections'] == 2, f'Unexpected stats {stats}'
+    assert np.isclose(stats['detection_rate'], 0.2), f'Expected a detection rate of 0.2 but got {stats["detection_rate"]}'
+    assert stats['time_saved'] >= 0, f'Expected a non negative time saved but got {stats["time_saved"]}'
@@ -0,0 +1,37 @@
+import subprocess
+import sys
+from src.benchmark import HEAVY_MODULES
+
+def test_pipeline_imports_no_heavy_modules():
+    script = ('import sys, main_old, src.postprocessing, src.utils, keypoints; '
+              f'print([m for m in {HEAVY_MODULES!r} if m in sys.modules])')
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]', f'Expected no heavy module to be imported but got {output.strip()}'
+
+def test_output_views_block_invoke_on_real_runtime():
+    # the behaviour copy=True protects against, only checked where a TFLite runtime is installed
+    import numpy as np
+    import pytest
+    from src.interpreter import get_interpreter_class, load_interpreter, read_output
+    from src.face_model.blazeFaceDetector import MODEL_PATHS, BlazeFaceDetector
+    try:
+        get_interpreter_class()
+    except ImportError:
+        pytest.skip('no TFLite runtime installed')
+
+    interpreter = load_interpreter(MODEL_PATHS['back'])
+    output = interpreter.get_output_details()[1]
+    interpreter.invoke()
+    copied = read_output(interpreter, output, copy=True)
+    interpreter.invoke()
+    view = read_output(interpreter, output)
+    with pytest.raises(RuntimeError):
+        interpreter.invoke()
+    del view
+    interpreter.invoke()
+    assert copied.shape == tuple(output['shape']), f'Expected a copy of shape {output["shape"]} but got {copied.shape}'
+
+    detector = BlazeFaceDetector('back')
+    image = np.zeros((256, 256, 3), dtype=np.uint8)
+    results = [detector.detectFaces(image) for _ in range(3)]
+    assert all(len(result.scores) == 0 for result in results), 'Expected detections to be kept across inferences'
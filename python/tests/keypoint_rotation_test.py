@@ -1,5 +1,7 @@
 import numpy as np
-from keypoints import KeypointRotations
+from keypoints import KeypointRotations, Skeleton, BoneLengthCalibration
+from keypoints.keypoint_rotation import JOINTS
+import keypoints.utils as utils
 
 kpts_sample = {
     'lefthip': np.array([0.667934  , 8.87940658, 9.96319157]), 
@@ -256,4 +258,156 @@ def test_reconstruct_joint_kpts_from_angles():
         target_kpt = np.around(target_kpt, 3)
         output_kpt = np.around(output_kpt, 3)
         assert (target_kpt == output_kpt).all(), \
-            f'Expected keypoint to be {target_kpt} but got {output_kpt}'
\ No newline at end of file
+            f'Expected keypoint to be {target_kpt} but got {output_kpt}'
+
+def test_calculate_keypoint_angles_batch():
+    kp_obj = KeypointRotations()
+    new_kpts = kp_obj.add_neck_and_hip_keypoints(kpts_sample)
+
+    rng = np.random.default_rng(0)
+    frames = [{joint: kpt + rng.normal(scale=0.3, size=3) for joint, kpt in new_kpts.items()} for _ in range(5)]
+    frames.insert(0, new_kpts)
+    kpts_batch = np.stack([[frame[joint] for joint in JOINTS] for frame in frames])
+
+    output_angles = kp_obj.calculate_keypoint_angles_batch(kpts_batch)
+    assert output_angles.shape == kpts_batch.shape, \
+        f'Expected output shape {kpts_batch.shape} but got {output_angles.shape}'
+
+    for frame_idx, frame in enumerate(frames):
+        target_angles = kp_obj.calculate_keypoint_angles(frame)
+        for joint_idx, joint in enumerate(JOINTS):
+            target_angle = target_angles[joint]
+            output_angle = output_angles[frame_idx, joint_idx]
+            assert np.allclose(target_angle, output_angle), \
+                f'Expected {joint} angle to be {target_angle} but got {output_angle}'
+
+def test_skeleton_transforms_in_place():
+    kp_obj = KeypointRotations()
+    target_kpts = kp_obj.add_neck_and_hip_keypoints(kpts_sample)
+    target_kpts = kp_obj.center_keypoints(target_kpts, 'hips')
+
+    skeleton = Skeleton.from_dict(kpts_sample)
+    data = skeleton.data
+    output_kpts = kp_obj.add_neck_and_hip_keypoints(skeleton, out=skeleton)
+    output_kpts = kp_obj.center_keypoints(output_kpts, 'hips', out=output_kpts)
+
+    assert output_kpts is skeleton and output_kpts.data is data, \
+        'Expected the transforms to write into the given skeleton'
+    for joint, target_value in target_kpts.items():
+        assert np.allclose(target_value, output_kpts[joint]), \
+            f'Incorrect {joint}-keypoint, expected {target_value} but got {output_kpts[joint]}'
+
+def test_skeleton_dict_view():
+    skeleton = Skeleton.from_dict(kpts_sample)
+    kpts_view = skeleton.to_dict()
+    kpts_view['leftknee'][:] = 0
+
+    assert (skeleton['leftknee'] == 0).all(), 'Expected dict view to share memory with the skeleton'
+    assert not (kpts_sample['leftknee'] == 0).all(), 'Expected the source dict to be left untouched'
+
+def test_calculate_keypoint_angles_matches_rotation_chains():
+    kp_obj = KeypointRotations()
+    new_kpts = kp_obj.add_neck_and_hip_keypoints(kpts_sample)
+    new_kpts = kp_obj.center_keypoints(new_kpts, 'hips')
+
+    # reference: walk the hierarchy depth by depth rebuilding every rotation chain
+    target_angles = {joint: np.zeros(3) for joint in new_kpts}
+    target_angles['hips'] = kp_obj._calculate_root_rotation(new_kpts['hips'], new_kpts['lefthip'], new_kpts['neck'])
+    for depth in range(2, kp_obj.max_connected_joints+1):
+        for joint, connected_joints in kp_obj.kpts_hierarchy.items():
+            if len(connected_joints) != depth:
+                continue
+            parent = connected_joints[0]
+            z, y, x = kp_obj.get_joint_rotations(
+                new_kpts[joint], kp_obj.kpts_offsets[joint], new_kpts[parent], connected_joints, target_angles)
+            target_angles[parent] = np.array([z, x, y])
+
+    output_angles = kp_obj.calculate_keypoint_angles(new_kpts)
+    for joint in target_angles:
+        assert np.allclose(target_angles[joint], output_angles[joint]), \
+            f'Expected {joint} angle to be {target_angles[joint]} but got {output_angles[joint]}'
+
+def test_reconstruct_kpts_from_angles():
+    kp_obj = KeypointRotations()
+    new_kpts = kp_obj.add_neck_and_hip_keypoints(kpts_sample)
+    new_kpts = kp_obj.center_keypoints(new_kpts, 'hips')
+
+    rng = np.random.default_rng(1)
+    kpts_batch = new_kpts.data + rng.normal(scale=0.3, size=(4,) + new_kpts.data.shape)
+    kpts_batch = kp_obj.add_neck_and_hip_keypoints(Skeleton(kpts_batch))
+    angles_batch = kp_obj.calculate_keypoint_angles_batch(kpts_batch)
+
+    bone_lengths = kp_obj.get_bone_lengths(kpts_batch)
+    normalization = bone_lengths['neck']
+    base_skeleton = kp_obj.get_base_skeleton(bone_lengths, normalization)
+
+    output_kpts = kp_obj.reconstruct_kpts_from_angles(angles_batch, base_skeleton, kpts_batch['hips'], normalization)
+    assert output_kpts.shape == kpts_batch.data.shape, \
+        f'Expected output shape {kpts_batch.data.shape} but got {output_kpts.shape}'
+
+    for frame_idx in range(len(output_kpts)):
+        angles = Skeleton(angles_batch[frame_idx])
+        for joint_idx, joint in enumerate(JOINTS):
+            _, target_kpt = kp_obj.reconstruct_joint_kpts_from_angles(
+                joint, angles, base_skeleton, kpts_batch['hips'][frame_idx], normalization)
+            assert np.allclose(target_kpt, output_kpts[frame_idx, joint_idx]), \
+                f'Expected {joint} keypoint to be {target_kpt} but got {output_kpts[frame_idx, joint_idx]}'
+
+    # the angles only lose the left/right bone length asymmetry
+    errors = kp_obj.get_reconstruction_error(kpts_batch, angles_batch, base_skeleton, normalization)
+    assert errors.shape == output_kpts.shape[:-1]
+    assert errors.max() < 0.2, f'Expected small reconstruction error but got {errors.max()}'
+
+def test_calculate_keypoint_quaternions():
+    kp_obj = KeypointRotations()
+    new_kpts = kp_obj.add_neck_and_hip_keypoints(kpts_sample)
+
+    output_quats = kp_obj.calculate_keypoint_quaternions(new_kpts)
+    angles = kp_obj.calculate_keypoint_angles(new_kpts)
+    target_quats = utils.R_to_quat(utils.get_R_ZXY(angles.data))
+
+    assert output_quats.shape == (len(JOINTS), 4), f'Expected shape {(len(JOINTS), 4)} but got {output_quats.shape}'
+    # q and -q are the same rotation
+    assert np.allclose(np.abs(np.sum(output_quats * target_quats, axis=-1)), 1), \
+        f'Expected quaternions {target_quats} but got {output_quats}'
+
+def test_root_rotation_of_leaning_torso():
+    kp_obj = KeypointRotations()
+    # shoulders moved towards the left hip, so the spine is no longer perpendicular to the hips
+    kpts = {joint: value.copy() for joint, value in kpts_sample.items()}
+    lean = kpts['lefthip'] - kpts['righthip']
+    kpts['leftshoulder'] += 2 * lean
+    kpts['rightshoulder'] += 2 * lean
+
+    R = kp_obj.calculate_local_rotations(kpts)[JOINTS.index('hips')]
+    assert np.allclose(R @ R.T, np.eye(3)) and np.isclose(np.linalg.det(R), 1), f'Expected a rotation but got {R}'
+
+    output_quats = kp_obj.calculate_keypoint_quaternions(kpts)
+    angles = kp_obj.calculate_keypoint_angles(kpts)
+    target_quats = utils.R_to_quat(utils.get_R_ZXY(angles.data))
+    assert np.allclose(np.abs(np.sum(output_quats * target_quats, axis=-1)), 1), \
+        f'Expected quaternions {target_quats} but got {output_quats}'
+
+def test_bone_length_calibration():
+    kp_obj = KeypointRotations()
+    new_kpts = kp_obj.add_neck_and_hip_keypoints(kpts_sample)
+    target_bone_lengths = kp_obj.get_bone_lengths(new_kpts)
+
+    rng = np.random.default_rng(3)
+    calibration = BoneLengthCalibration(kp_obj, window=50, tolerance=1e-2, patience=5, min_frames=20)
+    frame_idx = 0
+    while not calibration.update(new_kpts.data + rng.normal(scale=0.01, size=new_kpts.data.shape)):
+        frame_idx += 1
+        assert frame_idx < 200, 'Expected calibration to converge on a static pose'
+
+    for joint, target_length in target_bone_lengths.items():
+        output_length = calibration.bone_lengths[joint]
+        assert abs(target_length - output_length) < 0.05, \
+            f'Expected {joint} length to be {target_length} but got {output_length}'
+
+    # frozen: further frames are ignored and the base skeleton is cached
+    base_skeleton = calibration.base_skeleton
+    calibration.update(new_kpts.data * 2)
+    assert calibration.base_skeleton is base_skeleton, 'Expected the base skeleton to stay cached once frozen'
+    assert np.isclose(calibration.normalization, calibration.bone_lengths['neck'])
+
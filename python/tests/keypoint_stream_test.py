@@ -0,0 +1,53 @@
+import numpy as np
+from src.keypoint_stream import KeypointStream
+
+def _keypoints(y, x, conf=1.):
+    kpts = np.zeros((17, 3), dtype=np.float32)
+    kpts[:] = [y, x, conf]
+    return kpts
+
+def test_inference_and_output_rates():
+    stream = KeypointStream(inference_rate=10, output_rate=60)
+    timestamps = np.arange(0, 1, 1 / 120)
+
+    num_inferences = sum(stream.should_infer(t) for t in timestamps)
+    num_outputs = sum(stream.should_output(t) for t in timestamps)
+    assert num_inferences == 10, f'Expected 10 inferences in one second but got {num_inferences}'
+    assert num_outputs == 60, f'Expected 60 outputs in one second but got {num_outputs}'
+
+def test_interpolation_and_extrapolation():
+    stream = KeypointStream(confidence_half_life=0.1, max_extrapolation=0.5)
+    assert stream.get(0.) is None, 'Expected no keypoints before the first inference'
+
+    stream.push(_keypoints(0.2, 0.4), 0.)
+    stream.push(_keypoints(0.3, 0.6, 0.5), 0.1)
+
+    output = stream.get(0.05)
+    assert np.allclose(output[0], [0.25, 0.5, 0.75]), f'Expected halfway keypoints but got {output[0]}'
+
+    # constant velocity past the newest frame, confidence halves every half-life
+    output = stream.get(0.2)
+    assert np.allclose(output[0], [0.4, 0.8, 0.25]), f'Expected extrapolated keypoints but got {output[0]}'
+
+    # extrapolation stops after max_extrapolation seconds
+    assert np.allclose(stream.get(5.)[0, :2], stream.get(0.6)[0, :2]), 'Expected extrapolation to be capped'
+
+def _run_pipeline(delay):
+    # main_old.py's loop at 120 fps, the body moves at constant speed and every inference is exact
+    stream = KeypointStream(inference_rate=10, output_rate=60, delay=delay)
+    outputs = []
+    for t in np.arange(0, 1, 1 / 120):
+        if stream.should_infer(t):
+            stream.push(_keypoints(0.1 + 0.5 * t, 0.5), t)
+        if stream.should_output(t) and t >= 0.1 + delay:
+            outputs.append((t, stream.get(t)))
+    return outputs
+
+def test_pipeline_delay_interpolates():
+    # with one inference period of delay every output falls between two inferred frames
+    for t, output in _run_pipeline(delay=0.1):
+        assert np.isclose(output[0, 0], 0.1 + 0.5 * (t - 0.1)) and output[0, 2] == 1., \
+            f'Expected interpolated keypoints at {t} but got {output[0]}'
+    # without it most outputs are extrapolated with decaying confidence
+    extrapolated = [output for _, output in _run_pipeline(delay=0.) if output[0, 2] < 1.]
+    assert len(extrapolated) > 40, f'Expected extrapolation without delay but got {len(extrapolated)} outputs'
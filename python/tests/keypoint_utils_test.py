@@ -0,0 +1,74 @@
+import numpy as np
+import keypoints.utils as utils
+
+def test_stacked_rotation_matrices():
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-np.pi, np.pi, size=(4, 5, 3))
+
+    output_R = utils.get_R_ZXY(angles)
+    assert output_R.shape == (4, 5, 3, 3), f'Expected shape (4, 5, 3, 3) but got {output_R.shape}'
+
+    for get_R, column in zip([utils.get_R_z, utils.get_R_x, utils.get_R_y], range(3)):
+        stacked_R = get_R(angles[..., column])
+        for idx in np.ndindex(angles.shape[:-1]):
+            assert np.allclose(stacked_R[idx], get_R(angles[idx][column])), \
+                f'Stacked {get_R.__name__} differs from the scalar version at {idx}'
+
+    for idx in np.ndindex(angles.shape[:-1]):
+        z, x, y = angles[idx]
+        target_R = utils.get_R_z(z) @ utils.get_R_x(x) @ utils.get_R_y(y)
+        assert np.allclose(target_R, output_R[idx]), f'Incorrect ZXY rotation at {idx}'
+
+    thetaz, thetay, thetax = utils.Decompose_R_ZXY(output_R)
+    recomposed_R = utils.get_R_ZXY(np.stack([thetaz, thetax, thetay], axis=-1))
+    assert np.allclose(recomposed_R, output_R), 'Expected decomposition to recompose the same rotations'
+
+def test_get_R2_stacked_and_degenerate():
+    rng = np.random.default_rng(1)
+    A = rng.normal(size=(6, 3))
+    B = rng.normal(size=(6, 3))
+    # parallel and opposite vectors, where the cross product vanishes
+    B[0] = 2 * A[0]
+    B[1] = -3 * A[1]
+
+    output_R = utils.Get_R2(A, B)
+    for idx in range(len(A)):
+        uA = A[idx] / utils.magnitude(A[idx])
+        uB = B[idx] / utils.magnitude(B[idx])
+        assert np.allclose(output_R[idx] @ uA, uB), f'Expected rotation {idx} to take A onto B'
+        assert np.allclose(output_R[idx] @ output_R[idx].T, np.eye(3)), f'Expected rotation {idx} to be orthonormal'
+        assert np.isclose(np.linalg.det(output_R[idx]), 1), f'Expected rotation {idx} to be proper'
+        if idx > 1:
+            assert np.allclose(output_R[idx], utils.Get_R2(A[idx], B[idx])), \
+                f'Stacked Get_R2 differs from the single vector version at {idx}'
+
+def test_quaternion_conversions():
+    rng = np.random.default_rng(2)
+    angles = rng.uniform(-np.pi, np.pi, size=(50, 3))
+    R = utils.get_R_ZXY(angles)
+
+    q = utils.R_to_quat(R)
+    assert q.shape == (50, 4), f'Expected shape (50, 4) but got {q.shape}'
+    # rotation matrix of a [x, y, z, w] quaternion
+    x, y, z, w = np.moveaxis(q, -1, 0)
+    target_R = np.stack([
+        1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w),
+        2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w),
+        2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)], axis=-1).reshape(R.shape)
+    assert np.allclose(target_R, R), 'Expected quaternions to describe the same rotations'
+
+    rotvec = np.array([[0., 0., 0.], [0., 0., np.pi / 2]])
+    target_q = np.array([[0., 0., 0., 1.], [0., 0., np.sin(np.pi / 4), np.cos(np.pi / 4)]])
+    assert np.allclose(utils.rotvec_to_quat(rotvec), target_q), 'Incorrect rotation vector conversion'
+
+def test_quat_slerp():
+    q0 = np.array([0., 0., 0., 1.])
+    q1 = np.array([0., 0., np.sin(np.pi / 4), np.cos(np.pi / 4)])
+    t = np.array([0., 0.5, 1.])
+
+    output_q = utils.quat_slerp(q0, q1, t)
+    target_q = utils.rotvec_to_quat(np.outer(t, [0., 0., np.pi / 2]))
+    assert np.allclose(output_q, target_q), f'Expected {target_q} but got {output_q}'
+
+    # -q1 is the same rotation, slerp must still take the short path
+    assert np.allclose(utils.quat_slerp(q0, -q1, t), target_q), 'Expected slerp to take the shortest path'
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+from src.benchmark import load_frames, keypoint_agreement, box_agreement, depth_agreement
+
+def test_load_frames_from_directory_and_video(tmp_path):
+    frames = load_frames('data/imgs', max_frames=2)
+    assert len(frames) == 2 and frames[0].ndim == 3, f'Expected two BGR images but got {len(frames)}'
+
+    path = str(tmp_path / 'video.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (32, 24))
+    for value in range(5):
+        writer.write(np.full((24, 32, 3), value * 50, dtype=np.uint8))
+    writer.release()
+    frames = load_frames(path, max_frames=3)
+    assert len(frames) == 3 and frames[0].shape == (24, 32, 3), f'Expected three video frames but got {len(frames)}'
+
+def test_keypoint_agreement():
+    reference = np.full((4, 17, 3), 0.5)
+    keypoints = reference.copy()
+    keypoints[:2, :, 0] += 0.1
+    keypoints[3, :, 2] = 0.
+    agreement = keypoint_agreement(keypoints, reference)
+    assert np.isclose(agreement['mean_distance'], 0.1 * 2 / 3), f'Unexpected mean distance {agreement}'
+    assert np.isclose(agreement['pck'], 1 / 3) and np.isclose(agreement['confident_fraction'], 0.75), \
+        f'Expected low confidence keypoints to be ignored but got {agreement}'
+
+def test_box_and_depth_agreement():
+    box = np.array([0., 0., 1., 1.])
+    agreement = box_agreement([box, None, box], [np.array([0., 0., 1., 0.5]), None, None])
+    assert np.isclose(agreement['detection_agreement'], 2 / 3) and np.isclose(agreement['mean_iou'], 0.5), \
+        f'Unexpected box agreement {agreement}'
+    depth = np.random.default_rng(0).normal(size=(2, 8, 8))
+    agreement = depth_agreement(depth, 3 * depth + 1)
+    assert np.isclose(agreement['mean_correlation'], 1.), f'Expected relative depth to agree but got {agreement}'
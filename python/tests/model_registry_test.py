@@ -0,0 +1,56 @@
+import threading
+import time
+import numpy as np
+from src.interpreter import LatencyHistogram, TimedInterpreter, PACKAGE_DIR, resolve_model_path
+from src.model_registry import MODELS, ModelRegistry
+
+def test_latency_histogram_percentiles():
+    latency = LatencyHistogram()
+    for duration in np.linspace(0.001, 0.1, 1000):
+        latency.record(duration)
+    summary = latency.summary()
+    assert summary['count'] == 1000 and np.isclose(summary['mean'], 0.0505), f'Unexpected summary {summary}'
+    for q in [50, 95, 99]:
+        expected = np.percentile(np.linspace(0.001, 0.1, 1000), q)
+        assert expected <= summary[f'p{q}'] <= expected * 1.13, f'Expected p{q} within a bin of {expected} but got {summary[f"p{q}"]}'
+    latency.record(100.)
+    assert latency.percentile(100) == 100., 'Expected durations past the range to be kept by max'
+
+def test_model_paths_resolved_against_package():
+    assert resolve_model_path('models/x.tflite') == PACKAGE_DIR / 'models' / 'x.tflite', 'Expected a package path'
+    assert ModelRegistry().path('blaze_face_back').exists(), 'Expected the bundled BlazeFace model to be found'
+    assert all('\\' not in path for _, path, _ in MODELS.values()), 'Expected portable model paths'
+
+class _Interpreter:
+    # interpreter stand-in whose first invoke is slow, like kernel preparation
+    def __init__(self):
+        self.invokes = 0
+
+    def invoke(self):
+        time.sleep(0.05 if self.invokes == 0 else 0.001)
+        self.invokes += 1
+
+class _Model:
+    def __init__(self, model_path, num_threads=None, latency=None, load_time=0.1):
+        time.sleep(load_time)
+        self.model_path = model_path
+        self.thread = threading.current_thread()
+        self.interpreter = TimedInterpreter(_Interpreter(), latency)
+
+    def warm_up(self):
+        self.interpreter.invoke()
+
+def test_registry_loads_in_parallel_and_warms_up():
+    registry = ModelRegistry({'a': (_Model, 'a.tflite', {}), 'b': (_Model, 'b.tflite', {}), 'c': (_Model, 'c.tflite', {})})
+    tic = time.perf_counter()
+    a, b = registry.load('a', 'b')
+    elapsed = time.perf_counter() - tic
+    assert elapsed < 0.25, f'Expected both models to load in parallel but took {elapsed:.2f} s'
+    assert a.thread is not b.thread and a.model_path == 'a.tflite', 'Expected each model loaded on its own thread'
+    assert registry.get('a') is a and 'c' not in registry.loaded, 'Expected models to be loaded once and on demand'
+
+    assert registry.latency('a').count == 0, 'Expected the warm-up invoke to be left out of the histogram'
+    a.interpreter.invoke()
+    stats = registry.get_stats()['a']
+    assert stats['count'] == 1 and stats['warm_up_time'] >= 0.05 and stats['load_time'] >= 0.1, f'Unexpected stats {stats}'
+    assert stats['p50'] < 0.05, f'Expected the warm invoke to be fast but got {stats["p50"]}'
@@ -0,0 +1,95 @@
+import time
+import numpy as np
+from src.multi_camera import SharedRingBuffer, MultiCameraSupervisor, CameraPipeline, pack_result, unpack_result
+from src.face_model.blazeFaceDetector import Results
+from src.webcam import SyntheticSource
+
+def test_ring_buffer_round_trip():
+    ring = SharedRingBuffer((4, 4, 3), np.uint8, slots=2)
+    reader = SharedRingBuffer.attach(ring.spec)
+    try:
+        assert reader.read_latest() is None, 'Expected nothing before the first write'
+        for value in range(3):
+            ring.write(np.full((4, 4, 3), value, dtype=np.uint8), timestamp=float(value))
+        seq, frame, timestamp = reader.read_latest()
+        assert seq == 2 and frame[0, 0, 0] == 2 and timestamp == 2., f'Expected the newest frame but got {seq}'
+        assert reader.read_latest(after=seq) is None, 'Expected no frame newer than the one read'
+        frame[:] = 9
+        assert reader.read_latest()[1][0, 0, 0] == 2, 'Expected reads to be copies'
+    finally:
+        reader.close()
+        ring.close()
+
+def test_pack_result():
+    keypoints = np.random.default_rng(0).uniform(size=(17, 3))
+    result = unpack_result(pack_result(keypoints, [1, 2, 3], [4, 5, 6, 7]))
+    assert np.allclose(result['keypoints'], keypoints) and list(result['arm_angles']) == [4, 5, 6, 7], \
+        f'Unexpected result {result}'
+
+class _Recorder:
+    # stand-in for the Movenet model and the face tracker, keeps the frames it is given
+    def __init__(self):
+        self.frames = []
+
+    def predict(self, frame, copy=False):
+        self.frames.append(frame)
+        return np.full((1, 1, 17, 3), 0.5)
+
+    def detect(self, frame, keypoints=None):
+        self.frames.append(frame)
+        return Results(np.empty((0, 4)), None, np.empty(0))
+
+def test_camera_pipeline_feeds_movenet_rgb():
+    pipeline = CameraPipeline.__new__(CameraPipeline)
+    pipeline.movenet, pipeline.face_tracker = _Recorder(), _Recorder()
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    frame[..., 0] = 255 # blue in BGR
+    pipeline(frame)
+    assert pipeline.movenet.frames[0][0, 0, 2] == 255, 'Expected Movenet to get the frame as RGB'
+    assert pipeline.face_tracker.frames[0] is frame, 'Expected BlazeFace to get the BGR frame'
+
+def _mean_pipeline():
+    # stand-in for CameraPipeline, keypoints carry the frame's mean value
+    def pipeline(frame):
+        return np.full((17, 3), frame.mean()), np.zeros(3), np.zeros(4)
+    return pipeline
+
+class _Client:
+    def __init__(self):
+        self.sent = []
+
+    def send_people(self, face_angles, arm_angles=None, people=None):
+        self.sent.append(list(people))
+
+def test_supervisor_merges_workers():
+    frames = [np.full((20, 8, 16, 3), value, dtype=np.uint8) for value in [50, 200]]
+    cameras = [SyntheticSource(f, fps=100) for f in frames]
+    client = _Client()
+    supervisor = MultiCameraSupervisor(cameras, _mean_pipeline, client=client, frame_shape=(32, 32, 3))
+    supervisor.start()
+    try:
+        deadline = time.time() + 20
+        latest = {}
+        while len(latest) < 2 and time.time() < deadline:
+            latest = supervisor.send()
+            time.sleep(0.01)
+        assert sorted(latest) == [0, 1], f'Expected results from both cameras but got {sorted(latest)}'
+        # letterboxing pads half of each 8x16 frame with zeros
+        assert np.isclose(latest[0]['keypoints'][0, 0], 25, atol=1) and np.isclose(latest[1]['keypoints'][0, 0], 100, atol=1), \
+            'Expected each camera to keep its own results'
+        assert {idx for people in client.sent for idx in people} == {0, 1}, f'Expected both cameras to be sent but got {client.sent}'
+        frame, _ = supervisor.latest_frame(1)
+        assert frame.shape == (32, 32, 3) and frame.max() == 200, 'Expected the letterboxed frame to be shared'
+
+        while any(stats['alive'] for stats in supervisor.get_stats()) and time.time() < deadline:
+            time.sleep(0.05)
+        stats = supervisor.get_stats()
+        assert all(s['exitcode'] == 0 and s['inferences'] > 0 for s in stats), f'Expected workers to finish cleanly: {stats}'
+        assert not any(s['live'] for s in stats), f'Expected finished workers not to be live: {stats}'
+        # every result is sent at most once and nothing is sent for the finished workers
+        assert all(s['results_sent'] <= s['inferences'] for s in stats), f'Expected no result to be resent: {stats}'
+        sent = len(client.sent)
+        supervisor.send()
+        assert len(client.sent) == sent, f'Expected nothing to be sent for finished workers but got {client.sent[sent:]}'
+    finally:
+        supervisor.stop()
@@ -0,0 +1,117 @@
+import json
+import socket
+
+import numpy as np
+import pytest
+
+from src.networking import GodotUDPClient
+from src.wire_format import HEADER, MAGIC, VERSION, WireDecoder, encode_frame, encode_table, get_table_id
+
+@pytest.fixture
+def server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(1.)
+    yield sock
+    sock.close()
+
+def _receive(sock, count):
+    return [sock.recvfrom(65536)[0] for _ in range(count)]
+
+def test_table_and_frame_round_trip():
+    table = [('LeftArm', 4), ('face', 3), ('shoulder', 1)]
+    values = np.arange(8, dtype=np.float32) / 3
+    decoder = WireDecoder()
+    assert decoder.decode(encode_table(table, 0, 1.5)) is None, 'Expected no message for a table packet'
+    packet = encode_frame(get_table_id(table), values, 1, 1.5, person=2)
+    assert len(packet) == HEADER.size + 4 * 8, f'Expected {HEADER.size + 32} bytes but got {len(packet)}'
+
+    message = decoder.decode(packet)
+    assert message['sequence'] == 1 and message['timestamp'] == 1.5 and message['person'] == 2, f'Unexpected header {message}'
+    assert list(message['joints']) == ['LeftArm', 'face', 'shoulder'], f'Unexpected joints {list(message["joints"])}'
+    assert np.array_equal(message['joints']['face'], values[4:7]), f'Expected {values[4:7]} but got {message["joints"]["face"]}'
+
+def test_decoder_drops_unknown_tables_and_stale_frames():
+    table = [('face', 3)]
+    table_id = get_table_id(table)
+    decoder = WireDecoder()
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 0, 0.)) is None, 'Expected a frame before its table to be dropped'
+    decoder.decode(encode_table(table, 1, 0.))
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 2**32 - 1, 0.)) is not None, 'Expected the frame to decode'
+    # the sequence number wrapped around
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 2**32, 0.)) is not None, 'Expected a wrapped frame to decode'
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 5, 0.)) is not None, 'Expected a newer frame to decode'
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 3, 0.)) is None, 'Expected a stale frame to be dropped'
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 3, 0., person=1)) is not None, 'Expected people to be ordered separately'
+    assert decoder.decode(encode_frame(table_id, [1, 2], 6, 0.)) is None, 'Expected a frame not matching its table to be dropped'
+
+def test_decoder_rejects_malformed_packets():
+    decoder = WireDecoder()
+    packet = encode_frame(0, [1.], 0, 0.)
+    for bad_packet in [b'{"face": {}}', b'XXXX' + packet[4:], packet[:4] + bytes([VERSION + 1]) + packet[5:], packet[:-1]]:
+        with pytest.raises(ValueError):
+            decoder.decode(bad_packet)
+
+def test_client_sends_binary_people(server):
+    client = GodotUDPClient(port=server.getsockname()[1])
+    face_angles = np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+    arm_angles = np.arange(8.).reshape(2, 4)
+    client.send_people(face_angles, arm_angles, people=[3, 5])
+    client.send_people(face_angles, arm_angles, people=[3, 5])
+
+    # the table is only sent again once its layout changes or table_interval has passed
+    packets = _receive(server, 5)
+    assert all(packet.startswith(MAGIC) for packet in packets), 'Expected binary packets'
+    decoder = WireDecoder()
+    messages = [message for message in map(decoder.decode, packets) if message is not None]
+    assert [message['person'] for message in messages] == [3, 5, 3, 5], f'Unexpected people {messages}'
+    assert [message['sequence'] for message in messages] == [1, 2, 3, 4], f'Unexpected sequence numbers {messages}'
+    assert np.allclose(messages[1]['joints']['face'], face_angles[1]), f'Expected {face_angles[1]} but got {messages[1]}'
+    assert np.allclose(messages[1]['joints']['arm'], arm_angles[1]), f'Expected {arm_angles[1]} but got {messages[1]}'
+
+    client.send_message([0.75, 0, 0])
+    table, frame = _receive(server, 2)
+    assert decoder.decode(table) is None, 'Expected a new table without the arm angles'
+    assert list(decoder.decode(frame)['joints']) == ['face'], 'Expected only the face angles'
+
+def test_client_sends_json_text(server):
+    client = GodotUDPClient(port=server.getsockname()[1], binary=False)
+    client.send_message([0.75, 0, 0, 1, 2, 3, 4])
+    message = json.loads(server.recvfrom(65536)[0])
+    assert message['face']['pitch'] == 0.75, f'Unexpected message {message}'
+    assert message['arm']['arm_right'] == 4., f'Unexpected message {message}'
+
+def test_decoder_follows_sessions():
+    table = [('face', 3)]
+    table_id = get_table_id(table)
+    decoder = WireDecoder()
+    decoder.decode(encode_table(table, 0, 0., session=7))
+    for sequence in range(1, 100):
+        decoder.decode(encode_frame(table_id, [1, 2, 3], sequence, 0., session=7))
+    # a late or duplicated table of the same session doesn't reset the sequence numbers
+    decoder.decode(encode_table(table, 0, 0., session=7))
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 50, 0., session=7)) is None, 'Expected a stale frame to be dropped'
+
+    # same address, a restarted sender has a new session and its sequence numbers start over
+    decoder.decode(encode_table(table, 0, 1., session=8))
+    message = decoder.decode(encode_frame(table_id, [4, 5, 6], 1, 1., session=8))
+    assert message is not None and message['session'] == 8, 'Expected the restarted sender\'s frame to decode'
+    assert decoder.decode(encode_frame(table_id, [4, 5, 6], 1, 1., session=8)) is None, 'Expected a repeated frame to be dropped'
+    # late packets of the old session are dropped
+    decoder.decode(encode_table(table, 0, 0., session=7))
+    assert decoder.decode(encode_frame(table_id, [1, 2, 3], 100, 0., session=7)) is None, 'Expected the old session to be dropped'
+    assert decoder.decode(encode_frame(table_id, [4, 5, 6], 2, 1., session=8)) is not None, 'Expected the new session to go on'
+
+def test_restarted_client_is_received(server):
+    port = server.getsockname()[1]
+    decoder = WireDecoder()
+    messages = []
+    for _ in range(2):
+        client = GodotUDPClient(port=port)
+        for _ in range(3):
+            client.send_message([0.75, 0, 0])
+        # decoded as one sender, like a restart that reuses the address
+        messages.extend(decoder.decode(packet) for packet in _receive(server, 4))
+        client.sock.close()
+    frames = [message for message in messages if message is not None]
+    assert len(frames) == 6, f'Expected the frames of both clients but got {len(frames)}'
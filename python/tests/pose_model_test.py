@@ -0,0 +1,71 @@
+import weakref
+
+import numpy as np
+import pytest
+from src.pose_model import Movenet
+
+class _Interpreter:
+    # interpreter stand-in, every person's keypoints carry the mean of their frame. Like the TFLite
+    # runtime it refuses to invoke while a view returned by tensor() is alive
+    def __init__(self, shape=(1, 8, 8, 3)):
+        self.allocations = 0
+        self.views = []
+        self.resize_tensor_input(0, shape)
+        self.allocate_tensors()
+
+    def get_input_details(self):
+        return [{'index': 0, 'shape': np.array(self.input.shape)}]
+
+    def get_output_details(self):
+        return [{'index': 1, 'shape': np.array(self.output.shape)}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = tuple(shape)
+
+    def allocate_tensors(self):
+        self.input = np.zeros(self.shape, dtype=np.uint8)
+        self.output = np.zeros((self.shape[0], 1, 17, 3), dtype=np.float32)
+        self.allocations += 1
+
+    def tensor(self, index):
+        def view():
+            tensor = (self.input if index == 0 else self.output)[...]
+            self.views.append(weakref.ref(tensor))
+            return tensor
+        return view
+
+    def invoke(self):
+        if any(view() is not None for view in self.views):
+            raise RuntimeError('There is at least 1 reference to internal data in the interpreter')
+        self.views = []
+        self.output[:] = self.input.mean(axis=(1, 2, 3))[:, None, None, None]
+
+def _movenet():
+    model = Movenet.__new__(Movenet)
+    model.model = _Interpreter()
+    model.input_details = model.model.get_input_details()
+    model.output_details = model.model.get_output_details()
+    return model
+
+def test_predict_after_predict_batch():
+    model = _movenet()
+    frames = np.stack([np.full((8, 8, 3), value, dtype=np.uint8) for value in [1, 2, 3]])
+    for _ in range(2):
+        output = model.predict_batch(frames, copy=True)
+        assert output.shape == (3, 1, 17, 3) and list(output[:, 0, 0, 0]) == [1, 2, 3], f'Unexpected batch output {output[:, 0, 0, 0]}'
+        output = model.predict(np.full((8, 8, 3), 5, dtype=np.uint8))
+        assert output.shape == (1, 1, 17, 3) and output[0, 0, 0, 0] == 5, f'Expected a single frame output but got {output.shape}'
+    assert model.input_details[0]['shape'][0] == 1, 'Expected the input to be back to a single frame'
+    model.predict(np.zeros((8, 8, 3), dtype=np.uint8))
+    assert model.model.allocations == 5, f'Expected tensors to be reallocated only when the batch size changes, got {model.model.allocations}'
+
+def test_predictions_can_be_kept():
+    model = _movenet()
+    outputs = [model.predict(np.full((8, 8, 3), value, dtype=np.uint8)) for value in [1, 2, 3]]
+    assert [output[0, 0, 0, 0] for output in outputs] == [1, 2, 3], 'Expected each kept prediction to stay unchanged'
+
+    view = model.predict(np.zeros((8, 8, 3), dtype=np.uint8), copy=False)
+    with pytest.raises(RuntimeError):
+        model.predict(np.zeros((8, 8, 3), dtype=np.uint8))
+    del view
+    assert model.predict(np.full((8, 8, 3), 4, dtype=np.uint8))[0, 0, 0, 0] == 4, 'Expected invoke to work once the view is released'
@@ -0,0 +1,55 @@
+import numpy as np
+from src.postprocessing import calculate_face_angles, calculate_arm_angles
+from src.pose_model import parse_multipose_output
+from src.face_model.blazeFaceDetector import Results
+from src.networking import format_person
+from src.utils import draw_keypoints, KEYPOINT_MAPPING
+
+def _people(num_people=3, seed=0):
+    rng = np.random.default_rng(seed)
+    keypoints = rng.uniform(0.1, 0.9, size=(num_people, 17, 3))
+    keypoints[..., 2] = 1.
+    return keypoints
+
+def test_arm_angles_batch_matches_single():
+    people = _people()
+    batch = calculate_arm_angles(people)
+    assert batch.shape == (3, 4), f'Expected (3, 4) arm angles but got {batch.shape}'
+    for person, keypoints in enumerate(people):
+        single = calculate_arm_angles(keypoints)
+        assert isinstance(single, list), 'Expected a list for a single person'
+        assert np.allclose(batch[person], single), f'Expected person {person} to match {single} but got {batch[person]}'
+
+def test_face_angles_use_closest_face():
+    people = _people(2)
+    nose = KEYPOINT_MAPPING['nose']
+    people[0, nose, :2] = [0.2, 0.2] # (y, x)
+    people[1, nose, :2] = [0.75, 0.7]
+    # one face box per person, in reverse order, as (x_left, y_top, x_right, y_bot)
+    results = Results(np.array([[0.6, 0.6, 0.8, 0.8], [0.1, 0.1, 0.3, 0.3]]), None, None)
+    angles = calculate_face_angles(people, results, in_rads=False)
+    assert np.allclose(angles, [[0, 0, 0], [45, 0, 0]]), f'Expected each nose in its own face box but got {angles}'
+    single = calculate_face_angles(people[1], results, in_rads=False)
+    assert np.allclose(single, [45, 0, 0]), f'Expected a single person to match the batch but got {single}'
+    assert calculate_face_angles(people, Results([], [], [])).shape == (2, 3), 'Expected zeros without faces'
+
+def test_parse_multipose_output():
+    output = np.zeros((1, 6, 56), dtype=np.float32)
+    output[0, :, 55] = [0.9, 0.1, 0.5, 0., 0., 0.]
+    output[0, :, :51] = np.arange(6)[:, None]
+    results = parse_multipose_output(output, score_threshold=0.2)
+    assert results.keypoints.shape == (2, 17, 3), f'Expected 2 people but got {results.keypoints.shape}'
+    assert np.allclose(results.keypoints[:, 0, 0], [0, 2]), 'Expected the people above the threshold'
+    assert np.allclose(results.scores, [0.9, 0.5]) and results.boxes.shape == (2, 4), 'Expected their boxes and scores'
+
+def test_draw_keypoints_of_several_people():
+    people = _people(2)
+    people[1, :, 2] = 0.
+    image = draw_keypoints(np.zeros((100, 100, 3), dtype=np.uint8), people)
+    y, x = (people[0, 0, :2] * 100).astype(int)
+    assert image[y, x, 2] == 255, 'Expected visible keypoints to be drawn'
+
+def test_format_person():
+    message = format_person(np.array([0.1, 0.2, 0.]), np.arange(4.), person=np.int64(1))
+    assert str(message).replace("'", '"').startswith('{"face": {"pitch": 0.1'), f'Expected plain floats but got {message}'
+    assert message['person'] == 1 and message['arm']['arm_right'] == 3., f'Unexpected message {message}'
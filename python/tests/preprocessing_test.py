@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+from src.preprocessing import ImagePreprocessor, MIDAS_MEAN, MIDAS_STD, midas_preprocessor, blaze_face_preprocessor
+
+def _image(height=120, width=160, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+def test_midas_preprocessor_matches_float_reference():
+    image = _image()
+    resized = cv2.resize(image, (256, 256), interpolation=cv2.INTER_CUBIC).astype(np.float32)
+    expected = ((resized - MIDAS_MEAN) / MIDAS_STD).reshape(1, 256, 256, 3)
+    output = midas_preprocessor()(image)
+    assert output.shape == (1, 256, 256, 3) and output.dtype == np.float32, f'Unexpected input {output.shape} {output.dtype}'
+    error = np.max(np.abs(output - expected))
+    assert error < 1e-3, f'Expected the Midas input to match the reference but got an error of {error}'
+
+def test_blaze_face_preprocessor_swaps_channels():
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    image[..., 0] = 255 # blue
+    output = blaze_face_preprocessor(128, 128)(image)
+    assert np.allclose(output[..., 2], 1) and np.allclose(output[..., :2], -1), \
+        f'Expected a blue BGR frame to become blue RGB in [-1, 1] but got {output[0, 0, 0]}'
+
+def test_preprocessor_writes_into_given_buffer():
+    preprocessor = ImagePreprocessor(32, 48, scale=1/255.0)
+    out = np.zeros((1, 32, 48, 3), dtype=np.float32)
+    output = preprocessor(_image(), out=out)
+    assert output is out, 'Expected the given buffer to be returned'
+    assert preprocessor(_image(seed=1)) is preprocessor.buffer, 'Expected the own buffer to be reused'
+    assert 0 <= out.min() and out.max() <= 1, f'Expected values in [0, 1] but got {out.min()}, {out.max()}'
@@ -0,0 +1,55 @@
+import numpy as np
+from keypoints import KeypointRotations
+from keypoints.retargeting import TargetRig, Retargeter, get_axes_matrix
+from keypoints.skeleton import JOINTS, OFFSETS, PARENT_INDEX
+from keypoints.benchmark import generate_pose_sequence
+
+def _global_rotations(local_rotations):
+    global_rotations = np.empty_like(local_rotations)
+    for joint_idx, parent_idx in enumerate(PARENT_INDEX):
+        parent_rotation = global_rotations[..., parent_idx, :, :] if parent_idx >= 0 else np.eye(3)
+        global_rotations[..., joint_idx, :, :] = parent_rotation @ local_rotations[..., joint_idx, :, :]
+    return global_rotations
+
+def test_identity_rig():
+    kp_obj = KeypointRotations()
+    local_rotations = kp_obj.calculate_local_rotations(generate_pose_sequence(5))
+
+    retargeter = Retargeter(TargetRig({joint: joint for joint in JOINTS}))
+    output_rotations = retargeter.retarget_rotations(local_rotations)
+    assert np.allclose(output_rotations, local_rotations), 'Expected the source rig to keep its rotations'
+
+def test_retargeted_bones_follow_source_bones():
+    B = get_axes_matrix('z,y,x')
+    rest_offsets = {
+        'LeftUpLeg': B @ OFFSETS['lefthip'],
+        'LeftLeg': np.array([0.3, -1., 0.]),
+        'LeftFoot': np.array([0., -1., 0.5]),
+        'RightForeArm': np.array([0., 0.2, 1.]),
+    }
+    bone_mapping = {joint: joint for joint in JOINTS}
+    bone_mapping.update({'LeftUpLeg': 'lefthip', 'LeftLeg': 'leftknee', 'LeftFoot': 'leftfoot', 'RightForeArm': 'rightelbow'})
+    for joint in ['lefthip', 'leftknee', 'leftfoot', 'rightelbow']:
+        del bone_mapping[joint]
+    bone_to_joint = {bone: joint for bone, joint in bone_mapping.items()}
+    retargeter = Retargeter(TargetRig(bone_mapping, rest_offsets, axes='z,y,x'))
+
+    kp_obj = KeypointRotations()
+    local_rotations = kp_obj.calculate_local_rotations(generate_pose_sequence(5))
+    source_global = _global_rotations(local_rotations)
+
+    # rig bones in JOINTS order so the rig hierarchy matches PARENT_INDEX
+    output_rotations = retargeter.retarget_rotations(local_rotations)
+    order = np.argsort(retargeter.joint_index)
+    target_global = _global_rotations(output_rotations[:, order])
+
+    target_offsets = {joint: B @ OFFSETS[joint] for joint in JOINTS}
+    target_offsets.update({bone_to_joint[bone]: offset for bone, offset in rest_offsets.items()})
+    for joint_idx, parent_idx in enumerate(PARENT_INDEX):
+        if parent_idx < 0: continue
+        joint = JOINTS[joint_idx]
+        source_bone = source_global[:, parent_idx] @ OFFSETS[joint]
+        target_bone = target_global[:, parent_idx] @ target_offsets[joint]
+        source_bone = source_bone @ B.T / np.linalg.norm(source_bone, axis=-1, keepdims=True)
+        target_bone = target_bone / np.linalg.norm(target_bone, axis=-1, keepdims=True)
+        assert np.allclose(source_bone, target_bone), f'Expected the {joint} bone to point the same way on both rigs'
@@ -0,0 +1,38 @@
+import time
+import numpy as np
+from src.webcam import Webcam, SyntheticSource
+
+def _numbered_frames(num_frames):
+    frames = np.zeros((num_frames, 4, 4, 3), dtype=np.uint8)
+    frames[:] = np.arange(num_frames)[:, None, None, None]
+    return frames
+
+def test_inline_capture_reads_every_frame():
+    cam = Webcam(SyntheticSource(_numbered_frames(5), fps=0))
+    cam.start_capture()
+    output_idx = [cam.grab_frame()[0, 0, 0] for _ in range(5)]
+    assert output_idx == list(range(5)), f'Expected every frame in order but got {output_idx}'
+    assert cam.grab_frame() is None, 'Expected no frame once the source is exhausted'
+    cam.stop_capture()
+
+def test_threaded_capture_returns_newest_frame():
+    num_frames = 60
+    cam = Webcam(SyntheticSource(_numbered_frames(num_frames), fps=300), threaded=True, buffer_size=2)
+    cam.start_capture()
+
+    output_idx = []
+    while True:
+        frame, timestamp = cam.grab_frame_with_timestamp()
+        if frame is None:
+            break
+        assert timestamp <= time.time(), 'Expected the capture timestamp to be in the past'
+        output_idx.append(int(frame[0, 0, 0]))
+        # slower consumer than the source
+        time.sleep(0.02)
+    cam.stop_capture()
+
+    stats = cam.get_stats()
+    assert output_idx == sorted(set(output_idx)), f'Expected strictly newer frames but got {output_idx}'
+    assert stats['frames_captured'] == num_frames, f'Expected {num_frames} frames captured but got {stats}'
+    assert stats['frames_dropped'] > 0 and stats['overruns'] > 0, f'Expected stale frames to be dropped but got {stats}'
+    assert stats['frames_dropped'] + len(output_idx) <= num_frames